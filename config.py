@@ -26,6 +26,13 @@ DEFAULT_LEARNING_RATE = 1e-5
 # Logging
 LOG_LEVEL = "INFO"
 
+# False Positive Analysis (task 3.1.3)
+# Negative images with fewer detections than FP_MIN_DETECTIONS, or whose best
+# detection scores below FP_MIN_SCORE, are left out of the per-image list in
+# false_positive_stats.json. Aggregate counts and score stats still include them.
+FP_MIN_SCORE = 0.01
+FP_MIN_DETECTIONS = 1
+
 # DVC Remote Storage Configuration
 # Remote storage URL for DVC data versioning
 # Can be overridden by environment variable: DVC_REMOTE_STORAGE_URL
@@ -0,0 +1,93 @@
+"""
+Shared checkpoint discovery for the artifact task scripts (4.3.2, 4.3.3).
+
+Both tasks look for the same best checkpoint, in the same order, so they
+register and archive the same file:
+
+    from _checkpoint_discovery import find_checkpoint, find_newest_checkpoint
+    found = find_checkpoint([checkpoint_dir])  # (directory, file) or None
+"""
+
+import os
+from pathlib import Path
+
+# Common best checkpoint file names, in order of preference
+CHECKPOINT_NAMES = (
+    'best.pt',
+    'checkpoint_best.pt',
+    'best_model.pt',
+    'model_best.pt',
+)
+
+# Checkpoints live in <root>/<experiment>/checkpoints/, so the fallback
+# search does not descend further than this
+MAX_CHECKPOINT_DEPTH = 3
+
+# Directories never holding checkpoints
+_SKIP_DIRS = frozenset({'.git', '__pycache__'})
+
+
+def find_named_checkpoint(directory):
+    """Return the preferred best checkpoint file directly in directory, or None."""
+    # One listdir instead of a stat per candidate name
+    try:
+        names = set(os.listdir(directory))
+    except OSError:
+        return None
+    for name in CHECKPOINT_NAMES:
+        if name in names:
+            return Path(directory) / name
+    return None
+
+
+def find_checkpoint(roots):
+    """
+    Find the best checkpoint under the first root that has one.
+
+    Each root is checked directly, then every <root>/<experiment>/checkpoints/
+    directory (SAM3 experiment log dirs). Returns (directory, file), or None.
+    """
+    for root in roots:
+        root = Path(root)
+        if not root.is_dir():
+            continue
+
+        candidate = find_named_checkpoint(root)
+        if candidate is not None:
+            return root, candidate
+
+        # scandir reports directories without a stat; a missing checkpoints/
+        # subdirectory just fails its listdir. An unreadable root is skipped.
+        try:
+            with os.scandir(root) as entries:
+                subdirs = [entry.path for entry in entries if entry.is_dir()]
+        except OSError:
+            continue
+        for subdir in subdirs:
+            checkpoints_subdir = Path(subdir) / 'checkpoints'
+            candidate = find_named_checkpoint(checkpoints_subdir)
+            if candidate is not None:
+                return checkpoints_subdir, candidate
+    return None
+
+
+def find_newest_checkpoint(root, max_depth=MAX_CHECKPOINT_DEPTH):
+    """Return the most recently modified .pt file at most max_depth directories below root, or None."""
+    newest = None
+    newest_mtime = None
+    pending = [(root, 0)]
+    while pending:
+        directory, depth = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        if depth < max_depth and entry.name not in _SKIP_DIRS:
+                            pending.append((entry.path, depth + 1))
+                    elif entry.name.endswith('.pt') and entry.is_file():
+                        mtime = entry.stat().st_mtime
+                        if newest_mtime is None or mtime > newest_mtime:
+                            newest, newest_mtime = entry.path, mtime
+        except OSError:
+            continue
+    return Path(newest) if newest is not None else None
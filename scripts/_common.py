@@ -0,0 +1,120 @@
+"""
+Shared helpers for the zero-shot evaluation task scripts (3.1.2, 3.1.3).
+
+Importing this module resolves the project root, loads .env and imports
+config.py once, so each task script only needs:
+
+    from _common import project_root, config, find_prediction_file
+"""
+
+import sys
+import json
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Get project root directory
+project_root = Path(__file__).parent.parent
+
+# Add project root to Python path to import config
+sys.path.insert(0, str(project_root))
+
+# Load environment variables from .env file
+env_path = project_root / '.env'
+if env_path.exists():
+    load_dotenv(env_path)
+
+# Import configuration from config.py
+try:
+    import config
+except ImportError:
+    print("Error: config.py not found. Please create config.py with required settings.", file=sys.stderr)
+    sys.exit(1)
+
+# config is imported for the task scripts, not used here
+__all__ = [
+    'project_root',
+    'config',
+    'load_json',
+    'dump_json',
+    'find_prediction_file',
+]
+
+
+def load_json(path):
+    """Load a JSON file, using orjson when available."""
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def dump_json(obj, path):
+    """Write obj to path as indented JSON, using orjson when available."""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+        return
+    with open(path, 'w') as f:
+        json.dump(obj, f, indent=2)
+
+
+# Known prediction file locations relative to a results directory, in priority order
+PREDICTION_FILE_CANDIDATES = (
+    "dumps/chicken_val/coco_predictions_segm.json",
+    "dumps/chicken_val/coco_predictions_bbox.json",
+    "coco_predictions_segm.json",
+    "coco_predictions_bbox.json",
+)
+
+# Subdirectories of a results tree that never hold prediction dumps
+PRUNED_RESULT_DIRS = {"checkpoints", "logs"}
+
+
+def _find_first_json(root, name_predicate):
+    """
+    Return the first JSON file under root whose name satisfies name_predicate.
+
+    Walks the tree with os.scandir so directory/file checks come from the
+    dirent type instead of a stat() per entry, and stops at the first hit.
+    """
+    stack = [str(root)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in PRUNED_RESULT_DIRS:
+                            stack.append(entry.path)
+                    elif entry.name.endswith(".json") and name_predicate(entry.name):
+                        return Path(entry.path)
+        except OSError:
+            continue
+    return None
+
+
+def find_prediction_file(results_dir):
+    """Find the prediction JSON file from evaluation results."""
+    results_path = Path(results_dir)
+    
+    # Look for COCO format prediction files, canonical dump location first.
+    # A missing results directory just fails these stats, so no pre-check is needed.
+    for relative_path in PREDICTION_FILE_CANDIDATES:
+        path = results_path / relative_path
+        try:
+            os.stat(path)
+            return path
+        except OSError:
+            continue
+    
+    # Try to find any JSON file with "prediction" or "coco" in the name
+    return _find_first_json(
+        results_path,
+        lambda name: "prediction" in name.lower() or "coco" in name.lower()
+    )
@@ -0,0 +1,174 @@
+"""
+Shared load/mutate/save session for the config editing task scripts (3.2.2-3.2.4).
+
+The config file is parsed once, each task's mutator edits the parsed dict in
+place, and the file is written back once (and only if something changed):
+
+    session = ConfigSession(config_path)
+    if session.load():
+        session.mutate(update_dataset_paths, train_json, val_json, img_dir)
+        session.save()
+
+run_all() does the same for several mutators, so tasks 3.2.2-3.2.4 can be
+applied with a single parse and a single dump.
+"""
+
+import sys
+import os
+import json
+import stat
+import hashlib
+import tempfile
+
+from _yaml import load_yaml, dump_yaml
+
+
+def _split_header(raw):
+    """
+    Split raw config bytes into the leading comment block and the rest.
+
+    The header carries directives such as '# @package _global_' that a YAML
+    round trip would drop. The defaults list is left in the body, since it is
+    part of the parsed data and is dumped again with it.
+
+    Task 3.2.1 emits no comments below the header, so carrying just this block
+    over is enough; a comment-preserving round-trip loader (ruamel.yaml) would
+    add a dependency and run far slower than libyaml for nothing.
+    """
+    end = 0
+    for line in raw.splitlines(keepends=True):
+        stripped = line.strip()
+        if stripped and not stripped.startswith(b'#'):
+            break
+        end += len(line)
+    header = raw[:end]
+    if header and not header.endswith(b'\n'):
+        header += b'\n'
+    return header, raw[end:]
+
+
+def dig(data, *keys):
+    """Return data[k1][k2]... or None if any key is missing or a level is not a dict."""
+    for key in keys:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def _snapshot(config_data):
+    """Canonical form of the config data, used to detect whether it changed."""
+    return json.dumps(config_data, sort_keys=True, default=str)
+
+
+class ConfigSession:
+    """One parse and at most one write of a YAML config file."""
+
+    def __init__(self, config_path):
+        self.config_path = config_path
+        self.config_data = None
+        self.raw_config = None
+        self._loaded_snapshot = None
+
+    def load(self):
+        """Read and parse the config file. Returns False (after reporting why) on failure."""
+        if not self.config_path.exists():
+            print(f"ERROR: Config file not found: {self.config_path}", file=sys.stderr)
+            print("Please run task 3.2.1 first to create the config file.", file=sys.stderr)
+            return False
+
+        print(f"Loading configuration from: {self.config_path}")
+        try:
+            # Parse from one in-memory read; the raw bytes are reused for the header
+            self.raw_config = self.config_path.read_bytes()
+            self.config_data = load_yaml(self.raw_config)
+        except Exception as e:
+            print(f"ERROR: Failed to load config file: {e}", file=sys.stderr)
+            return False
+
+        self._loaded_snapshot = _snapshot(self.config_data)
+        return True
+
+    def mutate(self, fn, *args):
+        """Apply fn(config_data, *args) to the loaded config and return its result."""
+        return fn(self.config_data, *args)
+
+    @property
+    def changed(self):
+        """Whether the config data differs from what was loaded."""
+        return _snapshot(self.config_data) != self._loaded_snapshot
+
+    def save(self):
+        """Write the config back (atomically) if it changed, preserving the '# @package' header."""
+        snapshot = _snapshot(self.config_data)
+        if snapshot == self._loaded_snapshot:
+            return self._write_content_hash(snapshot)
+
+        print(f"Updating configuration file: {self.config_path}")
+        try:
+            header, _ = _split_header(self.raw_config)
+
+            # Write a uniquely named sibling temp file and atomically publish it,
+            # so a crashed or concurrent run cannot leave a truncated config
+            # behind. The temp file is created 0600, so carry the mode over.
+            mode = stat.S_IMODE(os.stat(self.config_path).st_mode)
+            tmp = tempfile.NamedTemporaryFile(dir=self.config_path.parent, prefix=self.config_path.name + '.',
+                                              suffix='.tmp', delete=False, buffering=1 << 16)
+            try:
+                with tmp:
+                    # Stream the dump straight into the file instead of building
+                    # the whole document as a str first
+                    tmp.write(header)
+                    dump_yaml(self.config_data, tmp, encoding='utf-8', default_flow_style=False,
+                              sort_keys=False, allow_unicode=True, width=1000)
+                    os.fchmod(tmp.fileno(), mode)
+                os.replace(tmp.name, self.config_path)
+            except BaseException:
+                os.unlink(tmp.name)
+                raise
+
+            print("✓ Configuration file updated successfully")
+            return self._write_content_hash(snapshot)
+
+        except Exception as e:
+            print(f"ERROR: Failed to write config file: {e}", file=sys.stderr)
+            import traceback
+            traceback.print_exc()
+            return False
+
+    def _write_content_hash(self, snapshot):
+        """
+        Record the sha256 of the canonical (sorted-key) config data next to the config.
+
+        Downstream tools can compare it to skip re-parsing an unchanged config; it
+        only depends on the data, not on formatting or the header.
+        """
+        hash_path = self.config_path.with_name(self.config_path.name + '.sha256')
+        digest = hashlib.sha256(snapshot.encode('utf-8')).hexdigest()
+        try:
+            if hash_path.read_text() == digest:
+                return True
+        except OSError:
+            pass
+
+        try:
+            tmp_path = hash_path.with_name(hash_path.name + '.tmp')
+            tmp_path.write_text(digest)
+            os.replace(tmp_path, hash_path)
+        except OSError as e:
+            print(f"WARNING: Failed to write config hash {hash_path}: {e}", file=sys.stderr)
+        return True
+
+
+def run_all(config_path, *mutators):
+    """Load config_path once, apply each mutator(config_data) in order, save once.
+
+    Every mutator runs even if an earlier one reports failure; returns True only
+    if the save and all mutators succeeded.
+    """
+    session = ConfigSession(config_path)
+    if not session.load():
+        return False
+
+    results = [session.mutate(mutator) for mutator in mutators]
+    return session.save() and all(results)
@@ -0,0 +1,30 @@
+"""
+Shared project paths for the training configuration task scripts (3.3.1-3.3.3)
+and the checkpoint/artifact task scripts (4.3.1-4.3.3).
+
+Resolved once at import time, so each task script (and the fused
+configure_training.py runner) only needs:
+
+    from _paths import PROJECT_ROOT, CHICKEN_CONFIG
+
+load_project_env() loads the project .env, importing python-dotenv only when
+there is one.
+"""
+
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Fine-tuning config created by task 3.2.1 and edited by tasks 3.2.2-3.3.3
+CHICKEN_CONFIG = PROJECT_ROOT / 'configs' / 'sam3_chicken_finetune.yaml'
+
+
+def load_project_env():
+    """Load environment variables from the project .env file, if present."""
+    env_path = PROJECT_ROOT / '.env'
+    if env_path.exists():
+        try:
+            from dotenv import load_dotenv
+            load_dotenv(env_path)
+        except ImportError:
+            pass  # dotenv is optional
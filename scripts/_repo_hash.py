@@ -0,0 +1,143 @@
+"""
+Commit hash of the project checkout for the artifact task scripts (4.3.2, 4.3.3).
+
+The git hash is read straight from .git (HEAD, then the loose ref or
+packed-refs) instead of spawning git, and the DVC-or-git hash chosen for a
+commit is cached on disk, so a later task on the same commit spawns no
+processes at all:
+
+    from _repo_hash import get_dvc_commit_hash
+    commit_hash, hash_type = get_dvc_commit_hash()
+"""
+
+import os
+import json
+import string
+import subprocess
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# (hash, hash_type) resolved per git commit; a new commit is a new key
+COMMIT_HASH_CACHE_PATH = Path.home() / ".cache" / "sam3" / "commit_hash.json"
+
+
+def _is_object_id(value):
+    """Whether value looks like a full SHA-1 or SHA-256 object id."""
+    return len(value) in (40, 64) and all(c in string.hexdigits for c in value)
+
+
+def _git_dirs():
+    """Return (git_dir, common_dir) of the checkout; worktrees keep their refs in common_dir."""
+    git_dir = PROJECT_ROOT / '.git'
+    if git_dir.is_file():
+        # Worktree or submodule: .git is a "gitdir: <path>" pointer
+        content = git_dir.read_text().strip()
+        if not content.startswith('gitdir:'):
+            raise ValueError(f"unexpected .git file: {content!r}")
+        git_dir = PROJECT_ROOT / content[len('gitdir:'):].strip()
+    commondir_file = git_dir / 'commondir'
+    if commondir_file.exists():
+        return git_dir, git_dir / commondir_file.read_text().strip()
+    return git_dir, git_dir
+
+
+def _read_git_head():
+    """Read the HEAD commit hash from the .git files; None if it cannot be parsed."""
+    try:
+        git_dir, common_dir = _git_dirs()
+        head = (git_dir / 'HEAD').read_text().strip()
+        if not head.startswith('ref:'):
+            # Detached HEAD holds the hash itself
+            return head if _is_object_id(head) else None
+        ref = head[len('ref:'):].strip()
+
+        for base in (git_dir, common_dir):
+            ref_path = base / ref
+            if ref_path.is_file():
+                value = ref_path.read_text().strip()
+                return value if _is_object_id(value) else None
+
+        # Loose ref not present: the ref may only be in packed-refs
+        with open(common_dir / 'packed-refs', 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2 and parts[1] == ref:
+                    return parts[0] if _is_object_id(parts[0]) else None
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def get_git_commit_hash():
+    """Get current git commit hash (read from .git, falling back to git rev-parse)."""
+    git_hash = _read_git_head()
+    if git_hash:
+        return git_hash
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        return result.stdout.strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+
+def _read_commit_hash_cache(git_hash):
+    try:
+        commit_hash, hash_type = json.loads(COMMIT_HASH_CACHE_PATH.read_bytes())[git_hash]
+        return commit_hash, hash_type
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _write_commit_hash_cache(git_hash, commit_hash, hash_type):
+    # Only the current commit is kept
+    try:
+        COMMIT_HASH_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = COMMIT_HASH_CACHE_PATH.with_name(COMMIT_HASH_CACHE_PATH.name + '.tmp')
+        tmp_path.write_text(json.dumps({git_hash: [commit_hash, hash_type]}))
+        os.replace(tmp_path, COMMIT_HASH_CACHE_PATH)
+    except OSError:
+        pass
+
+
+def get_dvc_commit_hash():
+    """Get DVC commit hash if DVC is initialized, otherwise return git hash."""
+    # A commit read from .git keys the cached result of the lookup below
+    head_hash = _read_git_head()
+    if head_hash:
+        cached = _read_commit_hash_cache(head_hash)
+        if cached is not None:
+            return cached
+
+    commit_hash, hash_type = None, None
+
+    # First try to get DVC commit hash
+    try:
+        result = subprocess.run(
+            ['dvc', 'rev-parse', 'HEAD'],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        dvc_hash = result.stdout.strip()
+        if dvc_hash:
+            commit_hash, hash_type = dvc_hash, 'dvc'
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        pass
+
+    # Fallback to git commit hash
+    if commit_hash is None:
+        git_hash = head_hash or get_git_commit_hash()
+        if git_hash:
+            commit_hash, hash_type = git_hash, 'git'
+
+    if head_hash and commit_hash:
+        _write_commit_hash_cache(head_hash, commit_hash, hash_type)
+    return commit_hash, hash_type
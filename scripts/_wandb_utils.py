@@ -0,0 +1,233 @@
+"""
+Shared WandB connection for the training monitoring task scripts (4.2.1-4.2.3).
+
+Creates the public API client and resolves the entity runs are looked up
+under, once per process:
+
+    from _wandb_utils import get_api_and_entity, get_run
+    api, entity = get_api_and_entity(project_name)
+    run = get_run(api, project_name, entity)  # the most recent run
+
+The id of the most recent run is cached on disk for a few minutes, so
+retries of a task skip the runs query. The metric history each task scans is
+cached per run (read_history_cache()/write_history_cache()), so later calls
+only fetch rows logged since.
+"""
+
+import os
+import json
+import time
+import getpass
+import hashlib
+import functools
+from pathlib import Path
+
+# Optional: faster JSON for the history caches and the piped task results
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Runs that are logging or have logged a history; crashed/failed/killed runs
+# are kept since their partial history is what the monitors need to inspect
+RUN_STATE_FILTERS = {'state': {'$in': ['running', 'finished', 'crashed', 'failed', 'killed']}}
+
+LAST_RUN_CACHE_PATH = Path.home() / ".cache" / "sam3" / "wandb_last_run.json"
+LAST_RUN_CACHE_TTL = 10 * 60
+
+# Per-run caches of fetched metric history
+HISTORY_CACHE_DIR = Path.home() / ".cache" / "sam3"
+
+
+def json_dumps(obj):
+    """Encode obj as JSON, using orjson when available (it writes NaN/inf as null)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode('utf-8')
+    return json.dumps(obj)
+
+
+def json_loads(data):
+    """Decode JSON bytes, using orjson when available; NaN/Infinity literals fall back to json."""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def _query_runs(api, path, **kwargs):
+    """api.runs(path) restricted to RUN_STATE_FILTERS, without sweep data where supported."""
+    try:
+        return api.runs(path, filters=RUN_STATE_FILTERS, include_sweeps=False, **kwargs)
+    except TypeError:
+        # include_sweeps is not accepted by older wandb versions
+        return api.runs(path, filters=RUN_STATE_FILTERS, **kwargs)
+
+
+def _read_last_run_cache(path):
+    """Return the cached most recent run id of path ("entity/project"), or None if missing or stale."""
+    try:
+        entry = json.loads(LAST_RUN_CACHE_PATH.read_bytes())[path]
+        if time.time() - entry['time'] >= LAST_RUN_CACHE_TTL:
+            return None
+        return entry['run_id']
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _write_last_run_cache(path, run_id):
+    try:
+        cached = json.loads(LAST_RUN_CACHE_PATH.read_bytes())
+        if not isinstance(cached, dict):
+            cached = {}
+    except (OSError, ValueError):
+        cached = {}
+    cached[path] = {'run_id': run_id, 'time': time.time()}
+    try:
+        LAST_RUN_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = LAST_RUN_CACHE_PATH.with_name(LAST_RUN_CACHE_PATH.name + '.tmp')
+        tmp_path.write_text(json.dumps(cached))
+        os.replace(tmp_path, LAST_RUN_CACHE_PATH)
+    except OSError:
+        pass
+
+
+def latest_run(api, entity, project_name):
+    """
+    Return the most recently created run of the project in RUN_STATE_FILTERS, or None.
+
+    The run id is cached in LAST_RUN_CACHE_PATH for LAST_RUN_CACHE_TTL seconds.
+    A cached run is only trusted while it is still running: once it has
+    finished or crashed, a restarted training may have created a newer run,
+    so the runs are queried again.
+    """
+    path = f"{entity}/{project_name}"
+    run_id = _read_last_run_cache(path)
+    if run_id is not None:
+        try:
+            run = api.run(f"{path}/{run_id}")
+            if getattr(run, 'state', None) == 'running':
+                return run
+        except Exception:
+            pass
+
+    runs = _query_runs(api, path, order="-created_at", per_page=1)
+    if not runs:
+        return None
+    run = runs[0]
+    _write_last_run_cache(path, run.id)
+    return run
+
+
+# Resolved runs by (entity, project, run_id); each metric fetch reuses the run
+_RUNS = {}
+
+
+def get_run(api, project_name, entity, run_id=None):
+    """Return the WandB run run_id (or the most recent run), or None if it cannot be resolved."""
+    key = (entity, project_name, run_id)
+    if key not in _RUNS:
+        run = None
+        try:
+            if run_id:
+                run = api.run(f"{entity}/{project_name}/{run_id}")
+            else:
+                run = latest_run(api, entity, project_name)
+        except Exception:
+            pass
+        _RUNS[key] = run
+    return _RUNS[key]
+
+
+def history_cache_path(prefix, run_path, keys):
+    """Return the history cache file of a run ("entity/project/run_id") and set of history keys."""
+    digest = hashlib.sha1('|'.join([run_path] + sorted(keys)).encode('utf-8')).hexdigest()[:16]
+    return HISTORY_CACHE_DIR / f"{prefix}_{digest}.json"
+
+
+def new_history_cache(keys):
+    """An empty history cache: {'last_step': WandB _step of the last cached row, 'rows': {key: [...]}}."""
+    return {'last_step': -1, 'rows': {key: [] for key in keys}}
+
+
+def read_history_cache(cache_path, keys):
+    """Return the cached history of exactly these keys (see new_history_cache()), or None if missing or invalid."""
+    try:
+        cached = json_loads(cache_path.read_bytes())
+        if sorted(cached['rows']) != sorted(keys):
+            return None
+        if len({len(column) for column in cached['rows'].values()}) > 1:
+            return None
+        int(cached['last_step'])  # raises on a corrupt value
+        return cached
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def write_history_cache(cache_path, cached):
+    """Atomically store a history cache; failures only cost a full fetch next time."""
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+        # json keeps inf values (orjson would write null)
+        tmp_path.write_text(json.dumps(cached))
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+
+def _viewer_entity(api):
+    """Entity (or username) of the logged-in user, from the API viewer; None if unavailable."""
+    try:
+        viewer = api.viewer()
+        if isinstance(viewer, dict):
+            return viewer.get('entity') or viewer.get('username')
+        entity = getattr(viewer, 'entity', None) or getattr(viewer, 'username', None)
+        if entity is None and hasattr(viewer, '__dict__'):
+            entity = viewer.__dict__.get('entity') or viewer.__dict__.get('username')
+        return entity
+    except Exception as e:
+        print(f"Warning: Could not get entity from viewer: {e}")
+        return None
+
+
+@functools.lru_cache(maxsize=1)
+def get_api_and_entity(project_name):
+    """
+    Return (wandb.Api(), entity) for project_name.
+
+    The entity comes from the API's default entity, the viewer, WANDB_ENTITY,
+    the path of a run in the project, or finally the system username.
+    Raises if the API client cannot be created (e.g. not logged in).
+    """
+    import wandb
+
+    api = wandb.Api()
+
+    # default_entity is resolved (and cached) by the client itself
+    try:
+        entity = api.default_entity
+    except Exception:
+        entity = None
+    entity = entity or _viewer_entity(api)
+
+    # Fallback: use environment variable or try to infer from project
+    if not entity:
+        entity = os.getenv('WANDB_ENTITY')
+        if not entity:
+            try:
+                test_runs = _query_runs(api, project_name, per_page=1)
+                if test_runs:
+                    run_path = str(test_runs[0])
+                    if '/' in run_path:
+                        entity = run_path.split('/')[0]
+            except Exception:
+                pass
+
+    # Final fallback: use username from system
+    if not entity:
+        entity = getpass.getuser()
+        print(f"Warning: Using system username as entity: {entity}")
+
+    return api, entity
@@ -0,0 +1,111 @@
+"""
+Shared PyYAML loader/dumper for the config editing task scripts (3.2.2-3.3.3).
+
+The libyaml-backed CSafeLoader/CSafeDumper are resolved once at import time
+and fall back to the pure-Python classes when PyYAML was built without
+libyaml, so each task script only needs:
+
+    from _yaml import load_yaml, dump_yaml
+
+load_yaml_cached() additionally keeps a pickled copy of the parsed document
+next to the file, so back-to-back tasks reading the same unchanged config
+skip the YAML parse. write_yaml_text() publishes a rewritten config
+atomically and drops that sidecar.
+"""
+
+import os
+import stat
+import pickle
+import functools
+import tempfile
+
+import yaml
+
+SafeLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+SafeDumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+
+def load_yaml(stream):
+    """Parse a YAML document (str, bytes or file object) with the safe loader."""
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def dump_yaml(data, stream=None, **kwargs):
+    """Serialize data with the safe dumper; returns a str when stream is None."""
+    return yaml.dump(data, stream, Dumper=SafeDumper, **kwargs)
+
+
+def _yaml_cache_path(path):
+    return path.with_suffix(path.suffix + '.pkl')
+
+
+def load_yaml_cached(path):
+    """
+    Parse the YAML file at path, reusing its pickled sidecar when still valid.
+
+    The sidecar is keyed by the file's inode, mtime and size, so any rewrite
+    of the file (in place or via os.replace) invalidates it. Within one
+    process (e.g. configure_training.py) repeat loads of the unchanged file
+    return the same parsed dict; callers that edit it write the file back.
+    """
+    st = os.stat(path)
+    return _load_yaml_keyed(path, (st.st_ino, st.st_mtime_ns, st.st_size))
+
+
+@functools.lru_cache(maxsize=8)
+def _load_yaml_keyed(path, key):
+    cache_path = _yaml_cache_path(path)
+    try:
+        with open(cache_path, 'rb') as f:
+            cached_key, data = pickle.load(f)
+        if cached_key == key:
+            return data
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+        pass
+
+    with open(path, 'rb') as f:
+        data = load_yaml(f)
+
+    try:
+        tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((key, data), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+    return data
+
+
+def invalidate_yaml_cache(path):
+    """Drop the pickled sidecar of path (call after rewriting the file)."""
+    try:
+        os.unlink(_yaml_cache_path(path))
+    except FileNotFoundError:
+        pass
+
+
+def write_yaml_text(path, text):
+    """
+    Atomically replace the file at path with text (UTF-8) and drop its cache.
+
+    The text goes to a sibling temp file that is fsynced and then renamed over
+    path, so a failed write never leaves a truncated config behind.
+    """
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = 0o644
+    tmp = tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', dir=path.parent,
+                                      prefix=path.name + '.', suffix='.tmp', delete=False)
+    try:
+        with tmp:
+            tmp.write(text)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+            # NamedTemporaryFile creates the file 0600; keep the original mode
+            os.fchmod(tmp.fileno(), mode)
+        os.replace(tmp.name, path)
+    except BaseException:
+        os.unlink(tmp.name)
+        raise
+    invalidate_yaml_cache(path)
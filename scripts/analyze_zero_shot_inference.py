@@ -122,33 +122,34 @@ def analyze_false_positives(gt_data, pred_data, negative_image_ids):
         for img in gt_data["images"]:
             image_id_to_filename[img["id"]] = img.get("file_name", f"image_{img['id']}")
     
-    for img_id in negative_image_ids:
-        if img_id in predictions_by_image:
-            detections = predictions_by_image[img_id]
-            num_detections = len(detections)
+    # Only negative images that received predictions can hold false positives;
+    # one C-level set intersection replaces a dict probe per negative image
+    for img_id in predictions_by_image.keys() & negative_image_ids:
+        detections = predictions_by_image[img_id]
+        num_detections = len(detections)
+        
+        if num_detections > 0:
+            false_positive_stats["negative_images_with_detections"] += 1
+            false_positive_stats["total_false_positives"] += num_detections
+            false_positive_stats["max_detections_on_single_image"] = max(
+                false_positive_stats["max_detections_on_single_image"],
+                num_detections
+            )
+            
+            scores = [det.get("score", 0.0) for det in detections]
+            avg_score = sum(scores) / len(scores) if scores else 0.0
+            max_score = max(scores) if scores else 0.0
+            
+            false_positive_stats["false_positive_images"].append({
+                "image_id": img_id,
+                "file_name": image_id_to_filename.get(img_id, f"image_{img_id}"),
+                "num_detections": num_detections,
+                "avg_score": avg_score,
+                "max_score": max_score,
+                "scores": scores
+            })
             
-            if num_detections > 0:
-                false_positive_stats["negative_images_with_detections"] += 1
-                false_positive_stats["total_false_positives"] += num_detections
-                false_positive_stats["max_detections_on_single_image"] = max(
-                    false_positive_stats["max_detections_on_single_image"],
-                    num_detections
-                )
-                
-                scores = [det.get("score", 0.0) for det in detections]
-                avg_score = sum(scores) / len(scores) if scores else 0.0
-                max_score = max(scores) if scores else 0.0
-                
-                false_positive_stats["false_positive_images"].append({
-                    "image_id": img_id,
-                    "file_name": image_id_to_filename.get(img_id, f"image_{img_id}"),
-                    "num_detections": num_detections,
-                    "avg_score": avg_score,
-                    "max_score": max_score,
-                    "scores": scores
-                })
-                
-                false_positive_stats["presence_scores"].extend(scores)
+            false_positive_stats["presence_scores"].extend(scores)
     
     if false_positive_stats["total_negative_images"] > 0:
         false_positive_stats["avg_detections_per_negative_image"] = (
@@ -0,0 +1,84 @@
+#!/usr/bin/env -S uv run python
+"""
+Configure Fine-tuning (Tasks 3.2.2-3.2.4 in one pass)
+
+Applies the dataset paths (3.2.2), prompt mode (3.2.3) and hardware
+optimization (3.2.4) edits to the fine-tuning config with a single
+interpreter start, a single parse and a single write. The task scripts
+remain the standalone entrypoints for each phase.
+
+Usage:
+    uv run python scripts/configure_finetune.py [--phase {paths,prompt,hw,all}]
+
+Created: 2025-12-12
+"""
+
+import sys
+import argparse
+import functools
+
+from _config_session import run_all
+from task_322_define_dataset_paths import (
+    project_root, TRAIN_JSON, VAL_JSON, IMG_DIR, update_dataset_paths, verify_paths,
+)
+from task_323_set_prompt_mode import verify_prompt_mode
+from task_324_hardware_optimization import _maybe_load_env, configure_hardware_optimization
+
+PHASES = ('paths', 'prompt', 'hw')
+
+
+def main():
+    """Apply the selected configuration phases to the SAM3 chicken fine-tuning config."""
+    parser = argparse.ArgumentParser(description="Configure Fine-tuning (Tasks 3.2.2-3.2.4)")
+    parser.add_argument('--phase', choices=PHASES + ('all',), default='all',
+                        help='Phase to apply: paths (3.2.2), prompt (3.2.3), hw (3.2.4) or all')
+    args = parser.parse_args()
+    phases = PHASES if args.phase == 'all' else (args.phase,)
+
+    print("=" * 70)
+    print("Configure Fine-tuning (Tasks 3.2.2-3.2.4)")
+    print("=" * 70)
+    print()
+
+    config_path = project_root / "configs" / "sam3_chicken_finetune.yaml"
+    print(f"Config file: {config_path}")
+    print(f"Phases: {', '.join(phases)}")
+    print()
+
+    mutators = []
+
+    if 'paths' in phases:
+        print("Verifying dataset paths exist...")
+        errors, warnings = verify_paths(TRAIN_JSON, VAL_JSON, IMG_DIR)
+        for message in errors + warnings:
+            print(f"  WARNING: {message}")
+        print()
+        mutators.append(functools.partial(
+            update_dataset_paths, train_json=TRAIN_JSON, val_json=VAL_JSON, img_dir=IMG_DIR))
+
+    if 'prompt' in phases:
+        mutators.append(verify_prompt_mode)
+
+    if 'hw' in phases:
+        _maybe_load_env()
+        mutators.append(configure_hardware_optimization)
+
+    success = run_all(config_path, *mutators)
+
+    if success:
+        print()
+        print("✓ Fine-tuning configuration completed successfully")
+        print()
+        print("Next steps:")
+        print("  - Task 3.3.1: Configure learning rate schedule")
+        print("  - Task 3.3.2: Engineer loss weights (especially focal_loss_weight)")
+        print("  - Task 3.3.3: Freeze backbone")
+        return 0
+    else:
+        print()
+        print("✗ Configuration failed. Please review the messages above.")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
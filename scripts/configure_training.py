@@ -0,0 +1,75 @@
+#!/usr/bin/env -S uv run python
+"""
+Configure Training (Tasks 3.3.1-3.3.3 in one pass)
+
+Applies the learning rate schedule (3.3.1), loss weights (3.3.2) and
+backbone freeze (3.3.3) edits to the fine-tuning config with a single
+parse and a single write. The task scripts remain the standalone
+entrypoints for each phase.
+
+Usage:
+    uv run python scripts/configure_training.py [--phase {lr,loss,freeze,all}]
+
+Created: 2025-12-12
+"""
+
+import sys
+import argparse
+
+from _config_session import ConfigSession
+from _paths import CHICKEN_CONFIG
+from task_331_configure_learning_rate import configure_learning_rate, print_lr_summary
+from task_332_engineer_loss_weights import update_loss_weights
+from task_333_freeze_backbone import freeze_backbone
+
+PHASES = ('lr', 'loss', 'freeze')
+
+
+def main():
+    """Apply the selected training phases to the SAM3 chicken fine-tuning config."""
+    parser = argparse.ArgumentParser(description="Configure Training (Tasks 3.3.1-3.3.3)")
+    parser.add_argument('--phase', choices=PHASES + ('all',), default='all',
+                        help='Phase to apply: lr (3.3.1), loss (3.3.2), freeze (3.3.3) or all')
+    args = parser.parse_args()
+    phases = PHASES if args.phase == 'all' else (args.phase,)
+
+    print("=" * 70)
+    print("Configure Training (Tasks 3.3.1-3.3.3)")
+    print("=" * 70)
+    print()
+
+    config_path = CHICKEN_CONFIG
+    print(f"Config file: {config_path}")
+    print(f"Phases: {', '.join(phases)}")
+    print()
+
+    session = ConfigSession(config_path)
+    if not session.load():
+        return 1
+
+    # Each phase edits the parsed config in place; the file is written once
+    if 'lr' in phases:
+        session.mutate(configure_learning_rate)
+    if 'loss' in phases:
+        print("\nUpdating loss weights...")
+        session.mutate(update_loss_weights)
+    if 'freeze' in phases:
+        print("\nFreezing vision backbone...")
+        session.mutate(freeze_backbone)
+
+    print()
+    if not session.save():
+        print()
+        print("✗ Configuration failed. Please review the errors above.")
+        return 1
+
+    if 'lr' in phases:
+        print_lr_summary(session.config_data)
+
+    print()
+    print("✓ Training configuration completed successfully")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
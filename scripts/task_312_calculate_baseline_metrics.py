@@ -10,64 +10,40 @@ and installed via 'uv sync' before running this script.
 """
 
 import sys
-import json
 import os
-from pathlib import Path
-from dotenv import load_dotenv
+import inspect
+from functools import lru_cache
+from _common import project_root, config, dump_json, find_prediction_file, load_json
 
-# Get project root directory
-project_root = Path(__file__).parent.parent
 
-# Add project root to Python path to import config
-sys.path.insert(0, str(project_root))
+@lru_cache(maxsize=None)
+def load_gt_cached(gt_path):
+    """Parse the ground truth JSON once per process."""
+    return load_json(gt_path)
 
-# Load environment variables from .env file
-env_path = project_root / '.env'
-if env_path.exists():
-    load_dotenv(env_path)
 
-# Import configuration from config.py
-try:
-    import config
-except ImportError:
-    print("Error: config.py not found. Please create config.py with required settings.", file=sys.stderr)
-    sys.exit(1)
+def evaluator_gt_kwargs(evaluator_cls, gt_path):
+    """
+    Build the ground truth argument for evaluator_cls.
 
-# Add sam3 to path for imports
-sam3_path = project_root / "sam3"
-if sam3_path.exists():
-    sys.path.insert(0, str(sam3_path))
-
-
-def find_prediction_file(results_dir):
-    """Find the prediction JSON file from evaluation results."""
-    results_path = Path(results_dir)
-    if not results_path.exists():
-        return None
-    
-    # Look for COCO format prediction files
-    # Typically in dumps/chicken_val/coco_predictions_segm.json
-    possible_paths = [
-        results_path / "dumps" / "chicken_val" / "coco_predictions_segm.json",
-        results_path / "dumps" / "chicken_val" / "coco_predictions_bbox.json",
-        results_path / "coco_predictions_segm.json",
-        results_path / "coco_predictions_bbox.json",
-    ]
-    
-    for path in possible_paths:
-        if path.exists():
-            return path
-    
-    # Try to find any JSON file with "prediction" or "coco" in the name
-    for json_file in results_path.rglob("*.json"):
-        if "prediction" in json_file.name.lower() or "coco" in json_file.name.lower():
-            return json_file
-    
-    return None
+    If the evaluator accepts preloaded ground truth, hand it the cached dict so
+    the segm run and the bbox fallback share a single parse; otherwise pass the
+    path as before.
+    """
+    params = inspect.signature(evaluator_cls.__init__).parameters
+    for name in ("gt_data", "gt_dict"):
+        if name in params:
+            return {name: load_gt_cached(str(gt_path))}
+    return {"gt_path": str(gt_path)}
 
 
 def calculate_metrics_from_evaluator(gt_path, pred_path, iou_type="segm"):
     """Calculate metrics using CGF1Evaluator."""
+    # sam3 is only needed for evaluation; keep it off sys.path until then
+    sam3_path = project_root / "sam3"
+    if sam3_path.exists() and str(sam3_path) not in sys.path:
+        sys.path.insert(0, str(sam3_path))
+    
     try:
         from sam3.eval.cgf1_eval import CGF1Evaluator
         
@@ -76,7 +52,7 @@ def calculate_metrics_from_evaluator(gt_path, pred_path, iou_type="segm"):
         print()
         
         evaluator = CGF1Evaluator(
-            gt_path=str(gt_path),
+            **evaluator_gt_kwargs(CGF1Evaluator, gt_path),
             verbose=True,
             iou_type=iou_type
         )
@@ -247,8 +223,7 @@ def main():
         "pred_path": str(pred_path)
     }
     
-    with open(results_file, 'w') as f:
-        json.dump(output_metrics, f, indent=2)
+    dump_json(output_metrics, results_file)
     
     print(f"✓ Metrics saved to: {results_file}")
     print()
@@ -10,142 +10,206 @@ and installed via 'uv sync' before running this script.
 """
 
 import sys
-import json
 import os
-from pathlib import Path
-from collections import defaultdict
-from dotenv import load_dotenv
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import numpy as np
+import pandas as pd
+from _common import project_root, config, dump_json, find_prediction_file, load_json
 
-# Get project root directory
-project_root = Path(__file__).parent.parent
-
-# Add project root to Python path to import config
-sys.path.insert(0, str(project_root))
-
-# Load environment variables from .env file
-env_path = project_root / '.env'
-if env_path.exists():
-    load_dotenv(env_path)
-
-# Import configuration from config.py
 try:
-    import config
+    from numba import njit
 except ImportError:
-    print("Error: config.py not found. Please create config.py with required settings.", file=sys.stderr)
-    sys.exit(1)
+    njit = None
 
-# Add sam3 to path for imports
-sam3_path = project_root / "sam3"
-if sam3_path.exists():
-    sys.path.insert(0, str(sam3_path))
 
+def index_gt(gt_data):
+    """
+    Index the ground truth in one pass over the images.
 
-def find_prediction_file(results_dir):
-    """Find the prediction JSON file from evaluation results."""
-    results_path = Path(results_dir)
-    if not results_path.exists():
-        return None
-    
-    # Look for COCO format prediction files
-    possible_paths = [
-        results_path / "dumps" / "chicken_val" / "coco_predictions_segm.json",
-        results_path / "dumps" / "chicken_val" / "coco_predictions_bbox.json",
-        results_path / "coco_predictions_segm.json",
-        results_path / "coco_predictions_bbox.json",
-    ]
-    
-    for path in possible_paths:
-        if path.exists():
-            return path
-    
-    # Try to find any JSON file with "prediction" or "coco" in the name
-    for json_file in results_path.rglob("*.json"):
-        if "prediction" in json_file.name.lower() or "coco" in json_file.name.lower():
-            return json_file
+    Returns:
+        (negative_image_ids, image_id_to_filename) where negative_image_ids is a
+        frozenset of "Not-Chicken" image IDs (images with no annotations) and
+        image_id_to_filename maps every image ID to its file name.
+    """
+    # Build a set of image IDs that have annotations
+    images_with_annotations = {ann["image_id"] for ann in gt_data.get("annotations", [])}
     
-    return None
+    # Negative images are those NOT in the set above
+    image_id_to_filename = {}
+    negative_image_ids = []
+    for img in gt_data.get("images", []):
+        img_id = img["id"]
+        image_id_to_filename[img_id] = img.get("file_name", f"image_{img_id}")
+        if img_id not in images_with_annotations:
+            negative_image_ids.append(img_id)
+    
+    return frozenset(negative_image_ids), image_id_to_filename
+
 
+# Below this many predictions, process start-up and pickling cost more than
+# the grouping itself, so aggregation stays in a single process.
+PARALLEL_AGGREGATION_MIN_PREDICTIONS = 500_000
 
-def identify_negative_images(gt_data):
+
+def _negative_score_columns(predictions, sorted_image_ids):
     """
-    Identify images that are "Not-Chicken" (negative samples).
-    These are images with no annotations in the ground truth.
+    Return an (image_id, score) frame of the predictions on images in sorted_image_ids.
+
+    COCO image IDs fit in int32, which halves the memory traffic of the ID
+    column (and the groupby over it). Scores stay float64: they are reported
+    and compared against FP_MIN_SCORE as logged, and float32 would turn 0.9
+    into 0.8999999761581421.
+    A missing or null image_id becomes -1, which matches no image.
     """
-    # Build a set of image IDs that have annotations
-    images_with_annotations = set()
-    if "annotations" in gt_data:
-        for ann in gt_data["annotations"]:
-            images_with_annotations.add(ann["image_id"])
+    count = len(predictions)
+    image_ids = (pred.get("image_id") for pred in predictions)
+    frame = pd.DataFrame({
+        "image_id": np.fromiter(
+            (-1 if img_id is None else img_id for img_id in image_ids), dtype=np.int32, count=count
+        ),
+        "score": np.fromiter(
+            (pred.get("score", 0.0) for pred in predictions), dtype=np.float64, count=count
+        ),
+    })
+    
+    # Binary-search membership against the sorted ID array
+    if len(sorted_image_ids) == 0:
+        return frame.iloc[0:0]
+    img_ids = frame["image_id"].to_numpy()
+    positions = np.searchsorted(sorted_image_ids, img_ids)
+    in_image_ids = sorted_image_ids[np.minimum(positions, len(sorted_image_ids) - 1)] == img_ids
+    return frame[in_image_ids]
+
+
+def _reduce_scores(img_ids, scores, sorted_image_ids):
+    """
+    Per-image count/sum/min/max of scores in one pass.
+
+    img_ids must all be present in sorted_image_ids; the outputs are indexed by
+    position in sorted_image_ids. Compiled with Numba when it is installed.
+    """
+    n = len(sorted_image_ids)
+    counts = np.zeros(n, dtype=np.int64)
+    sums = np.zeros(n, dtype=np.float64)
+    mins = np.full(n, np.inf)
+    maxs = np.full(n, -np.inf)
+    positions = np.searchsorted(sorted_image_ids, img_ids)
+    for i in range(len(img_ids)):
+        pos = positions[i]
+        score = scores[i]
+        counts[pos] += 1
+        sums[pos] += score
+        if score < mins[pos]:
+            mins[pos] = score
+        if score > maxs[pos]:
+            maxs[pos] = score
+    return counts, sums, mins, maxs
+
+
+if njit is not None:
+    _reduce_scores = njit(cache=True)(_reduce_scores)
+
+
+def group_negative_scores(pred_data, negative_image_ids, num_workers=None):
+    """
+    Aggregate prediction scores on negative images per image ID.
+
+    Large prediction sets are split into contiguous shards whose columns are
+    extracted and filtered in worker processes; the shards are concatenated in
+    order before a single groupby, so each image's scores keep their order.
+    
+    Returns:
+        DataFrame indexed by image_id with size/sum/min/max/scores columns.
+        No predictions on negative images give an empty frame:
+    
+    >>> group_negative_scores([], frozenset({1, 2})).empty
+    True
+    >>> group_negative_scores([{"image_id": 3, "score": 0.9}], frozenset({1, 2})).empty
+    True
+    >>> group_negative_scores([{"image_id": None, "score": 0.9}], frozenset({1, 2})).empty
+    True
+    """
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
     
-    # Negative images are those NOT in the set above
-    negative_image_ids = set()
-    if "images" in gt_data:
-        for img in gt_data["images"]:
-            img_id = img["id"]
-            if img_id not in images_with_annotations:
-                negative_image_ids.add(img_id)
-    
-    return negative_image_ids
+    negative_ids_sorted = np.sort(
+        np.fromiter(negative_image_ids, dtype=np.int32, count=len(negative_image_ids))
+    )
+    
+    if num_workers <= 1 or len(pred_data) < PARALLEL_AGGREGATION_MIN_PREDICTIONS:
+        frame = _negative_score_columns(pred_data, negative_ids_sorted)
+    else:
+        shard_size = -(-len(pred_data) // num_workers)
+        shards = [pred_data[i:i + shard_size] for i in range(0, len(pred_data), shard_size)]
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            frame = pd.concat(
+                executor.map(_negative_score_columns, shards, repeat(negative_ids_sorted)),
+                ignore_index=True
+            )
+    
+    if njit is None:
+        grouped = frame.groupby("image_id", sort=False)["score"]
+        per_image = grouped.agg(["size", "sum", "min", "max"])
+        per_image["scores"] = grouped.agg(lambda scores: scores.tolist())
+        return per_image
+    
+    img_ids = frame["image_id"].to_numpy()
+    scores = frame["score"].to_numpy()
+    counts, sums, mins, maxs = _reduce_scores(img_ids, scores, negative_ids_sorted)
+    present = counts > 0
+    
+    # A stable sort by image ID lines each image's scores up with the present IDs
+    order = np.argsort(img_ids, kind="stable")
+    split_points = np.cumsum(counts[present])[:-1]
+    per_image = pd.DataFrame(
+        {"size": counts[present], "sum": sums[present], "min": mins[present], "max": maxs[present]},
+        index=pd.Index(negative_ids_sorted[present], name="image_id")
+    )
+    if len(scores) == 0:
+        # np.split() of an empty array is [array([])], which would add a row
+        per_image["scores"] = pd.Series(dtype=object)
+        return per_image
+    per_image["scores"] = [chunk.tolist() for chunk in np.split(scores[order], split_points)]
+    return per_image
 
 
-def analyze_false_positives(gt_data, pred_data, negative_image_ids):
+def analyze_false_positives(pred_data, negative_image_ids, image_id_to_filename,
+                            min_score=0.0, min_count=1):
     """
     Analyze false positives: detections on negative (Not-Chicken) images.
+
+    Images with fewer than min_count detections or a max score below min_score
+    are counted in the aggregate stats but not listed in false_positive_images.
     """
-    # Group predictions by image_id
-    predictions_by_image = defaultdict(list)
-    for pred in pred_data:
-        img_id = pred.get("image_id")
-        if img_id is not None:
-            predictions_by_image[img_id].append(pred)
+    # Aggregate prediction scores on negative images by image_id
+    per_image = group_negative_scores(pred_data, negative_image_ids)
     
     # Analyze false positives on negative images
     false_positive_stats = {
         "total_negative_images": len(negative_image_ids),
-        "negative_images_with_detections": 0,
-        "total_false_positives": 0,
+        "negative_images_with_detections": len(per_image),
+        "total_false_positives": int(per_image["size"].sum()),
         "false_positive_images": [],
         "avg_detections_per_negative_image": 0.0,
-        "max_detections_on_single_image": 0,
-        "presence_scores": []
+        "max_detections_on_single_image": int(per_image["size"].max()) if len(per_image) else 0,
     }
     
-    # Create image ID to file name mapping
-    image_id_to_filename = {}
-    if "images" in gt_data:
-        for img in gt_data["images"]:
-            image_id_to_filename[img["id"]] = img.get("file_name", f"image_{img['id']}")
-    
-    # Analyze each negative image
-    for img_id in negative_image_ids:
-        if img_id in predictions_by_image:
-            detections = predictions_by_image[img_id]
-            num_detections = len(detections)
-            
-            if num_detections > 0:
-                false_positive_stats["negative_images_with_detections"] += 1
-                false_positive_stats["total_false_positives"] += num_detections
-                false_positive_stats["max_detections_on_single_image"] = max(
-                    false_positive_stats["max_detections_on_single_image"],
-                    num_detections
-                )
-                
-                # Extract scores (presence or confidence scores)
-                scores = [det.get("score", 0.0) for det in detections]
-                avg_score = sum(scores) / len(scores) if scores else 0.0
-                max_score = max(scores) if scores else 0.0
-                
-                false_positive_stats["false_positive_images"].append({
-                    "image_id": img_id,
-                    "file_name": image_id_to_filename.get(img_id, f"image_{img_id}"),
-                    "num_detections": num_detections,
-                    "avg_score": avg_score,
-                    "max_score": max_score,
-                    "scores": scores
-                })
-                
-                # Track presence scores
-                false_positive_stats["presence_scores"].extend(scores)
+    # Analyze each negative image with detections
+    for img_id, num_detections, score_sum, _, max_score, scores in per_image.itertuples(name=None):
+        if num_detections < min_count or max_score < min_score:
+            continue
+        img_id = int(img_id)
+        # Scores are presence or confidence scores
+        false_positive_stats["false_positive_images"].append({
+            "image_id": img_id,
+            "file_name": image_id_to_filename.get(img_id, f"image_{img_id}"),
+            "num_detections": int(num_detections),
+            "avg_score": float(score_sum / num_detections),
+            "max_score": float(max_score),
+            "scores": scores
+        })
     
     # Calculate average detections per negative image
     if false_positive_stats["total_negative_images"] > 0:
@@ -155,11 +219,12 @@ def analyze_false_positives(gt_data, pred_data, negative_image_ids):
         )
     
     # Calculate statistics on presence scores
-    if false_positive_stats["presence_scores"]:
-        scores = false_positive_stats["presence_scores"]
-        false_positive_stats["avg_presence_score"] = sum(scores) / len(scores)
-        false_positive_stats["min_presence_score"] = min(scores)
-        false_positive_stats["max_presence_score"] = max(scores)
+    if false_positive_stats["total_false_positives"] > 0:
+        false_positive_stats["avg_presence_score"] = float(
+            per_image["sum"].sum() / false_positive_stats["total_false_positives"]
+        )
+        false_positive_stats["min_presence_score"] = float(per_image["min"].min())
+        false_positive_stats["max_presence_score"] = float(per_image["max"].max())
     else:
         false_positive_stats["avg_presence_score"] = 0.0
         false_positive_stats["min_presence_score"] = 0.0
@@ -223,12 +288,12 @@ def generate_report(stats, output_file):
         "TOP FALSE POSITIVE IMAGES (by detection count):",
     ])
     
-    # Sort false positive images by number of detections (descending)
-    sorted_fp_images = sorted(
+    # Top 10 false positive images by number of detections (descending)
+    sorted_fp_images = heapq.nlargest(
+        10,
         stats['false_positive_images'],
-        key=lambda x: x['num_detections'],
-        reverse=True
-    )[:10]  # Show top 10
+        key=lambda x: x['num_detections']
+    )
     
     if sorted_fp_images:
         for i, fp_img in enumerate(sorted_fp_images, 1):
@@ -254,8 +319,8 @@ def generate_report(stats, output_file):
     # Save to file
     if output_file:
         output_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(output_file, 'w') as f:
-            f.write(report_text)
+        with open(output_file, 'wb') as f:
+            f.write(report_text.encode('utf-8'))
         print(f"\n✓ Report saved to: {output_file}")
     
     return report_text
@@ -281,8 +346,7 @@ def main():
     # Load ground truth
     print(f"Loading ground truth from: {val_json_path}")
     try:
-        with open(val_json_path, 'r') as f:
-            gt_data = json.load(f)
+        gt_data = load_json(val_json_path)
     except Exception as e:
         print(f"ERROR: Failed to load ground truth JSON: {e}", file=sys.stderr)
         return 1
@@ -298,7 +362,7 @@ def main():
         print()
         
         # Still identify negative images for reference
-        negative_image_ids = identify_negative_images(gt_data)
+        negative_image_ids, _ = index_gt(gt_data)
         print(f"Found {len(negative_image_ids)} negative images (Not-Chicken) in validation set.")
         print("Run zero-shot inference (task 3.1.1) to analyze false positives.")
         return 1
@@ -306,8 +370,7 @@ def main():
     # Load predictions
     print(f"Loading predictions from: {pred_path}")
     try:
-        with open(pred_path, 'r') as f:
-            pred_data = json.load(f)
+        pred_data = load_json(pred_path)
         
         # Handle both list format and COCO format
         if isinstance(pred_data, dict) and "annotations" in pred_data:
@@ -325,13 +388,19 @@ def main():
     
     # Identify negative images
     print("Identifying negative images (Not-Chicken)...")
-    negative_image_ids = identify_negative_images(gt_data)
+    negative_image_ids, image_id_to_filename = index_gt(gt_data)
     print(f"Found {len(negative_image_ids)} negative images")
     print()
     
     # Analyze false positives
     print("Analyzing false positives...")
-    stats = analyze_false_positives(gt_data, pred_data, negative_image_ids)
+    stats = analyze_false_positives(
+        pred_data,
+        negative_image_ids,
+        image_id_to_filename,
+        min_score=config.FP_MIN_SCORE,
+        min_count=config.FP_MIN_DETECTIONS
+    )
     print()
     
     # Generate and save report
@@ -346,8 +415,7 @@ def main():
     stats_for_json = stats.copy()
     stats_for_json["negative_image_ids"] = list(negative_image_ids)
     
-    with open(stats_json_file, 'w') as f:
-        json.dump(stats_for_json, f, indent=2)
+    dump_json(stats_for_json, stats_json_file)
     
     print(f"✓ Detailed statistics saved to: {stats_json_file}")
     print()
@@ -10,45 +10,23 @@ and installed via 'uv sync' before running this script.
 """
 
 import sys
-import yaml
+import os
+import stat
+import itertools
 from pathlib import Path
-from dotenv import load_dotenv
+from _config_session import ConfigSession, dig
 
 # Get project root directory
 project_root = Path(__file__).parent.parent
 
-# Add project root to Python path to import config
-sys.path.insert(0, str(project_root))
+# Dataset paths to set (relative to the project root)
+TRAIN_JSON = "data/chicken_train.json"
+VAL_JSON = "data/chicken_val.json"
+IMG_DIR = "data/images"
 
-# Load environment variables from .env file
-env_path = project_root / '.env'
-if env_path.exists():
-    load_dotenv(env_path)
 
-# Import configuration from config.py
-try:
-    import config
-except ImportError:
-    print("Error: config.py not found. Please create config.py with required settings.", file=sys.stderr)
-    sys.exit(1)
-
-
-def update_dataset_paths(config_path, train_json, val_json, img_dir):
-    """Update dataset paths in the configuration file."""
-    
-    # Load existing config
-    if not config_path.exists():
-        print(f"ERROR: Config file not found: {config_path}", file=sys.stderr)
-        print("Please run task 3.2.1 first to create the config file.", file=sys.stderr)
-        return False
-    
-    print(f"Loading configuration from: {config_path}")
-    try:
-        with open(config_path, 'r') as f:
-            config_data = yaml.safe_load(f)
-    except Exception as e:
-        print(f"ERROR: Failed to load config file: {e}", file=sys.stderr)
-        return False
+def update_dataset_paths(config_data, train_json, val_json, img_dir):
+    """Update dataset paths in the loaded configuration (in place)."""
     
     # Update dataset paths in chicken_dataset section
     if 'chicken_dataset' not in config_data:
@@ -61,92 +39,93 @@ def update_dataset_paths(config_path, train_json, val_json, img_dir):
     config_data['chicken_dataset']['img_dir'] = img_dir
     
     # Also update paths in trainer.data sections if they exist
-    if 'trainer' in config_data and 'data' in config_data['trainer']:
-        # Update train dataset
-        if 'train' in config_data['trainer']['data']:
-            train_data = config_data['trainer']['data']['train']
-            if 'dataset' in train_data:
-                train_data['dataset']['img_folder'] = f"${{chicken_dataset.img_dir}}"
-                train_data['dataset']['ann_file'] = f"${{chicken_dataset.train_json}}"
-        
-        # Update val dataset
-        if 'val' in config_data['trainer']['data']:
-            val_data = config_data['trainer']['data']['val']
-            if 'dataset' in val_data:
-                val_data['dataset']['img_folder'] = f"${{chicken_dataset.img_dir}}"
-                val_data['dataset']['ann_file'] = f"${{chicken_dataset.val_json}}"
+    train_dataset = dig(config_data, 'trainer', 'data', 'train', 'dataset')
+    if train_dataset is not None:
+        train_dataset['img_folder'] = "${chicken_dataset.img_dir}"
+        train_dataset['ann_file'] = "${chicken_dataset.train_json}"
+    
+    val_dataset = dig(config_data, 'trainer', 'data', 'val', 'dataset')
+    if val_dataset is not None:
+        val_dataset['img_folder'] = "${chicken_dataset.img_dir}"
+        val_dataset['ann_file'] = "${chicken_dataset.val_json}"
     
     # Update meters/val/chicken/cgf1/pred_file_evaluators if they exist
-    if 'trainer' in config_data and 'meters' in config_data['trainer']:
-        if 'val' in config_data['trainer']['meters']:
-            if 'chicken' in config_data['trainer']['meters']['val']:
-                if 'cgf1' in config_data['trainer']['meters']['val']['chicken']:
-                    cgf1_config = config_data['trainer']['meters']['val']['chicken']['cgf1']
-                    if 'pred_file_evaluators' in cgf1_config:
-                        for evaluator in cgf1_config['pred_file_evaluators']:
-                            if 'gt_path' in evaluator:
-                                evaluator['gt_path'] = f"${{chicken_dataset.val_json}}"
-    
-    # Write updated config back to file
-    print(f"Updating configuration file: {config_path}")
+    evaluators = dig(config_data, 'trainer', 'meters', 'val', 'chicken', 'cgf1', 'pred_file_evaluators')
+    for evaluator in evaluators or ():
+        if 'gt_path' in evaluator:
+            evaluator['gt_path'] = "${chicken_dataset.val_json}"
+    
+    return True
+
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png'}
+
+# The image count is only a sanity check, so stop walking after this many hits
+IMAGE_COUNT_LIMIT = 1024
+
+
+def _walk_images(img_path):
+    """
+    Yield the image files under img_path.
+
+    A single os.scandir walk matches all suffixes at once, and directory/file
+    checks come from the dirent type instead of a stat() per entry.
+    """
+    stack = [str(img_path)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in IMAGE_SUFFIXES and entry.is_file():
+                        yield entry.path
+        except OSError:
+            continue
+
+
+def _probe(path):
+    """stat() path once, returning None if it does not exist (or cannot be reached)."""
     try:
-        # Use yaml.dump with proper formatting
-        yaml_str = yaml.dump(config_data, default_flow_style=False, sort_keys=False, allow_unicode=True, width=1000)
-        
-        # Fix the package header if it exists
-        if not yaml_str.startswith("# @package"):
-            # Try to preserve original header
-            with open(config_path, 'r') as f:
-                original_lines = f.readlines()
-                header_lines = [line for line in original_lines[:5] if line.strip().startswith('#') or line.strip().startswith('defaults:')]
-                if header_lines:
-                    header = ''.join(header_lines)
-                    if not header.strip().endswith('\n'):
-                        header += '\n'
-                    yaml_str = header + '\n' + yaml_str
-        
-        with open(config_path, 'w') as f:
-            f.write(yaml_str)
-        
-        print("✓ Configuration file updated successfully")
-        return True
-        
-    except Exception as e:
-        print(f"ERROR: Failed to write config file: {e}", file=sys.stderr)
-        import traceback
-        traceback.print_exc()
-        return False
+        return os.stat(path)
+    except OSError:
+        return None
 
 
 def verify_paths(train_json, val_json, img_dir):
-    """Verify that the dataset paths exist."""
+    """Verify that the dataset paths exist (one stat per path)."""
     errors = []
     warnings = []
     
     # Check train JSON
     train_path = project_root / train_json
-    if not train_path.exists():
+    train_stat = _probe(train_path)
+    if train_stat is None or stat.S_ISDIR(train_stat.st_mode):
         errors.append(f"Training JSON not found: {train_path}")
     else:
-        print(f"✓ Found training JSON: {train_path}")
+        print(f"✓ Found training JSON: {train_path} ({train_stat.st_size / 1e6:.1f} MB)")
     
     # Check val JSON
     val_path = project_root / val_json
-    if not val_path.exists():
+    val_stat = _probe(val_path)
+    if val_stat is None or stat.S_ISDIR(val_stat.st_mode):
         errors.append(f"Validation JSON not found: {val_path}")
     else:
-        print(f"✓ Found validation JSON: {val_path}")
+        print(f"✓ Found validation JSON: {val_path} ({val_stat.st_size / 1e6:.1f} MB)")
     
     # Check image directory
     img_path = project_root / img_dir
-    if not img_path.exists():
+    img_stat = _probe(img_path)
+    if img_stat is None or not stat.S_ISDIR(img_stat.st_mode):
         errors.append(f"Image directory not found: {img_path}")
     else:
         print(f"✓ Found image directory: {img_path}")
-        # Count images as a sanity check
-        image_files = list(img_path.rglob("*.jpg")) + list(img_path.rglob("*.jpeg")) + list(img_path.rglob("*.png"))
-        if image_files:
-            print(f"  Found {len(image_files)} image files")
+        # Count images as a sanity check (bounded - no need to walk the whole tree)
+        num_images = sum(1 for _ in itertools.islice(_walk_images(img_path), IMAGE_COUNT_LIMIT + 1))
+        if num_images > IMAGE_COUNT_LIMIT:
+            print(f"  Found more than {IMAGE_COUNT_LIMIT} image files")
+        elif num_images:
+            print(f"  Found {num_images} image files")
         else:
             warnings.append(f"No image files found in {img_path}")
     
@@ -164,9 +143,9 @@ def main():
     config_path = project_root / "configs" / "sam3_chicken_finetune.yaml"
     
     # Dataset paths to set
-    train_json = "data/chicken_train.json"
-    val_json = "data/chicken_val.json"
-    img_dir = "data/images"
+    train_json = TRAIN_JSON
+    val_json = VAL_JSON
+    img_dir = IMG_DIR
     
     print(f"Dataset paths to configure:")
     print(f"  train_json: {train_json}")
@@ -194,7 +173,14 @@ def main():
         print()
     
     # Update config file regardless of path existence (paths might be relative or in different location)
-    success = update_dataset_paths(config_path, train_json, val_json, img_dir)
+    session = ConfigSession(config_path)
+    if not session.load():
+        return 1
+    
+    session.mutate(update_dataset_paths, train_json, val_json, img_dir)
+    if not session.changed:
+        print("✓ Dataset paths in the configuration file are already up to date")
+    success = session.save()
     
     if success:
         print()
@@ -10,55 +10,21 @@ and installed via 'uv sync' before running this script.
 """
 
 import sys
-import yaml
 from pathlib import Path
-from dotenv import load_dotenv
+from _config_session import ConfigSession, dig
 
 # Get project root directory
 project_root = Path(__file__).parent.parent
 
-# Add project root to Python path to import config
-sys.path.insert(0, str(project_root))
 
-# Load environment variables from .env file
-env_path = project_root / '.env'
-if env_path.exists():
-    load_dotenv(env_path)
-
-# Import configuration from config.py
-try:
-    import config
-except ImportError:
-    print("Error: config.py not found. Please create config.py with required settings.", file=sys.stderr)
-    sys.exit(1)
-
-
-def verify_prompt_mode(config_path):
-    """Verify that prompt mode is correctly configured in the config file."""
-    
-    if not config_path.exists():
-        print(f"ERROR: Config file not found: {config_path}", file=sys.stderr)
-        print("Please run task 3.2.1 first to create the config file.", file=sys.stderr)
-        return False
-    
-    print(f"Loading configuration from: {config_path}")
-    try:
-        with open(config_path, 'r') as f:
-            config_data = yaml.safe_load(f)
-    except Exception as e:
-        print(f"ERROR: Failed to load config file: {e}", file=sys.stderr)
-        return False
+def verify_prompt_mode(config_data):
+    """Verify that prompt mode is correctly configured in the loaded config, fixing it in place."""
     
     issues = []
     fixes_applied = []
     
     # Check train dataset configuration
-    train_dataset = None
-    if 'trainer' in config_data and 'data' in config_data['trainer']:
-        if 'train' in config_data['trainer']['data']:
-            train_data = config_data['trainer']['data']['train']
-            if 'dataset' in train_data:
-                train_dataset = train_data['dataset']
+    train_dataset = dig(config_data, 'trainer', 'data', 'train', 'dataset')
     
     if train_dataset:
         # Verify use_text_prompts
@@ -84,12 +50,7 @@ def verify_prompt_mode(config_path):
         issues.append("Train dataset configuration not found")
     
     # Check val dataset configuration
-    val_dataset = None
-    if 'trainer' in config_data and 'data' in config_data['trainer']:
-        if 'val' in config_data['trainer']['data']:
-            val_data = config_data['trainer']['data']['val']
-            if 'dataset' in val_data:
-                val_dataset = val_data['dataset']
+    val_dataset = dig(config_data, 'trainer', 'data', 'val', 'dataset')
     
     if val_dataset:
         # Verify use_text_prompts
@@ -114,40 +75,13 @@ def verify_prompt_mode(config_path):
     else:
         issues.append("Val dataset configuration not found")
     
-    # Write updated config back to file if fixes were applied
+    # Fixes are written back to the file when the session is saved
     if fixes_applied:
         print(f"\nApplying {len(fixes_applied)} fix(es)...")
         for fix in fixes_applied:
             print(f"  - {fix}")
         
-        try:
-            # Read original file to preserve formatting
-            with open(config_path, 'r') as f:
-                original_content = f.read()
-            
-            # Write updated config
-            yaml_str = yaml.dump(config_data, default_flow_style=False, sort_keys=False, allow_unicode=True, width=1000)
-            
-            # Preserve header if it exists
-            if original_content.startswith("# @package"):
-                header_lines = []
-                for line in original_content.split('\n')[:10]:
-                    if line.strip().startswith('#') or line.strip().startswith('defaults:'):
-                        header_lines.append(line)
-                if header_lines:
-                    header = '\n'.join(header_lines) + '\n'
-                    yaml_str = header + yaml_str
-            
-            with open(config_path, 'w') as f:
-                f.write(yaml_str)
-            
-            print(f"\n✓ Configuration file updated successfully")
-        except Exception as e:
-            print(f"ERROR: Failed to write config file: {e}", file=sys.stderr)
-            import traceback
-            traceback.print_exc()
-            return False
-    
+
     if issues:
         print("\nWARNINGS:")
         for issue in issues:
@@ -175,7 +109,12 @@ def main():
     print(f"Config file: {config_path}")
     print()
     
-    success = verify_prompt_mode(config_path)
+    session = ConfigSession(config_path)
+    if not session.load():
+        return 1
+    
+    verified = session.mutate(verify_prompt_mode)
+    success = session.save() and verified
     
     if success:
         print()
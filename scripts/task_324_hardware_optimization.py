@@ -10,56 +10,137 @@ and installed via 'uv sync' before running this script.
 """
 
 import sys
-import yaml
+import os
+import json
+import time
+import functools
 import subprocess
-import re
 from pathlib import Path
-from dotenv import load_dotenv
+from _config_session import ConfigSession, dig
+
+try:
+    import pynvml
+except ImportError:
+    pynvml = None
 
 # Get project root directory
 project_root = Path(__file__).parent.parent
 
-# Add project root to Python path to import config
-sys.path.insert(0, str(project_root))
 
-# Load environment variables from .env file
-env_path = project_root / '.env'
-if env_path.exists():
-    load_dotenv(env_path)
+def _maybe_load_env():
+    """Load environment variables (e.g. SAM3_FORCE_PRECISION) from the project .env file, if present."""
+    env_path = project_root / '.env'
+    if env_path.exists():
+        from dotenv import load_dotenv
+        load_dotenv(env_path)
 
-# Import configuration from config.py
-try:
-    import config
-except ImportError:
-    print("Error: config.py not found. Please create config.py with required settings.", file=sys.stderr)
-    sys.exit(1)
 
+# The detected GPU does not change between runs, so the nvidia-smi result is
+# cached on disk for a week
+GPU_CACHE_PATH = Path.home() / ".cache" / "sam3" / "gpu.json"
+GPU_CACHE_TTL = 7 * 24 * 60 * 60
+# Bump when the detection logic changes so stale cache entries are ignored
+GPU_CACHE_VERSION = 2
 
-def detect_gpu_model():
-    """Detect GPU model to determine optimal precision setting."""
+# AMP dtype for each precision setting
+AMP_DTYPES = {'bf16': 'bfloat16', 'fp16': 'float16'}
+
+
+def _read_gpu_cache():
+    """Return the cached (precision, gpu_info) detection, or None if missing, stale or invalid."""
+    try:
+        if time.time() - GPU_CACHE_PATH.stat().st_mtime >= GPU_CACHE_TTL:
+            return None
+        cached = json.loads(GPU_CACHE_PATH.read_bytes())
+        if cached.get('version') != GPU_CACHE_VERSION or cached['precision'] not in AMP_DTYPES:
+            return None
+        return cached['precision'], cached['gpu_info']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def cache_gpu_detection(detect):
+    """Cache a successful (precision, gpu_info) detection in-process and in GPU_CACHE_PATH."""
+    
+    @functools.lru_cache(maxsize=1)
+    @functools.wraps(detect)
+    def cached_detect():
+        cached = _read_gpu_cache()
+        if cached is not None:
+            print(f"Detected GPU: {cached[1]} (cached in {GPU_CACHE_PATH})")
+            return cached
+        
+        precision, gpu_info = detect()
+        
+        # Failed detections are not cached, so a later run can still find the GPU
+        if gpu_info != 'Unknown':
+            try:
+                GPU_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = GPU_CACHE_PATH.with_name(GPU_CACHE_PATH.name + '.tmp')
+                tmp_path.write_text(json.dumps({'version': GPU_CACHE_VERSION, 'precision': precision, 'gpu_info': gpu_info}))
+                os.replace(tmp_path, GPU_CACHE_PATH)
+            except OSError:
+                pass
+        
+        return precision, gpu_info
+    
+    return cached_detect
+
+
+def _precision_for(gpu_name, major, minor):
+    """bfloat16 tensor cores are available from Ampere (SM 8.0) onwards."""
+    if (major, minor) >= (8, 0):
+        return 'bf16', f'{gpu_name} (SM {major}.{minor})'
+    return 'fp16', f'{gpu_name} (SM {major}.{minor})'
+
+
+def _query_nvml():
+    """Return (name, major, minor) for GPU 0 via the NVML library, or None if unavailable."""
+    if pynvml is None:
+        return None
+    try:
+        pynvml.nvmlInit()
+        try:
+            handle = pynvml.nvmlDeviceGetHandleByIndex(0)
+            gpu_name = pynvml.nvmlDeviceGetName(handle)
+            major, minor = pynvml.nvmlDeviceGetCudaComputeCapability(handle)
+        finally:
+            pynvml.nvmlShutdown()
+    except pynvml.NVMLError:
+        return None
+    if isinstance(gpu_name, bytes):
+        gpu_name = gpu_name.decode()
+    return gpu_name, major, minor
+
+
+@cache_gpu_detection
+def probe_gpu():
+    """Query the GPU's compute capability (NVML, else nvidia-smi) to determine optimal precision."""
+    # In-process driver query: no fork/exec and no text parsing
+    nvml_result = _query_nvml()
+    if nvml_result is not None:
+        gpu_name, major, minor = nvml_result
+        print(f"Detected GPU: {gpu_name} (compute capability {major}.{minor})")
+        return _precision_for(gpu_name, major, minor)
+    
     try:
         result = subprocess.run(
-            ['nvidia-smi', '--query-gpu=name', '--format=csv,noheader'],
+            ['nvidia-smi', '--query-gpu=name,compute_cap', '--format=csv,noheader'],
             capture_output=True,
             text=True,
             timeout=10
         )
         if result.returncode == 0 and result.stdout.strip():
-            gpu_name = result.stdout.strip().upper()
-            print(f"Detected GPU: {gpu_name}")
+            # One line per GPU; the first one decides
+            gpu_name, _, compute_cap = result.stdout.strip().splitlines()[0].rpartition(',')
+            gpu_name = gpu_name.strip()
+            print(f"Detected GPU: {gpu_name} (compute capability {compute_cap.strip()})")
             
-            # Check for A100/H100 (support bfloat16)
-            if 'A100' in gpu_name or 'H100' in gpu_name:
-                return 'bf16', 'A100/H100'
-            # Check for V100 (fp16 only)
-            elif 'V100' in gpu_name:
-                return 'fp16', 'V100'
-            # Check for RTX series (fp16)
-            elif 'RTX' in gpu_name or 'GTX' in gpu_name:
-                return 'fp16', 'RTX/GTX'
-            else:
-                # Default to fp16 for unknown GPUs
-                return 'fp16', 'Unknown (defaulting to fp16)'
+            try:
+                major, minor = (int(part) for part in compute_cap.strip().split('.'))
+            except ValueError:
+                return 'fp16', f'{gpu_name} (unknown compute capability, defaulting to fp16)'
+            return _precision_for(gpu_name, major, minor)
         else:
             print("WARNING: Could not detect GPU model. Defaulting to fp16.")
             return 'fp16', 'Unknown'
@@ -69,21 +150,42 @@ def detect_gpu_model():
         return 'fp16', 'Unknown'
 
 
-def configure_hardware_optimization(config_path):
-    """Configure hardware optimization settings in the config file."""
-    
-    if not config_path.exists():
-        print(f"ERROR: Config file not found: {config_path}", file=sys.stderr)
-        print("Please run task 3.2.1 first to create the config file.", file=sys.stderr)
-        return False
+def _forced_precision():
+    """The SAM3_FORCE_PRECISION override ('bf16' or 'fp16'), or None if unset or invalid."""
+    forced = os.environ.get('SAM3_FORCE_PRECISION', '').strip().lower()
+    return forced if forced in AMP_DTYPES else None
+
+
+def detect_gpu_model():
+    """Determine the optimal precision, honouring the SAM3_FORCE_PRECISION override (bf16/fp16)."""
+    forced = _forced_precision()
+    if forced is not None:
+        return forced, 'SAM3_FORCE_PRECISION'
+    if os.environ.get('SAM3_FORCE_PRECISION', '').strip():
+        print(f"WARNING: Ignoring SAM3_FORCE_PRECISION={os.environ['SAM3_FORCE_PRECISION']!r} (expected 'bf16' or 'fp16')")
+    return probe_gpu()
+
+
+def known_gpu_precision():
+    """The (precision, gpu_info) available without probing the GPU (override or cache), else None."""
+    forced = _forced_precision()
+    if forced is not None:
+        return forced, 'SAM3_FORCE_PRECISION'
+    return _read_gpu_cache()
+
+
+def configure_hardware_optimization(config_data):
+    """Configure hardware optimization settings in the loaded config (in place)."""
     
-    print(f"Loading configuration from: {config_path}")
-    try:
-        with open(config_path, 'r') as f:
-            config_data = yaml.safe_load(f)
-    except Exception as e:
-        print(f"ERROR: Failed to load config file: {e}", file=sys.stderr)
-        return False
+    # Nothing to do - and no GPU probe needed - if AMP is already enabled with
+    # the dtype for a precision known from the override or the detection cache
+    amp_config = dig(config_data, 'trainer', 'optim', 'amp')
+    known = known_gpu_precision()
+    if known is not None and isinstance(amp_config, dict) and amp_config.get('enabled'):
+        precision, gpu_info = known
+        if amp_config.get('amp_dtype') == AMP_DTYPES[precision]:
+            print(f"✓ AMP is already enabled with amp_dtype {AMP_DTYPES[precision]} (for {gpu_info})")
+            return True
     
     changes_made = []
     
@@ -111,10 +213,7 @@ def configure_hardware_optimization(config_path):
         changes_made.append("Enabled AMP (Automatic Mixed Precision)")
     
     # Set precision dtype
-    if precision == 'bf16':
-        target_dtype = 'bfloat16'
-    else:
-        target_dtype = 'float16'
+    target_dtype = AMP_DTYPES[precision]
     
     if 'amp_dtype' not in amp_config:
         amp_config['amp_dtype'] = target_dtype
@@ -148,39 +247,11 @@ def configure_hardware_optimization(config_path):
             print("      (vision_backbone, text_encoder) via use_act_checkpoint parameter.")
             print("      The model builder will need to support this parameter.")
     
-    # Write updated config back to file
+    # Changes are written back to the file when the session is saved
     if changes_made:
         print(f"\nApplying {len(changes_made)} change(s)...")
         for change in changes_made:
             print(f"  - {change}")
-        
-        try:
-            # Read original file to preserve formatting
-            with open(config_path, 'r') as f:
-                original_content = f.read()
-            
-            # Write updated config
-            yaml_str = yaml.dump(config_data, default_flow_style=False, sort_keys=False, allow_unicode=True, width=1000)
-            
-            # Preserve header if it exists
-            if original_content.startswith("# @package"):
-                header_lines = []
-                for line in original_content.split('\n')[:10]:
-                    if line.strip().startswith('#') or line.strip().startswith('defaults:'):
-                        header_lines.append(line)
-                if header_lines:
-                    header = '\n'.join(header_lines) + '\n'
-                    yaml_str = header + yaml_str
-            
-            with open(config_path, 'w') as f:
-                f.write(yaml_str)
-            
-            print(f"\n✓ Configuration file updated successfully")
-        except Exception as e:
-            print(f"ERROR: Failed to write config file: {e}", file=sys.stderr)
-            import traceback
-            traceback.print_exc()
-            return False
     else:
         print("\n✓ Hardware optimization settings are already correctly configured")
     
@@ -194,13 +265,20 @@ def main():
     print("=" * 70)
     print()
     
+    _maybe_load_env()
+    
     config_path = project_root / "configs" / "sam3_chicken_finetune.yaml"
     
     print("Configuring hardware optimization settings...")
     print(f"Config file: {config_path}")
     print()
     
-    success = configure_hardware_optimization(config_path)
+    session = ConfigSession(config_path)
+    success = (
+        session.load()
+        and session.mutate(configure_hardware_optimization)
+        and session.save()
+    )
     
     if success:
         print()
@@ -208,7 +286,7 @@ def main():
         print()
         print("Configuration includes:")
         print("  - AMP (Automatic Mixed Precision) enabled")
-        print("  - Precision set based on GPU capabilities (bf16 for A100/H100, fp16 for others)")
+        print("  - Precision set based on GPU capabilities (bf16 for compute capability >= 8.0, fp16 for others)")
         print("  - Note: Gradient checkpointing is handled at component level in SAM3")
         print()
         print("Next steps:")
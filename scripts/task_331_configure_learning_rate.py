@@ -10,58 +10,91 @@ and installed via 'uv sync' before running this script.
 """
 
 import sys
-import yaml
-from pathlib import Path
-from dotenv import load_dotenv
+from dataclasses import dataclass
 
-# Get project root directory
-project_root = Path(__file__).parent.parent
+from _paths import CHICKEN_CONFIG
 
-# Add project root to Python path to import config
-sys.path.insert(0, str(project_root))
 
-# Load environment variables from .env file
-env_path = project_root / '.env'
-if env_path.exists():
-    load_dotenv(env_path)
+@dataclass(frozen=True)
+class LRComp:
+    """A SAM3 parameter group: scratch LR key, summary label, base LR and OmegaConf formula."""
+    key: str
+    label: str
+    base: float
+    formula: str
 
-# Import configuration from config.py
-try:
-    import config
-except ImportError:
-    print("Error: config.py not found. Please create config.py with required settings.", file=sys.stderr)
-    sys.exit(1)
 
+# Each group's learning rate is its base LR scaled by scratch.lr_scale
+_COMPS = (
+    LRComp('lr_transformer', 'Transformer', 8e-4, '${times:8e-4,${scratch.lr_scale}}'),
+    LRComp('lr_vision_backbone', 'Vision Backbone', 2.5e-4, '${times:2.5e-4,${scratch.lr_scale}}'),
+    LRComp('lr_language_backbone', 'Language Backbone', 5e-5, '${times:5e-5,${scratch.lr_scale}}'),
+)
+TRANSFORMER_BASE_LR = _COMPS[0].base
+TARGET_LR = 1e-5
 
-def configure_learning_rate(config_path):
-    """Configure conservative learning rate schedule in the config file."""
-    
+# OmegaConf reference the schedulers' warmup_steps should point at
+WARMUP_REF = '${scratch.scheduler_warmup}'
+
+
+def _is_ref(value):
+    """Whether value is (or starts with) the scratch.scheduler_warmup reference."""
+    return isinstance(value, str) and value.startswith(WARMUP_REF)
+
+
+def _as_number(value):
+    """Return value as a float (also for numpy scalars and numeric strings), or None."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def load_config(config_path):
+    """Load the config file, returning None (after reporting why) on failure."""
     if not config_path.exists():
         print(f"ERROR: Config file not found: {config_path}", file=sys.stderr)
         print("Please run task 3.2.1 first to create the config file.", file=sys.stderr)
-        return False
+        return None
+    
+    # PyYAML is only imported once there is a config file to parse
+    from _yaml import load_yaml_cached
     
     print(f"Loading configuration from: {config_path}")
     try:
-        with open(config_path, 'r') as f:
-            config_data = yaml.safe_load(f)
+        # Reuses the pickled parse when the file is unchanged since the last task
+        return load_yaml_cached(config_path)
     except Exception as e:
         print(f"ERROR: Failed to load config file: {e}", file=sys.stderr)
-        return False
+        return None
+
+
+def training_steps(config_data):
+    """Return (target_epoch_size, total_steps) for the configured training run."""
+    max_epochs = config_data.get('trainer', {}).get('max_epochs', 20)
+    target_epoch_size = config_data.get('scratch', {}).get('target_epoch_size', 1500)
+    return target_epoch_size, max_epochs * target_epoch_size
+
+
+def configure_learning_rate(config_data):
+    """
+    Configure a conservative learning rate schedule in the loaded config (in place).
+    
+    Returns:
+        List of the changes made (empty if the schedule was already configured)
+    """
     
     changes_made = []
     
     # Target conservative learning rate: 1e-5 for transformer (main component)
-    target_lr = 1e-5
+    target_lr = TARGET_LR
     
     # Get max_epochs to calculate warmup steps (5-10% of epochs)
-    max_epochs = config_data.get('trainer', {}).get('max_epochs', 20)
-    print(f"Max epochs: {max_epochs}")
+    print(f"Max epochs: {config_data.get('trainer', {}).get('max_epochs', 20)}")
     
     # Calculate warmup steps (5-10% of total training)
     # Assuming ~1500 steps per epoch (target_epoch_size), warmup should be 5-10% of total steps
-    target_epoch_size = config_data.get('scratch', {}).get('target_epoch_size', 1500)
-    total_steps = max_epochs * target_epoch_size
+    target_epoch_size, total_steps = training_steps(config_data)
     warmup_steps_min = int(total_steps * 0.05)  # 5%
     warmup_steps_max = int(total_steps * 0.10)  # 10%
     warmup_steps = warmup_steps_min  # Use 5% for conservative approach
@@ -78,15 +111,15 @@ def configure_learning_rate(config_path):
     # Current: lr_transformer = 8e-4 * lr_scale
     # Target: lr_transformer = 1e-5
     # So: lr_scale = 1e-5 / 8e-4 = 0.0125
-    target_lr_scale = target_lr / 8e-4
+    target_lr_scale = target_lr / TRANSFORMER_BASE_LR
     
     if 'lr_scale' not in scratch:
         scratch['lr_scale'] = target_lr_scale
         changes_made.append(f"Set lr_scale to {target_lr_scale:.6f} (target LR: {target_lr})")
     else:
-        current_lr_scale = scratch.get('lr_scale', 0.1)
+        current_lr_scale = scratch['lr_scale']
         # Calculate what the current effective LR is
-        current_effective_lr = 8e-4 * current_lr_scale
+        current_effective_lr = TRANSFORMER_BASE_LR * current_lr_scale
         if abs(current_effective_lr - target_lr) > target_lr * 0.1:  # More than 10% difference
             scratch['lr_scale'] = target_lr_scale
             changes_made.append(f"Updated lr_scale from {current_lr_scale} to {target_lr_scale:.6f}")
@@ -96,23 +129,12 @@ def configure_learning_rate(config_path):
             print(f"✓ lr_scale is already set appropriately (effective LR: {current_effective_lr:.2e})")
     
     # Verify learning rate definitions
-    if 'lr_transformer' not in scratch:
-        scratch['lr_transformer'] = '${times:8e-4,${scratch.lr_scale}}'
-        changes_made.append("Added lr_transformer definition")
-    else:
-        print("✓ lr_transformer is defined")
-    
-    if 'lr_vision_backbone' not in scratch:
-        scratch['lr_vision_backbone'] = '${times:2.5e-4,${scratch.lr_scale}}'
-        changes_made.append("Added lr_vision_backbone definition")
-    else:
-        print("✓ lr_vision_backbone is defined")
-    
-    if 'lr_language_backbone' not in scratch:
-        scratch['lr_language_backbone'] = '${times:5e-5,${scratch.lr_scale}}'
-        changes_made.append("Added lr_language_backbone definition")
-    else:
-        print("✓ lr_language_backbone is defined")
+    for comp in _COMPS:
+        if comp.key in scratch:
+            print(f"✓ {comp.key} is defined")
+        else:
+            scratch[comp.key] = comp.formula
+            changes_made.append(f"Added {comp.key} definition")
     
     # Configure scheduler warmup steps
     # Note: SAM3 uses InverseSquareRootParamScheduler, not cosine annealing
@@ -121,8 +143,8 @@ def configure_learning_rate(config_path):
         scratch['scheduler_warmup'] = warmup_steps
         changes_made.append(f"Set scheduler_warmup to {warmup_steps} steps (5% of total)")
     else:
-        current_warmup = scratch.get('scheduler_warmup', 20)
-        if current_warmup < warmup_steps_min or current_warmup > warmup_steps_max:
+        current_warmup = scratch['scheduler_warmup']
+        if not warmup_steps_min <= current_warmup <= warmup_steps_max:
             old_warmup = current_warmup
             scratch['scheduler_warmup'] = warmup_steps
             changes_made.append(f"Updated scheduler_warmup from {old_warmup} to {warmup_steps} steps")
@@ -153,72 +175,83 @@ def configure_learning_rate(config_path):
             
             # Verify all schedulers use warmup
             for i, scheduler_config in enumerate(lr_schedulers):
-                if 'scheduler' in scheduler_config:
-                    sched = scheduler_config['scheduler']
+                sched = scheduler_config.get('scheduler')
+                if sched is not None:
                     if 'warmup_steps' in sched:
-                        current_warmup = sched.get('warmup_steps')
-                        if isinstance(current_warmup, str) and '${scratch.scheduler_warmup}' in current_warmup:
+                        current_warmup = sched['warmup_steps']
+                        if _is_ref(current_warmup):
                             print(f"✓ Scheduler {i+1}: warmup_steps references scratch.scheduler_warmup")
-                        elif isinstance(current_warmup, (int, float)) and (current_warmup < warmup_steps_min or current_warmup > warmup_steps_max):
-                            sched['warmup_steps'] = '${scratch.scheduler_warmup}'
+                            continue
+                        warmup_value = _as_number(current_warmup)
+                        if warmup_value is not None and not warmup_steps_min <= warmup_value <= warmup_steps_max:
+                            sched['warmup_steps'] = WARMUP_REF
                             changes_made.append(f"Updated scheduler {i+1} warmup_steps to reference scratch.scheduler_warmup")
                     else:
-                        sched['warmup_steps'] = '${scratch.scheduler_warmup}'
+                        sched['warmup_steps'] = WARMUP_REF
                         changes_made.append(f"Added warmup_steps to scheduler {i+1}")
     
-    # Write updated config back to file
     if changes_made:
-        print(f"\nApplying {len(changes_made)} change(s)...")
-        for change in changes_made:
-            print(f"  - {change}")
-        
-        try:
-            # Read original file to preserve formatting
-            with open(config_path, 'r') as f:
-                original_content = f.read()
-            
-            # Write updated config
-            yaml_str = yaml.dump(config_data, default_flow_style=False, sort_keys=False, allow_unicode=True, width=1000)
-            
-            # Preserve header if it exists
-            if original_content.startswith("# @package"):
-                header_lines = []
-                for line in original_content.split('\n')[:10]:
-                    if line.strip().startswith('#') or line.strip().startswith('defaults:'):
-                        header_lines.append(line)
-                if header_lines:
-                    header = '\n'.join(header_lines) + '\n'
-                    yaml_str = header + yaml_str
-            
-            with open(config_path, 'w') as f:
-                f.write(yaml_str)
-            
-            print(f"\n✓ Configuration file updated successfully")
-        except Exception as e:
-            print(f"ERROR: Failed to write config file: {e}", file=sys.stderr)
-            import traceback
-            traceback.print_exc()
-            return False
+        lines = [f"\nApplying {len(changes_made)} change(s)..."]
+        lines.extend(f"  - {change}" for change in changes_made)
+        print('\n'.join(lines))
     else:
         print("\n✓ Learning rate schedule is already correctly configured")
     
-    # Print summary
-    print("\n" + "=" * 70)
-    print("Learning Rate Configuration Summary:")
-    print("=" * 70)
-    effective_lr_transformer = 8e-4 * scratch.get('lr_scale', target_lr_scale)
-    effective_lr_vision = 2.5e-4 * scratch.get('lr_scale', target_lr_scale)
-    effective_lr_language = 5e-5 * scratch.get('lr_scale', target_lr_scale)
-    print(f"  Transformer LR: {effective_lr_transformer:.2e}")
-    print(f"  Vision Backbone LR: {effective_lr_vision:.2e}")
-    print(f"  Language Backbone LR: {effective_lr_language:.2e}")
-    print(f"  Warmup Steps: {scratch.get('scheduler_warmup', warmup_steps)} ({scratch.get('scheduler_warmup', warmup_steps) / total_steps * 100:.1f}% of total)")
-    print(f"  Scheduler: InverseSquareRootParamScheduler (with warmup and cooldown)")
-    print("  Note: SAM3 uses InverseSquareRootParamScheduler instead of cosine annealing,")
-    print("        but it provides similar behavior with warmup and cooldown phases.")
-    print("=" * 70)
+    return changes_made
+
+
+def write_config(config_path, config_data):
+    """Write the updated config back to config_path, preserving the '# @package' header."""
+    from _yaml import dump_yaml, write_yaml_text
     
-    return True
+    try:
+        # Only the start of the original file is needed to preserve the header
+        with open(config_path, 'rb') as f:
+            head_lines = f.read(2048).splitlines()[:10]
+        
+        # Write updated config
+        yaml_str = dump_yaml(config_data, default_flow_style=False, sort_keys=False, allow_unicode=True, width=1000)
+        
+        # Preserve header if it exists (the generated config has no other
+        # comments, so this is all a comment-preserving round trip would keep).
+        # The defaults list is part of the dumped data, so only comments are kept.
+        if head_lines and head_lines[0].startswith(b"# @package"):
+            header_lines = [line.decode('utf-8') for line in head_lines if line.startswith(b'#')]
+            yaml_str = '\n'.join(header_lines) + '\n' + yaml_str
+        
+        write_yaml_text(config_path, yaml_str)
+        
+        print(f"\n✓ Configuration file updated successfully")
+        return True
+    except Exception as e:
+        print(f"ERROR: Failed to write config file: {e}", file=sys.stderr)
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def print_lr_summary(config_data):
+    """Print the effective learning rates and warmup of the configured schedule."""
+    scratch = config_data.get('scratch', {})
+    target_lr_scale = TARGET_LR / TRANSFORMER_BASE_LR
+    _, total_steps = training_steps(config_data)
+    warmup_steps = int(total_steps * 0.05)
+    
+    lr_scale = scratch.get('lr_scale', target_lr_scale)
+    warmup = scratch.get('scheduler_warmup', warmup_steps)
+    effective = {comp.label: comp.base * lr_scale for comp in _COMPS}
+    
+    # Build the block and write it with a single call
+    lines = ["\n" + "=" * 70, "Learning Rate Configuration Summary:", "=" * 70]
+    lines.extend(f"  {name} LR: {lr:.2e}" for name, lr in effective.items())
+    lines += [
+        f"  Warmup Steps: {warmup} ({warmup / total_steps * 100:.1f}% of total)",
+        "  Scheduler: InverseSquareRootParamScheduler (with warmup and cooldown)",
+        "  Note: SAM3 uses InverseSquareRootParamScheduler instead of cosine annealing,",
+        "        but it provides similar behavior with warmup and cooldown phases.",
+        "=" * 70,
+    ]
+    print('\n'.join(lines))
 
 
 def main():
@@ -228,13 +261,20 @@ def main():
     print("=" * 70)
     print()
     
-    config_path = project_root / "configs" / "sam3_chicken_finetune.yaml"
+    config_path = CHICKEN_CONFIG
     
     print("Configuring conservative learning rate schedule...")
     print(f"Config file: {config_path}")
     print()
     
-    success = configure_learning_rate(config_path)
+    config_data = load_config(config_path)
+    success = config_data is not None
+    if success:
+        changes_made = configure_learning_rate(config_data)
+        if changes_made:
+            success = write_config(config_path, config_data)
+        if success:
+            print_lr_summary(config_data)
     
     if success:
         print()
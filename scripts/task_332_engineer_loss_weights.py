@@ -18,13 +18,20 @@ import sys
 import yaml
 from pathlib import Path
 from typing import Dict, Any
+from _paths import CHICKEN_CONFIG
+from _yaml import load_yaml_cached, write_yaml_text, dump_yaml
+
+# Target weight_dict values per loss function: (index in loss_fns_find, _target_ class, weights)
+LOSS_WEIGHT_TARGETS = (
+    (1, 'IABCEMdetr', {'presence_loss': 5.0}),
+    (2, 'Masks', {'loss_dice': 1.0, 'loss_iou': 1.0}),
+)
 
 
 def load_yaml_config(config_path: Path) -> Dict[str, Any]:
     """Load YAML configuration file."""
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = yaml.safe_load(f)
+        config = load_yaml_cached(config_path)
         return config
     except FileNotFoundError:
         print(f"Error: Configuration file not found: {config_path}", file=sys.stderr)
@@ -37,8 +44,8 @@ def load_yaml_config(config_path: Path) -> Dict[str, Any]:
 def save_yaml_config(config: Dict[str, Any], config_path: Path) -> None:
     """Save YAML configuration file."""
     try:
-        with open(config_path, 'w', encoding='utf-8') as f:
-            yaml.dump(config, f, default_flow_style=False, sort_keys=False, allow_unicode=True)
+        yaml_str = dump_yaml(config, default_flow_style=False, sort_keys=False, allow_unicode=True)
+        write_yaml_text(config_path, yaml_str)
     except Exception as e:
         print(f"Error: Failed to save YAML file: {e}", file=sys.stderr)
         sys.exit(1)
@@ -73,61 +80,32 @@ def update_loss_weights(config: Dict[str, Any]) -> bool:
     
     loss_fns = loss_config['loss_fns_find']
     
-    # Update presence_loss in IABCEMdetr (index 1)
-    if len(loss_fns) > 1:
-        iabcem_config = loss_fns[1]
-        if '_target_' in iabcem_config and 'IABCEMdetr' in iabcem_config['_target_']:
-            if 'weight_dict' in iabcem_config:
-                weight_dict = iabcem_config['weight_dict']
-                if 'presence_loss' in weight_dict:
-                    old_value = weight_dict['presence_loss']
-                    if old_value != 5.0:
-                        weight_dict['presence_loss'] = 5.0
-                        print(f"Updated presence_loss: {old_value} -> 5.0")
-                        changes_made = True
-                    else:
-                        print(f"presence_loss already set to 5.0")
-                else:
-                    print("Warning: 'presence_loss' not found in IABCEMdetr weight_dict", file=sys.stderr)
-    
-    # Update loss_dice and loss_iou in Masks (index 2)
-    if len(loss_fns) > 2:
-        masks_config = loss_fns[2]
-        if '_target_' in masks_config and 'Masks' in masks_config['_target_']:
-            if 'weight_dict' in masks_config:
-                weight_dict = masks_config['weight_dict']
-                
-                # Update loss_dice
-                if 'loss_dice' in weight_dict:
-                    old_value = weight_dict['loss_dice']
-                    if old_value != 1.0:
-                        weight_dict['loss_dice'] = 1.0
-                        print(f"Updated loss_dice: {old_value} -> 1.0")
-                        changes_made = True
-                    else:
-                        print(f"loss_dice already set to 1.0")
-                else:
-                    print("Warning: 'loss_dice' not found in Masks weight_dict", file=sys.stderr)
-                
-                # Verify loss_iou (should already be 1.0)
-                if 'loss_iou' in weight_dict:
-                    if weight_dict['loss_iou'] != 1.0:
-                        weight_dict['loss_iou'] = 1.0
-                        print(f"Updated loss_iou: {weight_dict['loss_iou']} -> 1.0")
-                        changes_made = True
-                    else:
-                        print(f"loss_iou already set to 1.0")
-                else:
-                    print("Warning: 'loss_iou' not found in Masks weight_dict", file=sys.stderr)
+    for index, target_cls, targets in LOSS_WEIGHT_TARGETS:
+        if len(loss_fns) <= index:
+            continue
+        loss_fn = loss_fns[index]
+        if target_cls not in loss_fn.get('_target_', '') or 'weight_dict' not in loss_fn:
+            continue
+        weight_dict = loss_fn['weight_dict']
+        
+        for key, target in targets.items():
+            if key not in weight_dict:
+                print(f"Warning: '{key}' not found in {target_cls} weight_dict", file=sys.stderr)
+                continue
+            old_value = weight_dict[key]
+            if old_value != target:
+                weight_dict[key] = target
+                print(f"Updated {key}: {old_value} -> {target}")
+                changes_made = True
+            else:
+                print(f"{key} already set to {target}")
     
     return changes_made
 
 
 def main():
     """Main function to update loss weights in configuration."""
-    # Get project root (parent of scripts directory)
-    project_root = Path(__file__).parent.parent
-    config_path = project_root / 'configs' / 'sam3_chicken_finetune.yaml'
+    config_path = CHICKEN_CONFIG
     
     print(f"Loading configuration from: {config_path}")
     config = load_yaml_config(config_path)
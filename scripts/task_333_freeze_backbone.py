@@ -16,17 +16,25 @@ the virtual environment is used. Dependencies (pyyaml) should be declared in
 pyproject.toml and installed via 'uv sync' before running this script.
 """
 
+import re
 import sys
 import yaml
 from pathlib import Path
 from typing import Dict, Any
+from _paths import CHICKEN_CONFIG
+from _yaml import load_yaml_cached, write_yaml_text, load_yaml, dump_yaml
+
+# Scheduler param_names pattern that selects the vision backbone parameters
+VISION_BACKBONE_PARAMS = 'backbone.vision_backbone'
+
+# The scratch.lr_vision_backbone line, for rewriting its value without a YAML dump
+LR_VISION_BACKBONE_LINE = re.compile(r'^([ \t]*lr_vision_backbone:[ \t]*).*$', re.M)
 
 
 def load_yaml_config(config_path: Path) -> Dict[str, Any]:
     """Load YAML configuration file."""
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = yaml.safe_load(f)
+        config = load_yaml_cached(config_path)
         return config
     except FileNotFoundError:
         print(f"Error: Configuration file not found: {config_path}", file=sys.stderr)
@@ -39,13 +47,42 @@ def load_yaml_config(config_path: Path) -> Dict[str, Any]:
 def save_yaml_config(config: Dict[str, Any], config_path: Path) -> None:
     """Save YAML configuration file."""
     try:
-        with open(config_path, 'w', encoding='utf-8') as f:
-            yaml.dump(config, f, default_flow_style=False, sort_keys=False, allow_unicode=True)
+        yaml_str = dump_yaml(config, default_flow_style=False, sort_keys=False, allow_unicode=True)
+        write_yaml_text(config_path, yaml_str)
     except Exception as e:
         print(f"Error: Failed to save YAML file: {e}", file=sys.stderr)
         sys.exit(1)
 
 
+def save_by_substitution(config: Dict[str, Any], config_path: Path) -> bool:
+    """
+    Save the frozen config by rewriting only the lr_vision_backbone line of the file.
+
+    This skips re-emitting the whole document (and keeps its header). The edited
+    text is parsed back and only written if it matches the updated config;
+    returns False otherwise, so the caller falls back to save_yaml_config().
+    """
+    try:
+        text = config_path.read_text(encoding='utf-8')
+        new_text, count = LR_VISION_BACKBONE_LINE.subn(r'\g<1>0', text)
+        if count != 1 or load_yaml(new_text) != config:
+            return False
+        write_yaml_text(config_path, new_text)
+        return True
+    except (OSError, yaml.YAMLError):
+        return False
+
+
+def targets_vision_backbone(param_names: list) -> bool:
+    """Check whether any of a scheduler's param_names patterns selects the vision backbone."""
+    # One C-level substring scan over the joined names instead of a Python
+    # loop over every pattern ('\0' cannot occur in the target)
+    joined = '\0'.join(p for p in param_names if isinstance(p, str))
+    if VISION_BACKBONE_PARAMS in joined:
+        return True
+    return any(VISION_BACKBONE_PARAMS in str(p) for p in param_names if not isinstance(p, str))
+
+
 def freeze_backbone(config: Dict[str, Any]) -> bool:
     """
     Freeze the vision backbone by setting its learning rate to 0.
@@ -88,7 +125,7 @@ def freeze_backbone(config: Dict[str, Any]) -> bool:
             for scheduler in lr_schedulers:
                 if 'param_names' in scheduler:
                     param_names = scheduler['param_names']
-                    if isinstance(param_names, list) and any('backbone.vision_backbone' in str(p) for p in param_names):
+                    if isinstance(param_names, list) and targets_vision_backbone(param_names):
                         if 'base_lr' in scheduler:
                             old_lr = scheduler['base_lr']
                             if old_lr != 0:
@@ -103,9 +140,7 @@ def freeze_backbone(config: Dict[str, Any]) -> bool:
 
 def main():
     """Main function to freeze backbone in configuration."""
-    # Get project root (parent of scripts directory)
-    project_root = Path(__file__).parent.parent
-    config_path = project_root / 'configs' / 'sam3_chicken_finetune.yaml'
+    config_path = CHICKEN_CONFIG
     
     print(f"Loading configuration from: {config_path}")
     config = load_yaml_config(config_path)
@@ -115,7 +150,8 @@ def main():
     
     if changes_made:
         print("Saving updated configuration...")
-        save_yaml_config(config, config_path)
+        if not save_by_substitution(config, config_path):
+            save_yaml_config(config, config_path)
         print(f"Successfully froze vision backbone in {config_path}")
         print("")
         print("Note: The vision backbone is now frozen (lr=0). Only the Mask Decoder")
@@ -4,10 +4,13 @@ Task ID: 4.1.3
 Description: Batch Size Tuning
 Created: 2025-01-15
 
-This script monitors VRAM usage via nvidia-smi and adjusts batch size in the config
+This script monitors VRAM usage via NVML (nvidia-smi as fallback) and adjusts batch size in the config
 based on utilization:
-- If utilization < 80%, increase train.batch_size
-- If OOM occurs, decrease batch size and enable train.accumulate_grad_batches=2
+- While training runs, the VRAM used at the configured batch size is recorded; a linear fit over
+  the recorded batch sizes picks the batch size that fills --fraction (default 0.9) of VRAM
+- If OOM occurs (--oom), step the batch size down by 2 and raise gradient accumulation so the
+  effective batch size (batch * accumulation) is kept; the OOM batch size is remembered, so
+  repeated OOMs ratchet down and later fits never climb back to it
 
 Note: This script should be executed using the wrapper shell script (task_413_batch_size_tuning.sh)
 which handles virtual environment setup via uv. Dependencies (pyyaml, omegaconf) should be
@@ -16,122 +19,415 @@ declared in pyproject.toml and installed via 'uv sync'.
 
 import sys
 import os
+import json
+import math
+import time
+import atexit
+import signal
+import argparse
+import shutil
+import functools
 import subprocess
 from pathlib import Path
 
-# Add project root to Python path
-project_root = Path(__file__).parent.parent
-sys.path.insert(0, str(project_root))
+import numpy as np
 
-# Load environment variables from .env file
+from _yaml import write_yaml_text
+from _config_session import _split_header
+
+# Config I/O prefers OmegaConf (keeps interpolations intact), falling back to PyYAML
 try:
-    from dotenv import load_dotenv
-    env_path = project_root / '.env'
-    if env_path.exists():
-        load_dotenv(env_path)
+    from omegaconf import OmegaConf
 except ImportError:
-    pass  # dotenv is optional
+    OmegaConf = None
 
-# Import configuration from config.py
+# Optional: NVML bindings (nvidia-ml-py, see the 'perf' extra) query VRAM in-process
+# instead of forking nvidia-smi
 try:
-    import config
+    import pynvml
 except ImportError:
-    print("Error: config.py not found. Please create config.py with required settings.", file=sys.stderr)
-    sys.exit(1)
+    pynvml = None
 
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
 
-def check_nvidia_smi():
-    """Check if nvidia-smi is available."""
+# Load environment variables from .env file (dotenv is only imported if there is one)
+env_path = project_root / '.env'
+if env_path.exists():
     try:
-        result = subprocess.run(
-            ['nvidia-smi', '--version'],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        return False
+        from dotenv import load_dotenv
+        load_dotenv(env_path)
+    except ImportError:
+        pass  # dotenv is optional
+
+
+# Fraction of total VRAM the tuned batch size should fill
+DEFAULT_VRAM_FRACTION = 0.9
+MAX_BATCH_SIZE = 32
+
+# Below this VRAM usage the GPU is considered idle (no training run to measure)
+IDLE_VRAM_FRACTION = 0.05
+
+# Peak VRAM observed per batch size across runs of this script
+BATCH_PROBE_PATH = project_root / "configs" / ".batch_probe.json"
+
+# Allocator statistics written by the training process
+# (sam3_chicken_detection.vram_stats.write_vram_stats into paths.experiment_log_dir).
+# Nothing in this repository calls the writer: training runs SAM3's own
+# sam3/sam3/train/train.py (task 4.1.1), so the file only exists once a hook
+# calling write_vram_stats() has been added to that training loop. Without it
+# the NVML/nvidia-smi readings below are used.
+VRAM_STATS_PATH = project_root / "results" / "chicken_finetune" / "vram_stats.json"
+VRAM_STATS_MAX_AGE = 24 * 60 * 60
+
+
+@functools.lru_cache(maxsize=None)
+def get_nvml_handles():
+    """
+    Return the NVML handles of all GPUs (empty if NVML is unavailable).
+    
+    NVML is initialised once per process (and shut down at exit); the handles are
+    cached so repeated VRAM queries only pay for the memory info calls themselves.
+    """
+    if pynvml is None:
+        return ()
+    try:
+        pynvml.nvmlInit()
+    except pynvml.NVMLError:
+        return ()
+    atexit.register(pynvml.nvmlShutdown)
+    try:
+        return tuple(pynvml.nvmlDeviceGetHandleByIndex(i) for i in range(pynvml.nvmlDeviceGetCount()))
+    except pynvml.NVMLError:
+        return ()
+
+
+def warn_if_persistence_disabled():
+    """Print a hint when a GPU runs without persistence mode (slow driver init on every query)."""
+    handles = get_nvml_handles()
+    if not handles:
+        return
+    try:
+        modes = [pynvml.nvmlDeviceGetPersistenceMode(handle) for handle in handles]
+    except pynvml.NVMLError:
+        return
+    if getattr(pynvml, 'NVML_FEATURE_DISABLED', 0) in modes:
+        print("Hint: GPU persistence mode is off, so each driver query re-initializes the GPU.")
+        print("      Enable it with: sudo nvidia-smi -pm 1")
+        print("")
+
+
+def check_gpu_access():
+    """Check if GPU memory can be queried (via NVML or an nvidia-smi on PATH)."""
+    return bool(get_nvml_handles()) or shutil.which('nvidia-smi') is not None
+
+
+def _fullest_gpu(samples):
+    """
+    Pick the sample of the GPU with the highest VRAM utilization.
+    
+    Every GPU of a (data-parallel) run gets the same batch size, so the one with
+    the least headroom is the one that bounds it.
+    """
+    return max(samples, key=lambda sample: sample[2])
+
+
+def read_vram_stats():
+    """
+    Return the training process's VRAM statistics, or None if missing, stale or invalid
+    (see VRAM_STATS_PATH for where the file comes from).
+    
+    Returns tuple: (batch_size, peak_allocated_mb, total_mb, utilization_percent), where
+    the peak is what PyTorch's allocator needed, excluding blocks it merely cached.
+    """
+    try:
+        stats = json.loads(VRAM_STATS_PATH.read_bytes())
+        if time.time() - stats['time'] >= VRAM_STATS_MAX_AGE:
+            return None
+        peak_mb = stats['max_allocated_bytes'] >> 20
+        total_mb = stats['total_bytes'] >> 20
+        utilization = (peak_mb / total_mb) * 100 if total_mb > 0 else 0
+        return int(stats['batch_size']), peak_mb, total_mb, utilization
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
 
 
 def get_vram_utilization():
     """
-    Get current VRAM utilization percentage.
-    Returns tuple: (used_mb, total_mb, utilization_percent)
+    Get current VRAM utilization percentage of the fullest GPU.
+    Returns tuple: (used_mb, total_mb, utilization_percent, gpu_busy_percent)
     """
+    handles = get_nvml_handles()
+    if handles:
+        try:
+            samples = []
+            for handle in handles:
+                mem = pynvml.nvmlDeviceGetMemoryInfo(handle)
+                gpu_busy = pynvml.nvmlDeviceGetUtilizationRates(handle).gpu
+                utilization = (mem.used / mem.total) * 100 if mem.total > 0 else 0
+                samples.append((mem.used >> 20, mem.total >> 20, utilization, gpu_busy))
+        except pynvml.NVMLError as e:
+            print(f"Error querying NVML: {e}", file=sys.stderr)
+        else:
+            return _fullest_gpu(samples)
+    
+    return get_vram_utilization_nvidia_smi()
+
+
+# Memory and GPU utilization are fetched by one nvidia-smi run
+NVIDIA_SMI_QUERY = [
+    'nvidia-smi', '--query-gpu=memory.used,memory.total,utilization.gpu', '--format=csv,noheader,nounits',
+]
+
+
+def parse_nvidia_smi_line(line):
+    """Parse one NVIDIA_SMI_QUERY line ("used_mb, total_mb, gpu_busy") into get_vram_utilization()'s tuple."""
+    parts = line.split(',')
+    if len(parts) != 3:
+        return None, None, None, None
+    
+    used_mb = int(parts[0].strip())
+    total_mb = int(parts[1].strip())
+    gpu_busy = int(parts[2].strip())
+    utilization = (used_mb / total_mb) * 100 if total_mb > 0 else 0
+    return used_mb, total_mb, utilization, gpu_busy
+
+
+def get_vram_utilization_nvidia_smi():
+    """Fallback for get_vram_utilization() that parses nvidia-smi output."""
     try:
         result = subprocess.run(
-            ['nvidia-smi', '--query-gpu=memory.used,memory.total', '--format=csv,noheader,nounits'],
+            NVIDIA_SMI_QUERY,
             capture_output=True,
             text=True,
             check=True
         )
         
-        # Parse the first GPU's memory info
-        lines = result.stdout.strip().split('\n')
-        if not lines or not lines[0]:
-            return None, None, None
-        
-        # Format: "used_mb, total_mb"
-        parts = lines[0].split(',')
-        if len(parts) != 2:
-            return None, None, None
+        # One line per GPU; the fullest one bounds the batch size
+        samples = [parse_nvidia_smi_line(line) for line in result.stdout.strip().split('\n') if line]
+        samples = [sample for sample in samples if sample[0] is not None]
+        if not samples:
+            return None, None, None, None
         
-        used_mb = int(parts[0].strip())
-        total_mb = int(parts[1].strip())
-        utilization = (used_mb / total_mb) * 100 if total_mb > 0 else 0
-        
-        return used_mb, total_mb, utilization
-    except subprocess.CalledProcessError as e:
+        return _fullest_gpu(samples)
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
         print(f"Error running nvidia-smi: {e}", file=sys.stderr)
-        return None, None, None
+        return None, None, None, None
     except ValueError as e:
         print(f"Error parsing nvidia-smi output: {e}", file=sys.stderr)
-        return None, None, None
+        return None, None, None, None
+
+
+def load_batch_probe():
+    """
+    Load the batch size probing history.
+    
+    {'observations': {batch_size: peak_mb}, 'oom_batch_size': smallest batch size that ran
+    out of memory, 'effective_batch_size': batch * accumulation to keep across batch size changes}
+    """
+    try:
+        with open(BATCH_PROBE_PATH, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_batch_probe(probe):
+    """Save the recorded VRAM observations."""
+    try:
+        with open(BATCH_PROBE_PATH, 'w') as f:
+            json.dump(probe, f, indent=2)
+    except OSError as e:
+        print(f"Warning: Could not save batch probe history {BATCH_PROBE_PATH}: {e}", file=sys.stderr)
+
+
+def record_vram_observation(probe, batch_size, used_mb):
+    """Record the VRAM used at batch_size, keeping the peak per batch size. Returns True on a new peak."""
+    observations = probe.setdefault('observations', {})
+    key = str(batch_size)
+    if used_mb <= observations.get(key, 0):
+        return False
+    observations[key] = used_mb
+    return True
+
+
+def grad_accum_for(probe, new_batch_size, batch_size, grad_accum):
+    """
+    Gradient accumulation that keeps the recorded effective batch size at new_batch_size.
+    
+    The effective batch size is recorded in probe the first time the batch size
+    changes (from the current batch_size * grad_accum), so fits and OOM steps
+    never drift from it and the learning rate/warm-up of tasks 3.3.1/3.3.2 stay tuned.
+    """
+    effective_batch_size = probe.setdefault('effective_batch_size', batch_size * grad_accum)
+    return max(1, math.ceil(effective_batch_size / new_batch_size))
+
+
+def step_down_after_oom(probe, batch_size, grad_accum):
+    """
+    Record an OOM at batch_size and return the next (batch_size, grad_accum) to try.
+    
+    The batch size drops by 2 below the smallest batch size that has ever run out
+    of memory (so repeated OOMs ratchet down instead of oscillating), and gradient
+    accumulation grows to keep the effective batch size of the first OOM.
+    """
+    oom_batch_size = min(batch_size, probe.get('oom_batch_size', batch_size))
+    probe['oom_batch_size'] = oom_batch_size
+    
+    new_batch_size = max(oom_batch_size - 2, 1)
+    return new_batch_size, grad_accum_for(probe, new_batch_size, batch_size, grad_accum)
+
+
+def batch_size_limit(probe):
+    """Largest batch size a fit may choose: MAX_BATCH_SIZE, and below any batch size that ran out of memory."""
+    return min(MAX_BATCH_SIZE, probe.get('oom_batch_size', MAX_BATCH_SIZE + 1) - 1)
+
+
+def fit_batch_size(observations, total_mb, fraction):
+    """
+    Pick the batch size predicted to use fraction * total_mb of VRAM.
+    
+    VRAM use is modelled as overhead + per_sample * batch_size, fitted over the
+    recorded batch sizes. With a single batch size the overhead is taken as 0,
+    which overestimates the per-sample cost and so errs towards a smaller batch.
+    Returns None if the fit is unusable.
+    """
+    batch_sizes = np.array([int(b) for b in observations], dtype=np.float64)
+    used = np.array(list(observations.values()), dtype=np.float64)
+    if len(batch_sizes) >= 2:
+        per_sample, overhead = np.polyfit(batch_sizes, used, 1)
+    else:
+        per_sample, overhead = used[0] / batch_sizes[0], 0.0
+    if per_sample <= 0:
+        return None
+    return int((fraction * total_mb - overhead) // per_sample)
+
+
+def stream_vram_utilization(interval_ms):
+    """
+    Yield get_vram_utilization() tuples every interval_ms, until closed.
+    
+    Polls NVML in-process when available; otherwise a single long-lived
+    'nvidia-smi -lms' process streams the samples (one line per GPU), instead
+    of one fork per poll.
+    """
+    if get_nvml_handles():
+        while True:
+            yield get_vram_utilization()
+            time.sleep(interval_ms / 1000)
+    
+    proc = subprocess.Popen(
+        NVIDIA_SMI_QUERY + ['-lms', str(interval_ms)],
+        stdout=subprocess.PIPE,
+        text=True
+    )
+    try:
+        for line in proc.stdout:
+            try:
+                yield parse_nvidia_smi_line(line)
+            except ValueError:
+                continue
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def run_daemon(config_path, fraction, interval_ms):
+    """
+    Watch VRAM while training runs and refit the batch size on every new peak.
+    
+    The running job keeps the batch size it was started with; the refitted value
+    is written to the config for the next (re)start.
+    """
+    config_data = load_yaml_config(config_path)
+    batch_size = get_nested_value(config_data, 'scratch.train_batch_size', 4)
+    grad_accum = get_nested_value(config_data, 'scratch.gradient_accumulation_steps', 1)
+    written_batch_size = batch_size
+    probe = load_batch_probe()
+    
+    print(f"Watching VRAM every {interval_ms} ms (training batch size: {batch_size}). Stop with Ctrl+C.")
+    for used_mb, total_mb, utilization, gpu_busy in stream_vram_utilization(interval_ms):
+        if used_mb is None or used_mb < total_mb * IDLE_VRAM_FRACTION:
+            continue
+        if not record_vram_observation(probe, batch_size, used_mb):
+            continue
+        save_batch_probe(probe)
+        
+        target_batch_size = fit_batch_size(probe['observations'], total_mb, fraction)
+        if target_batch_size is None:
+            continue
+        new_batch_size = max(1, min(target_batch_size, batch_size_limit(probe)))
+        if new_batch_size != written_batch_size:
+            new_grad_accum = grad_accum_for(probe, new_batch_size, batch_size, grad_accum)
+            save_batch_probe(probe)
+            print(f"New VRAM peak {used_mb} MB ({utilization:.1f}%): "
+                  f"setting scratch.train_batch_size to {new_batch_size}, "
+                  f"scratch.gradient_accumulation_steps to {new_grad_accum}")
+            set_nested_value(config_data, 'scratch.train_batch_size', new_batch_size)
+            set_nested_value(config_data, 'scratch.gradient_accumulation_steps', new_grad_accum)
+            save_yaml_config(config_path, config_data)
+            written_batch_size = new_batch_size
 
 
 def load_yaml_config(config_path):
     """Load YAML config file using omegaconf or yaml."""
-    try:
-        from omegaconf import OmegaConf
+    if OmegaConf is not None:
         return OmegaConf.load(config_path)
+    try:
+        import yaml
+        with open(config_path, 'r') as f:
+            return yaml.safe_load(f)
     except ImportError:
-        try:
-            import yaml
-            with open(config_path, 'r') as f:
-                return yaml.safe_load(f)
-        except ImportError:
-            print("Error: Neither omegaconf nor pyyaml is available.", file=sys.stderr)
-            print("Please install dependencies: uv sync", file=sys.stderr)
-            sys.exit(1)
+        print("Error: Neither omegaconf nor pyyaml is available.", file=sys.stderr)
+        print("Please install dependencies: uv sync", file=sys.stderr)
+        sys.exit(1)
 
 
 def save_yaml_config(config_path, config_data):
-    """Save YAML config file using omegaconf or yaml."""
-    try:
-        from omegaconf import OmegaConf
-        OmegaConf.save(config_data, config_path)
-    except ImportError:
+    """
+    Save YAML config file using omegaconf or yaml, keeping its leading comment header.
+    
+    The file is replaced atomically, and only if the serialized config differs
+    from its current content. Returns True if the file was rewritten.
+    """
+    if OmegaConf is not None:
+        yaml_str = OmegaConf.to_yaml(config_data)
+    else:
         try:
             import yaml
-            with open(config_path, 'w') as f:
-                yaml.dump(config_data, f, default_flow_style=False, sort_keys=False)
         except ImportError:
             print("Error: Neither omegaconf nor pyyaml is available.", file=sys.stderr)
             sys.exit(1)
+        yaml_str = yaml.dump(config_data, default_flow_style=False, sort_keys=False)
+    
+    # Neither serializer keeps comments, so carry the '# @package' header over
+    raw = config_path.read_bytes()
+    header, _ = _split_header(raw)
+    content = header + yaml_str.encode('utf-8')
+    if content == raw:
+        return False
+    write_yaml_text(config_path, content.decode('utf-8'))
+    return True
+
+
+@functools.lru_cache(maxsize=64)
+def _split(key_path):
+    """Split a dotted key path once; the same few paths are looked up repeatedly."""
+    return tuple(key_path.split('.'))
 
 
 def get_nested_value(config_data, key_path, default=None):
     """Get nested value from config using dot notation (e.g., 'scratch.train_batch_size')."""
-    keys = key_path.split('.')
+    if OmegaConf is not None and OmegaConf.is_config(config_data):
+        value = OmegaConf.select(config_data, key_path)
+        return default if value is None else value
+    
     value = config_data
-    for key in keys:
-        if isinstance(value, dict):
-            value = value.get(key)
-        elif hasattr(value, key):  # For OmegaConf objects
-            value = getattr(value, key)
-        else:
+    for key in _split(key_path):
+        if not isinstance(value, dict):
             return default
+        value = value.get(key)
         if value is None:
             return default
     return value
@@ -139,90 +435,103 @@ def get_nested_value(config_data, key_path, default=None):
 
 def set_nested_value(config_data, key_path, value):
     """Set nested value in config using dot notation."""
-    keys = key_path.split('.')
+    if OmegaConf is not None and OmegaConf.is_config(config_data):
+        # Creates missing intermediate nodes and sets the value in one call
+        OmegaConf.update(config_data, key_path, value, merge=False)
+        return True
+    
+    *parents, leaf = _split(key_path)
     current = config_data
     
-    # Navigate to the parent of the target key
-    for key in keys[:-1]:
-        if isinstance(current, dict):
-            if key not in current:
-                current[key] = {}
-            current = current[key]
-        elif hasattr(current, key):  # For OmegaConf objects
-            if not hasattr(current, '__setitem__'):
-                # OmegaConf - use setattr or OmegaConf.set
-                try:
-                    from omegaconf import OmegaConf
-                    OmegaConf.set(current, key, {})
-                    current = getattr(current, key)
-                except:
-                    setattr(current, key, {})
-                    current = getattr(current, key)
-            else:
-                current = current[key]
-        else:
-            # Create nested structure
-            if isinstance(current, dict):
-                current[key] = {}
-                current = current[key]
-            else:
-                # For OmegaConf, we need to set it differently
-                try:
-                    from omegaconf import OmegaConf
-                    OmegaConf.set(current, key, {})
-                    current = getattr(current, key)
-                except:
-                    return False
-    
-    # Set the final value
-    final_key = keys[-1]
-    if isinstance(current, dict):
-        current[final_key] = value
-    elif hasattr(current, '__setitem__'):
-        current[final_key] = value
-    else:
-        # For OmegaConf
-        try:
-            from omegaconf import OmegaConf
-            OmegaConf.set(current, final_key, value)
-        except:
+    # Navigate to the parent of the target key, creating missing levels
+    for key in parents:
+        current = current.setdefault(key, {})
+        if not isinstance(current, dict):
             return False
     
+    current[leaf] = value
     return True
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Task 4.1.3: Batch Size Tuning")
+    parser.add_argument('--oom', action='store_true',
+                        help='Training ran out of memory: step the batch size down by 2, keeping the effective batch size')
+    parser.add_argument('--fraction', type=float, default=DEFAULT_VRAM_FRACTION,
+                        help=f'Fraction of total VRAM the batch size should fill (default: {DEFAULT_VRAM_FRACTION})')
+    parser.add_argument('--daemon', action='store_true',
+                        help='Keep running and refit the batch size whenever training reaches a new VRAM peak')
+    parser.add_argument('--interval-ms', type=int, default=5000,
+                        help='Sampling interval in --daemon mode (default: 5000)')
+    args = parser.parse_args()
+    if args.daemon and args.oom:
+        parser.error("--oom cannot be combined with --daemon")
+    
+    # Import configuration from config.py (after argument parsing, so --help stays fast)
+    try:
+        import config
+    except ImportError:
+        print("Error: config.py not found. Please create config.py with required settings.", file=sys.stderr)
+        return 1
+    
     print("=" * 50)
     print("Task 4.1.3: Batch Size Tuning")
     print("=" * 50)
     print("")
     
-    # Check if nvidia-smi is available
-    if not check_nvidia_smi():
-        print("ERROR: nvidia-smi not found. This script requires NVIDIA GPUs.", file=sys.stderr)
-        print("", file=sys.stderr)
-        print("Please ensure:", file=sys.stderr)
-        print("  1. NVIDIA drivers are installed", file=sys.stderr)
-        print("  2. nvidia-smi is in PATH", file=sys.stderr)
+    config_path = project_root / "configs" / "sam3_chicken_finetune.yaml"
+    if not config_path.exists():
+        print(f"ERROR: Config file not found: {config_path}", file=sys.stderr)
         return 1
     
-    # Get VRAM utilization
-    print("Checking VRAM utilization...")
-    used_mb, total_mb, utilization = get_vram_utilization()
+    # Prefer the allocator statistics recorded by the training process; the
+    # driver is only queried without them (or to watch live in --daemon mode)
+    vram_stats = None if args.daemon else read_vram_stats()
     
-    if utilization is None:
-        print("ERROR: Could not get VRAM utilization", file=sys.stderr)
-        return 1
+    if vram_stats is None:
+        # Check if GPU memory can be queried (NVML or nvidia-smi)
+        if not check_gpu_access():
+            print("ERROR: Neither NVML nor nvidia-smi found. This script requires NVIDIA GPUs.", file=sys.stderr)
+            print("", file=sys.stderr)
+            print("Please ensure:", file=sys.stderr)
+            print("  1. NVIDIA drivers are installed", file=sys.stderr)
+            print("  2. nvidia-smi is in PATH (or nvidia-ml-py is installed)", file=sys.stderr)
+            return 1
+        
+        warn_if_persistence_disabled()
     
-    print(f"Current VRAM usage: {used_mb} MB / {total_mb} MB ({utilization:.1f}%)")
-    print("")
+    if args.daemon:
+        # SIGTERM unwinds like Ctrl+C, so the nvidia-smi stream is terminated too
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            run_daemon(config_path, args.fraction, args.interval_ms)
+        except KeyboardInterrupt:
+            pass
+        print("")
+        print("Batch size daemon stopped.")
+        return 0
     
-    # Load config file
-    config_path = project_root / "configs" / "sam3_chicken_finetune.yaml"
-    if not config_path.exists():
-        print(f"ERROR: Config file not found: {config_path}", file=sys.stderr)
-        return 1
+    if vram_stats is not None:
+        observed_batch_size, used_mb, total_mb, utilization = vram_stats
+        print(f"Reading VRAM statistics recorded by training: {VRAM_STATS_PATH}")
+        print(f"Peak allocated VRAM at batch size {observed_batch_size}: "
+              f"{used_mb} MB / {total_mb} MB ({utilization:.1f}%)")
+        print("")
+    else:
+        # Get VRAM utilization
+        print("Checking VRAM utilization...")
+        used_mb, total_mb, utilization, gpu_busy = get_vram_utilization()
+        
+        if utilization is None:
+            print("ERROR: Could not get VRAM utilization", file=sys.stderr)
+            return 1
+        
+        print(f"Current VRAM usage: {used_mb} MB / {total_mb} MB ({utilization:.1f}%)")
+        print(f"Current GPU utilization: {gpu_busy}%")
+        print("")
+        observed_batch_size = None
     
+    # Load config file
     print(f"Loading config: {config_path}")
     config_data = load_yaml_config(config_path)
     
@@ -237,49 +546,64 @@ def main():
     # Determine action based on utilization
     action_taken = False
     
-    if utilization < 80:
-        # Increase batch size
-        new_batch_size = min(current_batch_size * 2, 32)  # Cap at 32
-        if new_batch_size > current_batch_size:
-            print(f"VRAM utilization ({utilization:.1f}%) is below 80%")
-            print(f"Increasing batch size from {current_batch_size} to {new_batch_size}")
-            set_nested_value(config_data, 'scratch.train_batch_size', new_batch_size)
-            action_taken = True
-        else:
-            print(f"Batch size is already at maximum recommended value ({current_batch_size})")
-    else:
-        print(f"VRAM utilization ({utilization:.1f}%) is at or above 80%")
-        print("No batch size increase recommended.")
-        print("")
-        print("If you experience OOM (Out of Memory) errors:")
-        print("  1. Decrease batch size")
-        print("  2. Enable gradient accumulation")
-        print("")
-        print("To manually adjust:")
-        print(f"  - Edit {config_path}")
-        print("  - Set scratch.train_batch_size to a lower value (e.g., 2)")
-        print("  - Set scratch.gradient_accumulation_steps to 2 or higher")
-    
-    # Check for OOM flag (if provided as environment variable or argument)
-    if len(sys.argv) > 1 and sys.argv[1] == '--oom':
-        print("")
+    if args.oom:
+        # Training ran out of memory: the recorded VRAM peak is not trustworthy
         print("OOM flag detected. Adjusting for out-of-memory conditions...")
-        new_batch_size = max(current_batch_size // 2, 1)
-        new_grad_accum = max(current_grad_accum * 2, 2)
+        probe = load_batch_probe()
+        new_batch_size, new_grad_accum = step_down_after_oom(probe, current_batch_size, current_grad_accum)
+        save_batch_probe(probe)
         
+        print(f"Smallest batch size that ran out of memory: {probe['oom_batch_size']}")
         print(f"Decreasing batch size from {current_batch_size} to {new_batch_size}")
-        print(f"Increasing gradient accumulation from {current_grad_accum} to {new_grad_accum}")
+        print(f"Setting gradient accumulation from {current_grad_accum} to {new_grad_accum} "
+              f"(effective batch size {probe['effective_batch_size']})")
         
         set_nested_value(config_data, 'scratch.train_batch_size', new_batch_size)
         set_nested_value(config_data, 'scratch.gradient_accumulation_steps', new_grad_accum)
         action_taken = True
+    elif used_mb < total_mb * IDLE_VRAM_FRACTION:
+        print(f"VRAM usage ({utilization:.1f}%) is too low to reflect a running training job.")
+        print("Run this script while training (task 4.1.1) is running to tune the batch size.")
+    else:
+        # Fit VRAM use against batch size over all runs observed so far
+        probe = load_batch_probe()
+        record_vram_observation(probe, observed_batch_size or current_batch_size, used_mb)
+        save_batch_probe(probe)
+        observations = probe['observations']
+        
+        print("Recorded VRAM use per batch size:")
+        for batch_size in sorted(observations, key=int):
+            print(f"  {batch_size}: {observations[batch_size]} MB")
+        
+        target_batch_size = fit_batch_size(observations, total_mb, args.fraction)
+        if target_batch_size is None:
+            print("Could not fit VRAM use against batch size; no change made.")
+        else:
+            # Never climb back to a batch size that has run out of memory
+            limit = batch_size_limit(probe)
+            new_batch_size = max(1, min(target_batch_size, limit))
+            print(f"Batch size filling {args.fraction * 100:.0f}% of VRAM: {target_batch_size} "
+                  f"(using {new_batch_size}, limit {limit})")
+            if new_batch_size != current_batch_size:
+                new_grad_accum = grad_accum_for(probe, new_batch_size, current_batch_size, current_grad_accum)
+                save_batch_probe(probe)
+                print(f"Changing batch size from {current_batch_size} to {new_batch_size}")
+                print(f"Setting gradient accumulation from {current_grad_accum} to {new_grad_accum} "
+                      f"(effective batch size {probe['effective_batch_size']})")
+                set_nested_value(config_data, 'scratch.train_batch_size', new_batch_size)
+                set_nested_value(config_data, 'scratch.gradient_accumulation_steps', new_grad_accum)
+                action_taken = True
+            else:
+                print(f"Batch size is already at the fitted value ({current_batch_size})")
     
     # Save config if changes were made
     if action_taken:
         print("")
         print(f"Saving updated config to {config_path}")
-        save_yaml_config(config_path, config_data)
-        print("✓ Config updated successfully")
+        if save_yaml_config(config_path, config_data):
+            print("✓ Config updated successfully")
+        else:
+            print("✓ Config already has these values; file left unchanged")
         print("")
         print("Next steps:")
         print("  1. Review the updated config file")
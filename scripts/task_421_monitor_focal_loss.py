@@ -6,6 +6,8 @@ Created: 2025-01-15
 
 This script monitors the focal loss curve in WandB to check if it's decreasing steadily.
 If the loss stays flat, it suggests increasing loss.focal_loss_weight.
+When training writes a local metrics log (results/chicken_finetune/metrics.jsonl[.zst],
+see METRICS_LOG_DIR), that file is read instead and WandB is not contacted.
 
 Note: This script should be executed using the wrapper shell script (task_421_monitor_focal_loss.sh)
 which handles virtual environment setup via uv. Dependencies (wandb, python-dotenv) should be
@@ -15,89 +17,217 @@ declared in pyproject.toml and installed via 'uv sync'.
 import sys
 import os
 from pathlib import Path
-from typing import Optional, List, Tuple
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Optional: zstd decompression of the metrics log
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from _wandb_utils import (
+    get_api_and_entity, latest_run, json_dumps, json_loads,
+    history_cache_path, new_history_cache, read_history_cache, write_history_cache,
+)
 
 # Add project root to Python path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-# Load environment variables from .env file
-try:
-    from dotenv import load_dotenv
-    env_path = project_root / '.env'
-    if env_path.exists():
+# Load environment variables from .env file (dotenv is only imported if there is one)
+env_path = project_root / '.env'
+if env_path.exists():
+    try:
+        from dotenv import load_dotenv
         load_dotenv(env_path)
-except ImportError:
-    pass  # dotenv is optional
+    except ImportError:
+        pass  # dotenv is optional
 
-# Import configuration from config.py
-try:
-    import config
-except ImportError:
-    print("Error: config.py not found. Please create config.py with required settings.", file=sys.stderr)
-    sys.exit(1)
+
+# Accepted spellings of boolean environment variables
+TRUE_VALUES = frozenset({'true', '1', 'yes', 'on'})
+FALSE_VALUES = frozenset({'false', '0', 'no', 'off'})
+
+
+def env_flag(name, default):
+    """Boolean environment variable name, or default when it is unset or not a recognized value."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    value = value.strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    if value:
+        print(f"Warning: Ignoring unrecognized {name}={value!r} (expected true/false)", file=sys.stderr)
+    return default
 
 
-def get_focal_loss_history(api, project_name: str, entity: str, run_id: Optional[str] = None) -> Optional[List[Tuple[int, float]]]:
+# Metric names the focal loss may be logged under, and the matching step metrics
+FOCAL_LOSS_KEYS = ('loss_focal', 'train/loss_focal', 'losses/loss_focal')
+STEP_KEYS = ('train/step', 'step')
+
+# Metrics log written by training next to its checkpoints
+# (sam3_chicken_detection.metrics_log); read instead of WandB when present.
+# Nothing in this repository writes it: training runs SAM3's own
+# sam3/sam3/train/train.py (task 4.1.1), so the log only exists once a
+# MetricsLogWriter has been added to that training loop. Without it the focal
+# loss is fetched from WandB.
+METRICS_LOG_DIR = project_root / "results" / "chicken_finetune"
+METRICS_LOG_PATHS = (METRICS_LOG_DIR / "metrics.jsonl.zst", METRICS_LOG_DIR / "metrics.jsonl")
+
+def get_focal_loss_history(api, project_name: str, entity: str,
+                           run_id: Optional[str] = None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
     """
     Get focal loss history from WandB.
-    Returns list of (step, loss_value) tuples.
+    Returns (steps, losses) arrays (int64 and float32), or None if there is no data.
     """
     try:
         if run_id:
             run = api.run(f"{entity}/{project_name}/{run_id}")
         else:
-            # Get the most recent run
-            runs = api.runs(f"{entity}/{project_name}", order="-created_at", per_page=1)
-            if not runs:
+            run = latest_run(api, entity, project_name)
+            if run is None:
                 return None
-            run = runs[0]
         
-        # Get history for loss_focal metric
-        history = run.history(keys=["loss_focal", "train/step"])
+        # Pick the metric names this run logged from its summary (already
+        # fetched with the run), so only one history query is made
+        summary_keys = set(run.summary.keys())
+        loss_key = next((key for key in FOCAL_LOSS_KEYS if key in summary_keys), None)
+        if loss_key is None:
+            return None
+        step_key = next((key for key in STEP_KEYS if key in summary_keys), '_step')
         
-        if history.empty:
-            # Try alternative metric names
-            history = run.history(keys=["train/loss_focal", "step"])
-            if history.empty:
-                history = run.history(keys=["losses/loss_focal", "step"])
+        # Resume from the cached history: only rows logged after the cached
+        # WandB _step are fetched
+        cache_path = history_cache_path('focal', '/'.join(run.path), [step_key, loss_key])
+        cached = read_history_cache(cache_path, [step_key, loss_key])
+        if cached is None:
+            cached = new_history_cache([step_key, loss_key])
+        cached_steps, cached_losses = cached['rows'][step_key], cached['rows'][loss_key]
+        min_step = cached['last_step'] + 1 if cached['last_step'] >= 0 else None
         
-        if history.empty:
-            return None
+        # Stream the full (unsampled) history of just these columns
+        keys = [step_key, loss_key] if step_key == '_step' else [step_key, loss_key, '_step']
+        rows = run.scan_history(keys=keys, page_size=10000, min_step=min_step)
         
-        # Extract step and loss values
-        focal_loss_data = []
-        for _, row in history.iterrows():
-            step = int(row.get('train/step', row.get('step', 0)))
-            loss = float(row.get('loss_focal', row.get('train/loss_focal', row.get('losses/loss_focal', None))))
-            if loss is not None and not (isinstance(loss, float) and (loss != loss)):  # Check for NaN
-                focal_loss_data.append((step, loss))
+        # Extract step and loss values as columns; missing (None) and NaN
+        # losses are dropped with one vectorized mask
+        steps = np.array(cached_steps, dtype=np.int64)
+        losses = np.array(cached_losses, dtype=np.float32)
+        last_step = cached['last_step']
+        rows = list(rows)
+        if rows:
+            last_step = max(last_step, max(int(row['_step']) for row in rows))
+            new_steps = np.array([row[step_key] for row in rows], dtype=np.int64)
+            new_losses = np.array([row.get(loss_key) for row in rows], dtype=np.float64)
+            mask = ~np.isnan(new_losses)
+            new_steps, new_losses = new_steps[mask], new_losses[mask]
+            
+            # The cache keeps the float64 values as logged; the arrays returned are float32
+            cached_steps.extend(new_steps.tolist())
+            cached_losses.extend(new_losses.tolist())
+            steps = np.concatenate([steps, new_steps])
+            losses = np.concatenate([losses, new_losses.astype(np.float32)])
         
-        return focal_loss_data if focal_loss_data else None
+        if last_step != cached['last_step']:
+            cached['last_step'] = last_step
+            write_history_cache(cache_path, cached)
+        
+        return (steps, losses) if len(steps) else None
         
     except Exception as e:
         print(f"Error fetching focal loss history: {e}", file=sys.stderr)
         return None
 
 
-def analyze_loss_trend(loss_data: List[Tuple[int, float]], window_size: int = 10) -> str:
+def find_metrics_log() -> Optional[Path]:
+    """Return the local metrics log that can be read here, or None."""
+    for path in METRICS_LOG_PATHS:
+        if path.exists() and (path.suffix != '.zst' or zstandard is not None):
+            return path
+    return None
+
+
+def _read_metrics_log_bytes(path: Path) -> bytes:
+    """Return the decompressed JSON lines of the metrics log, up to the last complete line."""
+    if path.suffix != '.zst':
+        data = path.read_bytes()
+    else:
+        chunks = []
+        with open(path, 'rb') as f:
+            reader = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+            try:
+                while chunk := reader.read(1 << 20):
+                    chunks.append(chunk)
+            except zstandard.ZstdError:
+                pass  # training is writing the last frame; use the complete part
+        data = b''.join(chunks)
+    # Drop a partially written last line
+    return data[:data.rfind(b'\n') + 1]
+
+
+def get_local_focal_loss_history(path: Path) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Get focal loss history from the local metrics log.
+    Returns (steps, losses) arrays like get_focal_loss_history(), or None if it has no focal loss.
+    """
+    records = [json_loads(line) for line in _read_metrics_log_bytes(path).splitlines() if line]
+    
+    loss_key = next((key for key in FOCAL_LOSS_KEYS if any(key in record for record in records)), None)
+    if loss_key is None:
+        return None
+    step_key = next((key for key in STEP_KEYS if any(key in record for record in records)), None)
+    if step_key is None:
+        return None
+    
+    records = [record for record in records if loss_key in record and step_key in record]
+    steps = np.array([record[step_key] for record in records], dtype=np.int64)
+    losses = np.array([record[loss_key] for record in records], dtype=np.float64)
+    mask = ~np.isnan(losses)
+    if not mask.any():
+        return None
+    return steps[mask], losses[mask].astype(np.float32)
+
+
+# Smoothing factor of the exponentially weighted moving average used for the trend
+EWMA_ALPHA = 0.2
+
+
+def _ewma(values: np.ndarray, alpha: float) -> np.ndarray:
+    """Exponentially weighted moving average (recursive form, seeded with the first value)."""
+    smoothed = np.empty_like(values)
+    acc = values[0]
+    for i, value in enumerate(values):
+        acc = alpha * value + (1 - alpha) * acc
+        smoothed[i] = acc
+    return smoothed
+
+
+def analyze_loss_trend(losses: np.ndarray, window_size: int = 10) -> str:
     """
     Analyze if the loss is decreasing, flat, or increasing.
     Returns: 'decreasing', 'flat', 'increasing', or 'insufficient_data'
     """
-    if len(loss_data) < window_size:
+    if len(losses) < window_size:
         return 'insufficient_data'
     
-    # Get recent window
-    recent = loss_data[-window_size:]
-    recent_losses = [loss for _, loss in recent]
-    
-    # Calculate trend: compare first half vs second half of window
-    mid = len(recent_losses) // 2
-    first_half_avg = sum(recent_losses[:mid]) / len(recent_losses[:mid])
-    second_half_avg = sum(recent_losses[mid:]) / len(recent_losses[mid:])
+    # Smooth the recent history (NaN points dropped); the extra points before
+    # the window let the EWMA settle before the values being compared
+    recent = losses[-window_size * 3:].astype(np.float64)
+    recent = recent[~np.isnan(recent)]
+    half = window_size // 2
+    if len(recent) <= half:
+        return 'insufficient_data'
+    smoothed = _ewma(recent, EWMA_ALPHA)
     
-    change_percent = ((first_half_avg - second_half_avg) / first_half_avg) * 100 if first_half_avg > 0 else 0
+    # Calculate trend: relative change of the smoothed loss over the last half
+    # window; recent points weigh most, and a single spike is damped
+    before, now = smoothed[-1 - half], smoothed[-1]
+    change_percent = ((before - now) / before) * 100 if before > 0 else 0
     
     # Threshold: if change is less than 1%, consider it flat
     if abs(change_percent) < 1.0:
@@ -108,19 +238,15 @@ def analyze_loss_trend(loss_data: List[Tuple[int, float]], window_size: int = 10
         return 'increasing'
 
 
-def main():
-    print("=" * 50)
-    print("Task 4.2.1: Monitor Focal Loss (Presence)")
-    print("=" * 50)
-    print("")
+def load_wandb_focal_loss(config, run_id: Optional[str]):
+    """
+    Fetch the focal loss history of run_id (or the most recent run) from WandB.
     
+    Returns (exit_code, loss_data): exit_code is None when monitoring should go on
+    with loss_data, otherwise main() returns it (WandB disabled or unreachable).
+    """
     # Check if WandB is enabled
-    use_wandb = getattr(config, 'USE_WANDB', False)
-    env_use_wandb = os.getenv('USE_WANDB', '').lower()
-    if env_use_wandb in ('true', '1', 'yes', 'on'):
-        use_wandb = True
-    elif env_use_wandb in ('false', '0', 'no', 'off'):
-        use_wandb = False
+    use_wandb = env_flag('USE_WANDB', getattr(config, 'USE_WANDB', False))
     
     if not use_wandb:
         print("WandB is disabled in configuration (USE_WANDB=False)")
@@ -130,17 +256,17 @@ def main():
         print("  2. Set USE_WANDB=true in .env file")
         print("")
         print("Skipping focal loss monitoring.")
-        return 0
+        return 0, None
     
     # Check if wandb is installed
     try:
-        import wandb
+        import wandb  # noqa: F401
     except ImportError:
         print("ERROR: wandb is not installed", file=sys.stderr)
         print("", file=sys.stderr)
         print("Please install dependencies:", file=sys.stderr)
         print("  uv sync", file=sys.stderr)
-        return 1
+        return 1, None
     
     # Get project name from config
     project_name = getattr(config, 'WANDB_PROJECT_NAME', 'chicken-detection')
@@ -160,47 +286,7 @@ def main():
     
     # Initialize WandB API
     try:
-        api = wandb.Api()
-        # Get entity from viewer - handle both dict and object responses
-        entity = None
-        try:
-            viewer = api.viewer()
-            if isinstance(viewer, dict):
-                entity = viewer.get('entity') or viewer.get('username')
-            else:
-                # Try to get entity or username attribute from object
-                entity = getattr(viewer, 'entity', None) or getattr(viewer, 'username', None)
-                # If still None, try to get from string representation
-                if entity is None:
-                    viewer_str = str(viewer)
-                    # Try to extract from string if it contains entity info
-                    if hasattr(viewer, '__dict__'):
-                        entity = viewer.__dict__.get('entity') or viewer.__dict__.get('username')
-        except Exception as e:
-            print(f"Warning: Could not get entity from viewer: {e}")
-        
-        # Fallback: use environment variable or try to infer from project
-        if not entity:
-            entity = os.getenv('WANDB_ENTITY')
-            if not entity:
-                # Try to access a run to infer entity (will fail gracefully if no runs)
-                try:
-                    # This will work if there are any runs
-                    test_runs = api.runs(project_name, per_page=1)
-                    if test_runs:
-                        # Extract entity from run path
-                        run_path = str(test_runs[0])
-                        if '/' in run_path:
-                            entity = run_path.split('/')[0]
-                except Exception:
-                    pass
-        
-        # Final fallback: use username from system
-        if not entity:
-            import getpass
-            entity = getpass.getuser()
-            print(f"Warning: Using system username as entity: {entity}")
-        
+        api, entity = get_api_and_entity(project_name)
         print(f"Connected to WandB (entity: {entity})")
         print("")
     except Exception as e:
@@ -209,12 +295,9 @@ def main():
         print("Please ensure you are logged in:", file=sys.stderr)
         print("  1. Set WANDB_API_KEY in .env file", file=sys.stderr)
         print("  2. Or run: wandb login", file=sys.stderr)
-        return 1
+        return 1, None
     
-    # Get run ID from command line or use most recent
-    run_id = None
-    if len(sys.argv) > 1:
-        run_id = sys.argv[1]
+    if run_id:
         print(f"Monitoring run: {run_id}")
     else:
         print("Monitoring most recent run...")
@@ -235,9 +318,43 @@ def main():
         print("", file=sys.stderr)
         print("You can set the entity explicitly:", file=sys.stderr)
         print("  export WANDB_ENTITY=your_username", file=sys.stderr)
+        return 1, None
+    
+    return None, loss_data
+
+
+def main():
+    print("=" * 50)
+    print("Task 4.2.1: Monitor Focal Loss (Presence)")
+    print("=" * 50)
+    print("")
+    
+    # Import configuration from config.py
+    try:
+        import config
+    except ImportError:
+        print("Error: config.py not found. Please create config.py with required settings.", file=sys.stderr)
         return 1
     
-    if not loss_data:
+    # Prefer the metrics log training writes locally; WandB is only queried
+    # without one, or for an explicit run ID
+    run_id = sys.argv[1] if len(sys.argv) > 1 else None
+    metrics_log = None if run_id else find_metrics_log()
+    loss_data = None
+    if metrics_log is not None:
+        print(f"Reading focal loss history from local metrics log: {metrics_log}")
+        print("")
+        try:
+            loss_data = get_local_focal_loss_history(metrics_log)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read {metrics_log}: {e}", file=sys.stderr)
+    
+    if loss_data is None:
+        exit_code, loss_data = load_wandb_focal_loss(config, run_id)
+        if exit_code is not None:
+            return exit_code
+    
+    if loss_data is None:
         print("INFO: No focal loss data found in the run(s).", file=sys.stderr)
         print("", file=sys.stderr)
         print("This is expected if:", file=sys.stderr)
@@ -251,19 +368,29 @@ def main():
         print("Script completed successfully (no data available yet).")
         return 0  # Return success - no data is expected during development
     
-    print(f"Found {len(loss_data)} data points")
+    steps, losses = loss_data
+    trend = analyze_loss_trend(losses)
+    
+    # Piped output (CI logs, wrappers): one JSON result line and one summary line
+    if not sys.stdout.isatty():
+        print(json_dumps({
+            'metric': 'loss_focal',
+            'points': len(steps),
+            'trend': trend,
+            'recent': list(zip(steps[-10:].tolist(), losses[-10:].tolist())),
+        }))
+        print(f"Focal loss trend: {trend}")
+        return 0
+    
+    print(f"Found {len(steps)} data points")
     print("")
     
     # Display recent values
     print("Recent focal loss values:")
-    recent = loss_data[-10:] if len(loss_data) >= 10 else loss_data
-    for step, loss in recent:
+    for step, loss in zip(steps[-10:].tolist(), losses[-10:].tolist()):
         print(f"  Step {step}: {loss:.6f}")
     print("")
     
-    # Analyze trend
-    trend = analyze_loss_trend(loss_data)
-    
     print("Trend Analysis:")
     if trend == 'decreasing':
         print("  ✓ Focal loss is decreasing steadily (GOOD)")
@@ -299,7 +426,7 @@ def main():
     else:
         print("  ⚠ Insufficient data to determine trend")
         print("")
-        print(f"Only {len(loss_data)} data points available. Need at least 10 for reliable analysis.")
+        print(f"Only {len(steps)} data points available. Need at least 10 for reliable analysis.")
         print("Continue training and check again later.")
     
     print("")
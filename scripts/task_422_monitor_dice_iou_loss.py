@@ -15,7 +15,20 @@ declared in pyproject.toml and installed via 'uv sync'.
 import sys
 import os
 from pathlib import Path
-from typing import Optional, List, Tuple
+from typing import Optional, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import wandb
+except ImportError:
+    wandb = None
+
+from _wandb_utils import (
+    get_api_and_entity, get_run, json_dumps,
+    history_cache_path, new_history_cache, read_history_cache, write_history_cache,
+)
 
 # Add project root to Python path
 project_root = Path(__file__).parent.parent
@@ -38,83 +51,117 @@ except ImportError:
     sys.exit(1)
 
 
-def get_loss_history(api, project_name: str, entity: str, metric_name: str, run_id: Optional[str] = None) -> Optional[List[Tuple[int, float]]]:
+# Step metrics the history may be indexed by, in order of preference
+STEP_KEYS = ('train/step', 'step')
+
+def _metric_patterns(metric_name: str) -> List[str]:
+    """Names a loss metric may be logged under."""
+    return [
+        metric_name,
+        f"train/{metric_name}",
+        f"losses/{metric_name}",
+        f"train/losses/{metric_name}",
+    ]
+
+
+def _history_arrays(history, column: str, step_col: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Return the (steps, values) arrays of one history column with NaN values dropped, or None."""
+    if history is None or history.empty or column not in history.columns:
+        return None
+    
+    # Extract step and loss values as columns; NaN values are dropped
+    # with one vectorized mask
+    values = history[column].to_numpy(dtype=np.float64)
+    if step_col in history.columns:
+        steps = history[step_col].to_numpy(dtype=np.float64)
+    else:
+        steps = np.zeros(len(values))
+    mask = ~np.isnan(values)
+    if not mask.any():
+        return None
+    return steps[mask].astype(np.int64), values[mask]
+
+
+def _scan_history_cached(run, keys: List[str]) -> pd.DataFrame:
+    """
+    Return the full (unsampled) history of keys, scanning only rows logged after the cached ones.
+    
+    Rows are cached per run and key set by their WandB _step; logged rows never
+    change, so a running run's cache stays valid and is extended on each call.
+    """
+    cache_path = history_cache_path('loss', '/'.join(run.path), keys)
+    cached = read_history_cache(cache_path, keys)
+    if cached is None:
+        cached = new_history_cache(keys)
+    min_step = cached['last_step'] + 1 if cached['last_step'] >= 0 else None
+    
+    scan_keys = keys if '_step' in keys else keys + ['_step']
+    rows = list(run.scan_history(keys=scan_keys, page_size=10000, min_step=min_step))
+    if rows:
+        for key, column in cached['rows'].items():
+            column.extend(row.get(key) for row in rows)
+        cached['last_step'] = max(cached['last_step'], max(int(row['_step']) for row in rows))
+        write_history_cache(cache_path, cached)
+    return pd.DataFrame(cached['rows'])
+
+
+def get_multi_loss_history(api, project_name: str, entity: str, metric_names: List[str],
+                           run_id: Optional[str] = None) -> Dict[str, Optional[Tuple[np.ndarray, np.ndarray]]]:
     """
-    Get loss history from WandB for a specific metric.
-    Returns list of (step, loss_value) tuples.
+    Get the loss histories of several metrics from WandB with one (cached, incremental) history scan.
+    Returns {metric_name: (steps, loss_values) arrays or None if there is no data}.
     """
+    loss_histories = dict.fromkeys(metric_names)
     try:
-        if run_id:
-            try:
-                run = api.run(f"{entity}/{project_name}/{run_id}")
-            except Exception:
-                return None
-        else:
-            # Get the most recent run
-            try:
-                runs = api.runs(f"{entity}/{project_name}", order="-created_at", per_page=1)
-                if not runs or len(runs) == 0:
-                    return None
-                run = runs[0]
-            except Exception:
-                return None
-        
-        # Try various metric name patterns
-        metric_patterns = [
-            metric_name,
-            f"train/{metric_name}",
-            f"losses/{metric_name}",
-            f"train/losses/{metric_name}",
-        ]
+        run = get_run(api, project_name, entity, run_id)
+        if run is None:
+            return loss_histories
         
-        history = None
-        for pattern in metric_patterns:
-            try:
-                history = run.history(keys=[pattern, "train/step", "step"])
-                if not history.empty:
-                    break
-            except Exception:
-                continue
+        # Pick the metric names and step metric this run logged from its summary
+        # (already fetched with the run)
+        summary_keys = set(run.summary.keys())
+        columns = {}
+        for metric_name in metric_names:
+            pattern = next((key for key in _metric_patterns(metric_name) if key in summary_keys), None)
+            if pattern is not None:
+                columns[metric_name] = pattern
+        if not columns:
+            return loss_histories
+        step_col = next((key for key in STEP_KEYS if key in summary_keys), '_step')
         
-        if history is None or history.empty:
-            return None
+        # History scans only return rows that have every requested key; the
+        # losses are logged together, so one scan normally serves all of them
+        history = _scan_history_cached(run, list(columns.values()) + [step_col])
+        for metric_name, pattern in columns.items():
+            loss_histories[metric_name] = _history_arrays(history, pattern, step_col)
         
-        # Extract step and loss values
-        loss_data = []
-        for _, row in history.iterrows():
-            step = int(row.get('train/step', row.get('step', 0)))
-            loss = None
-            for pattern in metric_patterns:
-                if pattern in row and row[pattern] is not None:
-                    loss = float(row[pattern])
-                    break
-            
-            if loss is not None and not (isinstance(loss, float) and (loss != loss)):  # Check for NaN
-                loss_data.append((step, loss))
-        
-        return loss_data if loss_data else None
+        # Metrics logged at different steps: fetch the missing ones separately
+        if len(columns) > 1 and history.empty:
+            for metric_name, pattern in columns.items():
+                if loss_histories[metric_name] is None:
+                    history = _scan_history_cached(run, [pattern, step_col])
+                    loss_histories[metric_name] = _history_arrays(history, pattern, step_col)
         
     except Exception as e:
-        print(f"Error fetching {metric_name} history: {e}", file=sys.stderr)
-        return None
+        print(f"Error fetching {', '.join(metric_names)} history: {e}", file=sys.stderr)
+    return loss_histories
 
 
-def analyze_loss_trend(loss_data: List[Tuple[int, float]], window_size: int = 10) -> str:
+def analyze_loss_trend(losses: np.ndarray, window_size: int = 10) -> str:
     """
     Analyze if the loss is decreasing, flat, or increasing.
     Returns: 'decreasing', 'flat', 'increasing', or 'insufficient_data'
     """
-    if len(loss_data) < window_size:
+    if len(losses) < window_size:
         return 'insufficient_data'
     
     # Get recent window
-    recent = loss_data[-window_size:]
-    recent_losses = [loss for _, loss in recent]
+    recent_losses = losses[-window_size:]
     
     # Calculate trend: compare first half vs second half of window
     mid = len(recent_losses) // 2
-    first_half_avg = sum(recent_losses[:mid]) / len(recent_losses[:mid])
-    second_half_avg = sum(recent_losses[mid:]) / len(recent_losses[mid:])
+    first_half_avg = recent_losses[:mid].mean()
+    second_half_avg = recent_losses[mid:].mean()
     
     change_percent = ((first_half_avg - second_half_avg) / first_half_avg) * 100 if first_half_avg > 0 else 0
     
@@ -152,9 +199,7 @@ def main():
         return 0
     
     # Check if wandb is installed
-    try:
-        import wandb
-    except ImportError:
+    if wandb is None:
         print("ERROR: wandb is not installed", file=sys.stderr)
         print("", file=sys.stderr)
         print("Please install dependencies:", file=sys.stderr)
@@ -179,39 +224,7 @@ def main():
     
     # Initialize WandB API
     try:
-        api = wandb.Api()
-        # Get entity from viewer - handle both dict and object responses
-        entity = None
-        try:
-            viewer = api.viewer()
-            if isinstance(viewer, dict):
-                entity = viewer.get('entity') or viewer.get('username')
-            else:
-                entity = getattr(viewer, 'entity', None) or getattr(viewer, 'username', None)
-                if entity is None and hasattr(viewer, '__dict__'):
-                    entity = viewer.__dict__.get('entity') or viewer.__dict__.get('username')
-        except Exception as e:
-            print(f"Warning: Could not get entity from viewer: {e}")
-        
-        # Fallback: use environment variable or try to infer from project
-        if not entity:
-            entity = os.getenv('WANDB_ENTITY')
-            if not entity:
-                try:
-                    test_runs = api.runs(project_name, per_page=1)
-                    if test_runs:
-                        run_path = str(test_runs[0])
-                        if '/' in run_path:
-                            entity = run_path.split('/')[0]
-                except Exception:
-                    pass
-        
-        # Final fallback: use username from system
-        if not entity:
-            import getpass
-            entity = getpass.getuser()
-            print(f"Warning: Using system username as entity: {entity}")
-        
+        api, entity = get_api_and_entity(project_name)
         print(f"Connected to WandB (entity: {entity})")
         print("")
     except Exception as e:
@@ -231,15 +244,13 @@ def main():
         print("Monitoring most recent run...")
     print("")
     
-    # Fetch dice loss history
-    print("Fetching dice loss history from WandB...")
-    dice_loss_data = get_loss_history(api, project_name, entity, "loss_dice", run_id)
+    # Fetch dice and IoU loss history together
+    print("Fetching dice and IoU loss history from WandB...")
+    loss_histories = get_multi_loss_history(api, project_name, entity, ["loss_dice", "loss_iou"], run_id)
+    dice_loss_data = loss_histories["loss_dice"]
+    iou_loss_data = loss_histories["loss_iou"]
     
-    # Fetch IoU loss history
-    print("Fetching IoU loss history from WandB...")
-    iou_loss_data = get_loss_history(api, project_name, entity, "loss_iou", run_id)
-    
-    if not dice_loss_data and not iou_loss_data:
+    if dice_loss_data is None and iou_loss_data is None:
         print("INFO: No dice or IoU loss data found in the run(s).", file=sys.stderr)
         print("", file=sys.stderr)
         print("This is expected if:", file=sys.stderr)
@@ -253,17 +264,37 @@ def main():
         print("Script completed successfully (no data available yet).")
         return 0  # Return success - no data is expected during development
     
+    # Analyze trends
+    trends = {}
+    for metric_name, loss_data in loss_histories.items():
+        if loss_data is not None:
+            trends[metric_name] = analyze_loss_trend(loss_data[1])
+    dice_trend = trends.get("loss_dice")
+    iou_trend = trends.get("loss_iou")
+    
+    # Piped output (CI logs, wrappers): one JSON result line and one summary line
+    if not sys.stdout.isatty():
+        print(json_dumps({
+            metric_name: {
+                'points': len(loss_data[0]),
+                'trend': trends[metric_name],
+                'recent': list(zip(loss_data[0][-10:].tolist(), loss_data[1][-10:].tolist())),
+            }
+            for metric_name, loss_data in loss_histories.items() if loss_data is not None
+        }))
+        print(f"Dice loss trend: {dice_trend or 'no data'}; IoU loss trend: {iou_trend or 'no data'}")
+        return 0
+    
     # Analyze Dice Loss
-    if dice_loss_data:
-        print(f"Found {len(dice_loss_data)} dice loss data points")
+    if dice_loss_data is not None:
+        dice_steps, dice_losses = dice_loss_data
+        print(f"Found {len(dice_steps)} dice loss data points")
         print("")
         print("Recent dice loss values:")
-        recent = dice_loss_data[-10:] if len(dice_loss_data) >= 10 else dice_loss_data
-        for step, loss in recent:
+        for step, loss in zip(dice_steps[-10:].tolist(), dice_losses[-10:].tolist()):
             print(f"  Step {step}: {loss:.6f}")
         print("")
         
-        dice_trend = analyze_loss_trend(dice_loss_data)
         print("Dice Loss Trend Analysis:")
         if dice_trend == 'decreasing':
             print("  ✓ Dice loss is decreasing steadily (GOOD)")
@@ -282,23 +313,22 @@ def main():
             print("    - Model instability")
             print("    - Data quality issues")
         else:
-            print(f"  ⚠ Insufficient data to determine trend ({len(dice_loss_data)} data points)")
+            print(f"  ⚠ Insufficient data to determine trend ({len(dice_steps)} data points)")
         print("")
     else:
         print("WARNING: No dice loss data found")
         print("")
     
     # Analyze IoU Loss
-    if iou_loss_data:
-        print(f"Found {len(iou_loss_data)} IoU loss data points")
+    if iou_loss_data is not None:
+        iou_steps, iou_losses = iou_loss_data
+        print(f"Found {len(iou_steps)} IoU loss data points")
         print("")
         print("Recent IoU loss values:")
-        recent = iou_loss_data[-10:] if len(iou_loss_data) >= 10 else iou_loss_data
-        for step, loss in recent:
+        for step, loss in zip(iou_steps[-10:].tolist(), iou_losses[-10:].tolist()):
             print(f"  Step {step}: {loss:.6f}")
         print("")
         
-        iou_trend = analyze_loss_trend(iou_loss_data)
         print("IoU Loss Trend Analysis:")
         if iou_trend == 'decreasing':
             print("  ✓ IoU loss is decreasing steadily (GOOD)")
@@ -317,7 +347,7 @@ def main():
             print("    - Model instability")
             print("    - Data quality issues")
         else:
-            print(f"  ⚠ Insufficient data to determine trend ({len(iou_loss_data)} data points)")
+            print(f"  ⚠ Insufficient data to determine trend ({len(iou_steps)} data points)")
         print("")
     else:
         print("WARNING: No IoU loss data found")
@@ -327,9 +357,7 @@ def main():
     print("=" * 50)
     print("Summary:")
     print("=" * 50)
-    if dice_loss_data and iou_loss_data:
-        dice_trend = analyze_loss_trend(dice_loss_data)
-        iou_trend = analyze_loss_trend(iou_loss_data)
+    if dice_loss_data is not None and iou_loss_data is not None:
         if dice_trend == 'decreasing' and iou_trend == 'decreasing':
             print("✓ Both dice and IoU losses are decreasing (EXCELLENT)")
             print("The model is learning to segment positive samples effectively.")
@@ -337,14 +365,12 @@ def main():
             print("⚠ One loss is decreasing, but the other needs attention")
         else:
             print("⚠ Both losses need attention - review training configuration")
-    elif dice_loss_data:
-        dice_trend = analyze_loss_trend(dice_loss_data)
+    elif dice_loss_data is not None:
         if dice_trend == 'decreasing':
             print("✓ Dice loss is decreasing (GOOD)")
         else:
             print("⚠ Dice loss needs attention")
-    elif iou_loss_data:
-        iou_trend = analyze_loss_trend(iou_loss_data)
+    elif iou_loss_data is not None:
         if iou_trend == 'decreasing':
             print("✓ IoU loss is decreasing (GOOD)")
         else:
@@ -6,6 +6,7 @@ Created: 2025-01-15
 
 This script monitors gradient norms in WandB to detect spikes that indicate instability.
 If spikes are observed, it recommends lowering the learning rate or increasing warm-up steps.
+With --follow it keeps polling the run and reports spikes in new gradient norms as they arrive.
 
 Note: This script should be executed using the wrapper shell script (task_423_watch_gradient_norms.sh)
 which handles virtual environment setup via uv. Dependencies (wandb, python-dotenv) should be
@@ -14,9 +15,26 @@ declared in pyproject.toml and installed via 'uv sync'.
 
 import sys
 import os
+import math
+import time
+import argparse
+from collections import deque
 from pathlib import Path
 from typing import Optional, List, Tuple
 
+import numpy as np
+import pandas as pd
+
+try:
+    import wandb
+except ImportError:
+    wandb = None
+
+from _wandb_utils import (
+    get_api_and_entity, get_run, json_dumps,
+    history_cache_path, new_history_cache, read_history_cache, write_history_cache,
+)
+
 # Add project root to Python path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
@@ -38,26 +56,19 @@ except ImportError:
     sys.exit(1)
 
 
-def get_gradient_norm_history(api, project_name: str, entity: str, run_id: Optional[str] = None) -> Optional[List[Tuple[int, float]]]:
+# Step metrics the history may be indexed by, in order of preference
+STEP_KEYS = ('train/step', 'step')
+
+def get_gradient_norm_history(api, project_name: str, entity: str,
+                              run_id: Optional[str] = None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
     """
     Get gradient norm history from WandB.
-    Returns list of (step, grad_norm_value) tuples.
+    Returns (steps, grad_norm_values) arrays (int64 and float64), or None if there is no data.
     """
     try:
-        if run_id:
-            try:
-                run = api.run(f"{entity}/{project_name}/{run_id}")
-            except Exception:
-                return None
-        else:
-            # Get the most recent run
-            try:
-                runs = api.runs(f"{entity}/{project_name}", order="-created_at", per_page=1)
-                if not runs or len(runs) == 0:
-                    return None
-                run = runs[0]
-            except Exception:
-                return None
+        run = get_run(api, project_name, entity, run_id)
+        if run is None:
+            return None
         
         # Try various metric name patterns
         metric_patterns = [
@@ -69,82 +80,146 @@ def get_gradient_norm_history(api, project_name: str, entity: str, run_id: Optio
             "optimizer/grad_norm",
         ]
         
-        history = None
-        for pattern in metric_patterns:
-            try:
-                history = run.history(keys=[pattern, "train/step", "step"])
-                if not history.empty:
-                    break
-            except Exception:
-                continue
-        
-        if history is None or history.empty:
+        # Pick the metric name and step metric this run logged from its summary
+        # (already fetched with the run), so only one history scan is made
+        summary_keys = set(run.summary.keys())
+        pattern = next((key for key in metric_patterns if key in summary_keys), None)
+        if pattern is None:
             return None
+        step_col = next((key for key in STEP_KEYS if key in summary_keys), '_step')
+        
+        # Resume from the cached history: only rows logged after the cached
+        # WandB _step are fetched
+        cache_path = history_cache_path('grad_norm', '/'.join(run.path), [step_col, pattern])
+        cached = read_history_cache(cache_path, [step_col, pattern])
+        if cached is None:
+            cached = new_history_cache([step_col, pattern])
+        cached_steps, cached_values = cached['rows'][step_col], cached['rows'][pattern]
+        min_step = cached['last_step'] + 1 if cached['last_step'] >= 0 else None
         
-        # Extract step and grad norm values
-        grad_norm_data = []
-        for _, row in history.iterrows():
-            step = int(row.get('train/step', row.get('step', 0)))
-            grad_norm = None
-            for pattern in metric_patterns:
-                if pattern in row and row[pattern] is not None:
-                    grad_norm = float(row[pattern])
-                    break
-            
-            if grad_norm is not None and not (isinstance(grad_norm, float) and (grad_norm != grad_norm)):  # Check for NaN
-                grad_norm_data.append((step, grad_norm))
+        # Scan the full (unsampled) history of just these columns; the sampled
+        # run.history() can drop exactly the spikes this task looks for
+        keys = [step_col, pattern] if step_col == '_step' else [step_col, pattern, '_step']
+        rows = list(run.scan_history(keys=keys, page_size=10000, min_step=min_step))
         
-        return grad_norm_data if grad_norm_data else None
+        # Extract step and grad norm values as columns; NaN values are dropped
+        # with one vectorized mask
+        if rows:
+            steps = np.array([row[step_col] for row in rows], dtype=np.int64)
+            values = np.array([row.get(pattern) for row in rows], dtype=np.float64)
+            mask = ~np.isnan(values)
+            cached_steps.extend(steps[mask].tolist())
+            cached_values.extend(values[mask].tolist())
+            cached['last_step'] = max(cached['last_step'], max(int(row['_step']) for row in rows))
+            write_history_cache(cache_path, cached)
+        
+        if not cached_steps:
+            return None
+        return np.array(cached_steps, dtype=np.int64), np.array(cached_values, dtype=np.float64)
         
     except Exception as e:
         print(f"Error fetching gradient norm history: {e}", file=sys.stderr)
         return None
 
 
-def detect_spikes(grad_norm_data: List[Tuple[int, float]], window_size: int = 20, spike_threshold: float = 2.0) -> List[Tuple[int, float, float]]:
+def detect_spikes(steps: np.ndarray, values: np.ndarray, window_size: int = 20,
+                  spike_threshold: float = 2.0) -> List[Tuple[int, float, float]]:
     """
     Detect spikes in gradient norms.
     Returns list of (step, grad_norm, spike_ratio) tuples where spike_ratio is how many
     standard deviations above the mean the value is.
     
     Args:
-        grad_norm_data: List of (step, grad_norm) tuples
+        steps: Step of each gradient norm value
+        values: Gradient norm values
         window_size: Number of previous values to use for baseline calculation
         spike_threshold: Number of standard deviations above mean to consider a spike
     """
-    if len(grad_norm_data) < window_size + 1:
+    if len(values) < window_size + 1:
         return []
     
-    spikes = []
-    values = [grad_norm for _, grad_norm in grad_norm_data]
+    # Baseline of value i is the window_size values before it: a rolling window
+    # ending at i - 1. pandas updates the rolling mean/std online, in O(N)
+    # rather than O(N * window_size)
+    rolling = pd.Series(values).rolling(window_size)
+    baseline_mean = rolling.mean().to_numpy()[window_size - 1:-1]
+    baseline_std = rolling.std(ddof=0).to_numpy()[window_size - 1:-1]
+    # The online std can leave rounding residue on a flat window, so flat
+    # baselines are detected exactly (rolling max == min)
+    flat = (rolling.max() == rolling.min()).to_numpy()[window_size - 1:-1]
+    current = values[window_size:]
     
-    for i in range(window_size, len(grad_norm_data)):
-        # Calculate baseline from previous window
-        baseline = values[i - window_size:i]
-        baseline_mean = sum(baseline) / len(baseline)
-        baseline_std = (sum((x - baseline_mean) ** 2 for x in baseline) / len(baseline)) ** 0.5
-        
-        if baseline_std == 0:
-            continue
+    # How many standard deviations above the mean; flat baselines are skipped
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z_scores = (current - baseline_mean) / baseline_std
+    spike_idx = np.flatnonzero(~flat & (baseline_std != 0) & (z_scores > spike_threshold))
+    
+    return list(zip(steps[window_size:][spike_idx].tolist(), current[spike_idx].tolist(),
+                    z_scores[spike_idx].tolist()))
+
+
+class SpikeDetector:
+    """
+    Streaming counterpart of detect_spikes() for following a live run.
+    
+    Keeps only the last window_size values, with their running mean and sum of
+    squared deviations updated in O(1) per value (Welford's update, extended to
+    a sliding window), so following a run costs constant memory.
+    """
+    
+    def __init__(self, window_size: int = 20, spike_threshold: float = 2.0):
+        self.window = deque(maxlen=window_size)
+        self.spike_threshold = spike_threshold
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.nonfinite = 0  # inf/NaN values in the window; statistics are undefined while > 0
+        self.equal_run = 0  # trailing values equal to the last one; the window is flat once it covers it
+    
+    def _rebuild(self):
+        values = np.fromiter(self.window, dtype=np.float64)
+        self.mean = float(values.mean())
+        self.m2 = float(((values - self.mean) ** 2).sum())
+    
+    def update(self, step: int, value: float) -> Optional[Tuple[int, float, float]]:
+        """Feed the next value; returns (step, value, z_score) if it spikes above the previous window."""
+        window = self.window
+        full = len(window) == window.maxlen
         
-        current_value = values[i]
-        current_step, _ = grad_norm_data[i]
+        spike = None
+        # A flat baseline is skipped; it is detected exactly, since the running
+        # sums may leave rounding residue where a recomputation gives 0
+        if full and not self.nonfinite and self.equal_run < len(window):
+            std = math.sqrt(max(self.m2, 0.0) / len(window))
+            z_score = (value - self.mean) / std
+            if z_score > self.spike_threshold:
+                spike = (step, value, z_score)
         
-        # Calculate how many standard deviations above the mean
-        z_score = (current_value - baseline_mean) / baseline_std
+        evicted = window[0] if full else None
+        self.equal_run = self.equal_run + 1 if window and value == window[-1] else 1
+        window.append(value)
+        self.nonfinite += (not math.isfinite(value)) - (evicted is not None and not math.isfinite(evicted))
         
-        if z_score > spike_threshold:
-            spikes.append((current_step, current_value, z_score))
-    
-    return spikes
+        if self.nonfinite:
+            pass  # rebuilt once the last inf/NaN value has left the window
+        elif evicted is not None and not math.isfinite(evicted):
+            self._rebuild()
+        elif evicted is None:
+            delta = value - self.mean
+            self.mean += delta / len(window)
+            self.m2 += delta * (value - self.mean)
+        else:
+            mean = self.mean + (value - evicted) / len(window)
+            self.m2 += (value - evicted) * (value - mean + evicted - self.mean)
+            self.mean = mean
+        return spike
 
 
-def analyze_gradient_stability(grad_norm_data: List[Tuple[int, float]]) -> dict:
+def analyze_gradient_stability(steps: np.ndarray, values: np.ndarray) -> dict:
     """
     Analyze gradient norm stability.
     Returns a dictionary with analysis results.
     """
-    if len(grad_norm_data) < 10:
+    if len(values) < 10:
         return {
             'status': 'insufficient_data',
             'mean': None,
@@ -154,21 +229,20 @@ def analyze_gradient_stability(grad_norm_data: List[Tuple[int, float]]) -> dict:
             'spikes': [],
         }
     
-    values = [grad_norm for _, grad_norm in grad_norm_data]
-    mean = sum(values) / len(values)
-    std = (sum((x - mean) ** 2 for x in values) / len(values)) ** 0.5
-    max_val = max(values)
-    min_val = min(values)
+    mean = float(values.mean())
+    std = float(values.std())
+    max_val = float(values.max())
+    min_val = float(values.min())
     
     # Detect spikes
-    spikes = detect_spikes(grad_norm_data, window_size=min(20, len(grad_norm_data) // 2))
+    spikes = detect_spikes(steps, values, window_size=min(20, len(values) // 2))
     
     # Determine stability status
-    if len(spikes) > len(grad_norm_data) * 0.1:  # More than 10% are spikes
+    if len(spikes) > len(values) * 0.1:  # More than 10% are spikes
         status = 'unstable'
     elif len(spikes) > 0:
         status = 'moderate_instability'
-    elif std / mean > 0.5 if mean > 0 else False:  # High variance
+    elif mean > 0 and std / mean > 0.5:  # High variance (coefficient of variation)
         status = 'high_variance'
     else:
         status = 'stable'
@@ -183,7 +257,44 @@ def analyze_gradient_stability(grad_norm_data: List[Tuple[int, float]]) -> dict:
     }
 
 
+def follow_gradient_norms(api, project_name: str, entity: str, run_id: Optional[str],
+                          steps: np.ndarray, values: np.ndarray, interval: float) -> int:
+    """Poll the run for new gradient norms every interval seconds and report spikes as they arrive."""
+    detector = SpikeDetector(window_size=20)
+    # Seed the window with the values already analyzed (their spikes were reported above)
+    for step, value in zip(steps[-20:].tolist(), values[-20:].tolist()):
+        detector.update(step, value)
+    last_step = int(steps[-1])
+    
+    print(f"Following new gradient norms every {interval:g}s. Stop with Ctrl+C.")
+    try:
+        while True:
+            time.sleep(interval)
+            # The history cache makes each poll fetch only rows logged since the last one
+            grad_norm_data = get_gradient_norm_history(api, project_name, entity, run_id)
+            if grad_norm_data is None:
+                continue
+            new = grad_norm_data[0] > last_step
+            for step, value in zip(grad_norm_data[0][new].tolist(), grad_norm_data[1][new].tolist()):
+                spike = detector.update(step, value)
+                if spike is not None:
+                    print(f"⚠ Spike at step {step}: {value:.6f} ({spike[2]:.2f}σ above mean)")
+                last_step = max(last_step, step)
+    except KeyboardInterrupt:
+        print("")
+        print("Stopped following gradient norms.")
+    return 0
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Task 4.2.3: Watch Gradient Norms")
+    parser.add_argument('run_id', nargs='?', help='WandB run ID (default: most recent run)')
+    parser.add_argument('--follow', action='store_true',
+                        help='Keep polling the run and report spikes in new gradient norms as they arrive')
+    parser.add_argument('--interval', type=float, default=60.0,
+                        help='Polling interval in seconds in --follow mode (default: 60)')
+    args = parser.parse_args()
+    
     print("=" * 50)
     print("Task 4.2.3: Watch Gradient Norms")
     print("=" * 50)
@@ -208,9 +319,7 @@ def main():
         return 0
     
     # Check if wandb is installed
-    try:
-        import wandb
-    except ImportError:
+    if wandb is None:
         print("ERROR: wandb is not installed", file=sys.stderr)
         print("", file=sys.stderr)
         print("Please install dependencies:", file=sys.stderr)
@@ -235,39 +344,7 @@ def main():
     
     # Initialize WandB API
     try:
-        api = wandb.Api()
-        # Get entity from viewer - handle both dict and object responses
-        entity = None
-        try:
-            viewer = api.viewer()
-            if isinstance(viewer, dict):
-                entity = viewer.get('entity') or viewer.get('username')
-            else:
-                entity = getattr(viewer, 'entity', None) or getattr(viewer, 'username', None)
-                if entity is None and hasattr(viewer, '__dict__'):
-                    entity = viewer.__dict__.get('entity') or viewer.__dict__.get('username')
-        except Exception as e:
-            print(f"Warning: Could not get entity from viewer: {e}")
-        
-        # Fallback: use environment variable or try to infer from project
-        if not entity:
-            entity = os.getenv('WANDB_ENTITY')
-            if not entity:
-                try:
-                    test_runs = api.runs(project_name, per_page=1)
-                    if test_runs:
-                        run_path = str(test_runs[0])
-                        if '/' in run_path:
-                            entity = run_path.split('/')[0]
-                except Exception:
-                    pass
-        
-        # Final fallback: use username from system
-        if not entity:
-            import getpass
-            entity = getpass.getuser()
-            print(f"Warning: Using system username as entity: {entity}")
-        
+        api, entity = get_api_and_entity(project_name)
         print(f"Connected to WandB (entity: {entity})")
         print("")
     except Exception as e:
@@ -279,9 +356,8 @@ def main():
         return 1
     
     # Get run ID from command line or use most recent
-    run_id = None
-    if len(sys.argv) > 1:
-        run_id = sys.argv[1]
+    run_id = args.run_id
+    if run_id:
         print(f"Monitoring run: {run_id}")
     else:
         print("Monitoring most recent run...")
@@ -291,7 +367,7 @@ def main():
     print("Fetching gradient norm history from WandB...")
     grad_norm_data = get_gradient_norm_history(api, project_name, entity, run_id)
     
-    if not grad_norm_data:
+    if grad_norm_data is None:
         print("INFO: No gradient norm data found in the run(s).", file=sys.stderr)
         print("", file=sys.stderr)
         print("This is expected if:", file=sys.stderr)
@@ -306,19 +382,31 @@ def main():
         print("Script completed successfully (no data available yet).")
         return 0  # Return success - no data is expected during development
     
-    print(f"Found {len(grad_norm_data)} gradient norm data points")
+    steps, grad_norms = grad_norm_data
+    analysis = analyze_gradient_stability(steps, grad_norms)
+    
+    # Piped output (CI logs, wrappers): one JSON result line and one summary line
+    if not sys.stdout.isatty():
+        print(json_dumps({
+            'metric': 'grad_norm',
+            'points': len(steps),
+            **analysis,
+            'recent': list(zip(steps[-10:].tolist(), grad_norms[-10:].tolist())),
+        }))
+        print(f"Gradient norm status: {analysis['status']} ({len(analysis['spikes'])} spike(s))")
+        if args.follow:
+            return follow_gradient_norms(api, project_name, entity, run_id, steps, grad_norms, args.interval)
+        return 0
+    
+    print(f"Found {len(steps)} gradient norm data points")
     print("")
     
     # Display recent values
     print("Recent gradient norm values:")
-    recent = grad_norm_data[-10:] if len(grad_norm_data) >= 10 else grad_norm_data
-    for step, grad_norm in recent:
+    for step, grad_norm in zip(steps[-10:].tolist(), grad_norms[-10:].tolist()):
         print(f"  Step {step}: {grad_norm:.6f}")
     print("")
     
-    # Analyze stability
-    analysis = analyze_gradient_stability(grad_norm_data)
-    
     print("Gradient Norm Statistics:")
     print(f"  Mean: {analysis['mean']:.6f}")
     print(f"  Std Dev: {analysis['std']:.6f}")
@@ -342,7 +430,7 @@ def main():
     
     if analysis['status'] == 'insufficient_data':
         print("⚠ Insufficient data to determine stability")
-        print(f"Only {len(grad_norm_data)} data points available. Need at least 10 for reliable analysis.")
+        print(f"Only {len(steps)} data points available. Need at least 10 for reliable analysis.")
         print("Continue training and check again later.")
     elif analysis['status'] == 'stable':
         print("✓ Gradient norms are stable (GOOD)")
@@ -396,6 +484,9 @@ def main():
     print("=" * 50)
     print("")
     
+    if args.follow:
+        return follow_gradient_norms(api, project_name, entity, run_id, steps, grad_norms, args.interval)
+    
     return 0
 
 
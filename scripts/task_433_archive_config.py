@@ -14,12 +14,20 @@ declared in pyproject.toml and installed via 'uv sync' before running this scrip
 
 import sys
 import os
-import subprocess
 import json
 import shutil
+import filecmp
 from datetime import datetime
 from pathlib import Path
-from dotenv import load_dotenv
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from _checkpoint_discovery import find_checkpoint, find_newest_checkpoint
+from _repo_hash import get_dvc_commit_hash
+from _paths import load_project_env
 
 # Get project root directory
 project_root = Path(__file__).parent.parent
@@ -27,11 +35,6 @@ project_root = Path(__file__).parent.parent
 # Add project root to Python path to import config
 sys.path.insert(0, str(project_root))
 
-# Load environment variables from .env file
-env_path = project_root / '.env'
-if env_path.exists():
-    load_dotenv(env_path)
-
 # Import configuration from config.py
 try:
     import config
@@ -40,107 +43,20 @@ except ImportError:
     sys.exit(1)
 
 
-def get_git_commit_hash():
-    """Get current git commit hash."""
-    try:
-        result = subprocess.run(
-            ['git', 'rev-parse', 'HEAD'],
-            cwd=project_root,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        return result.stdout.strip()
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        return None
-
-
-def get_dvc_commit_hash():
-    """Get DVC commit hash if DVC is initialized, otherwise return git hash."""
-    # First try to get DVC commit hash
-    try:
-        result = subprocess.run(
-            ['dvc', 'rev-parse', 'HEAD'],
-            cwd=project_root,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        dvc_hash = result.stdout.strip()
-        if dvc_hash:
-            return dvc_hash, 'dvc'
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        pass
-    
-    # Fallback to git commit hash
-    git_hash = get_git_commit_hash()
-    if git_hash:
-        return git_hash, 'git'
-    
-    return None, None
-
-
 def find_checkpoint_directory():
     """Find the checkpoint directory containing best.pt."""
     checkpoint_dir = project_root / config.DEFAULT_CHECKPOINT_PATH
     
-    # Common checkpoint file names
-    possible_names = [
-        'best.pt',
-        'checkpoint_best.pt',
-        'best_model.pt',
-        'model_best.pt',
-    ]
-    
-    # Check for exact matches in default checkpoint dir
-    if checkpoint_dir.exists():
-        for name in possible_names:
-            candidate = checkpoint_dir / name
-            if candidate.exists():
-                return checkpoint_dir, candidate
-        
-        # Fallback: Look for any .pt file in checkpoint directory
-        pt_files = list(checkpoint_dir.glob('*.pt'))
-        if pt_files:
-            # Return the most recently modified one
-            checkpoint_file = max(pt_files, key=lambda p: p.stat().st_mtime)
-            return checkpoint_dir, checkpoint_file
-    
-    # Check for checkpoint files in subdirectories (experiment log dirs)
-    # SAM3 saves checkpoints in experiment_log_dir/checkpoints/
-    if checkpoint_dir.exists():
-        for subdir in checkpoint_dir.iterdir():
-            if subdir.is_dir():
-                checkpoints_subdir = subdir / 'checkpoints'
-                if checkpoints_subdir.exists():
-                    for name in possible_names:
-                        candidate = checkpoints_subdir / name
-                        if candidate.exists():
-                            return checkpoints_subdir, candidate
+    # Check the default checkpoint dir, then the results and sam3_logs
+    # directories (where SAM3 might save experiment log dirs)
+    found = find_checkpoint([checkpoint_dir, project_root / 'results', project_root / 'sam3_logs'])
+    if found is not None:
+        return found
     
-    # Also check results directories (where SAM3 might save checkpoints)
-    results_dir = project_root / 'results'
-    if results_dir.exists():
-        for subdir in results_dir.iterdir():
-            if subdir.is_dir():
-                checkpoints_subdir = subdir / 'checkpoints'
-                if checkpoints_subdir.exists():
-                    for name in possible_names:
-                        candidate = checkpoints_subdir / name
-                        if candidate.exists():
-                            return checkpoints_subdir, candidate
-    
-    # Check sam3_logs directories (SAM3 default experiment log dir)
-    sam3_logs_dir = project_root / 'sam3_logs'
-    if sam3_logs_dir.exists():
-        for subdir in sam3_logs_dir.iterdir():
-            if subdir.is_dir():
-                checkpoints_subdir = subdir / 'checkpoints'
-                if checkpoints_subdir.exists():
-                    for name in possible_names:
-                        candidate = checkpoints_subdir / name
-                        if candidate.exists():
-                            return checkpoints_subdir, candidate
+    # Fallback: the most recently modified .pt file, as task 4.3.2 registers
+    checkpoint_file = find_newest_checkpoint(checkpoint_dir)
+    if checkpoint_file is not None:
+        return checkpoint_file.parent, checkpoint_file
     
     return None, None
 
@@ -173,6 +89,21 @@ def find_config_files(experiment_log_dir):
     return config_files
 
 
+def is_archived_copy(source_path, dest_path):
+    """Whether dest_path already holds the same bytes as source_path."""
+    try:
+        source_stat = source_path.stat()
+        dest_stat = dest_path.stat()
+    except FileNotFoundError:
+        return False
+    if source_stat.st_size != dest_stat.st_size:
+        return False
+    # copy2 preserves the modification time, so an unchanged archive matches exactly
+    if source_stat.st_mtime_ns == dest_stat.st_mtime_ns:
+        return True
+    return filecmp.cmp(source_path, dest_path, shallow=False)
+
+
 def create_manifest(checkpoint_dir, checkpoint_path, config_files, commit_hash, hash_type):
     """Create a manifest file listing all archived files."""
     manifest = {
@@ -186,8 +117,11 @@ def create_manifest(checkpoint_dir, checkpoint_path, config_files, commit_hash,
     }
     
     manifest_path = checkpoint_dir / 'config_manifest.json'
-    with open(manifest_path, 'w') as f:
-        json.dump(manifest, f, indent=2)
+    if orjson is not None:
+        manifest_path.write_bytes(orjson.dumps(manifest, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
     
     return manifest_path
 
@@ -216,6 +150,9 @@ def main():
     print(f"Checkpoint directory: {checkpoint_dir}")
     print()
     
+    # .env is only needed once there is a checkpoint to process
+    load_project_env()
+    
     # Find experiment log directory (parent of checkpoints subdirectory)
     experiment_log_dir = checkpoint_dir.parent if checkpoint_dir.name == 'checkpoints' else checkpoint_dir
     
@@ -244,6 +181,10 @@ def main():
     for name, source_path in config_files.items():
         dest_path = checkpoint_dir / name
         try:
+            if is_archived_copy(source_path, dest_path):
+                copied_files[name] = str(dest_path)
+                print(f"✓ {name} is already archived at {dest_path}")
+                continue
             shutil.copy2(source_path, dest_path)
             copied_files[name] = str(dest_path)
             print(f"✓ Copied {name} to {dest_path}")
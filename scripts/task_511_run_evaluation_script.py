@@ -10,14 +10,31 @@ python sam3/eval/evaluate.py --config configs/eval_chicken.yaml --checkpoint che
 Note: This script should be executed using 'uv run python script.py' to ensure
 the virtual environment is used. Dependencies should be declared in pyproject.toml
 and installed via 'uv sync' before running this script.
+
+Set SAM3_EXEC_EVAL=true to replace this process with the evaluation instead of
+waiting for it (frees this process's memory for the whole run; the output is
+then not copied to eval.log and there is no completion summary).
 """
 
 import sys
 import os
+import re
+import json
+import stat
+import functools
+import tempfile
 import subprocess
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from dotenv import load_dotenv
+
+from _checkpoint_discovery import CHECKPOINT_NAMES
+
+# Optional: faster parsing/serialization of the (COCO-sized) validation JSON
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Suppress pkg_resources deprecation warning from SAM3
 warnings.filterwarnings('ignore', category=UserWarning, message='.*pkg_resources.*')
@@ -28,9 +45,10 @@ project_root = Path(__file__).parent.parent
 # Add project root to Python path to import config
 sys.path.insert(0, str(project_root))
 
-# Load environment variables from .env file
+# Load environment variables from .env file (dotenv is only imported if there is one)
 env_path = project_root / '.env'
 if env_path.exists():
+    from dotenv import load_dotenv
     load_dotenv(env_path)
 
 # Import configuration from config.py
@@ -49,67 +67,335 @@ def check_file_exists(filepath, description):
     return True
 
 
-def find_finetuned_checkpoint():
-    """Find the fine-tuned checkpoint file."""
-    checkpoint_dir = project_root / config.DEFAULT_CHECKPOINT_PATH
-    
-    # Common checkpoint file names (prioritize best.pt)
-    possible_names = [
-        'best.pt',
-        'checkpoint_best.pt',
-        'best_model.pt',
-        'model_best.pt',
+# The last search result, revalidated with a few stats instead of a new search
+CHECKPOINT_CACHE_PATH = Path.home() / ".cache" / "sam3" / "finetuned_checkpoint.json"
+
+
+def _checkpoint_search_roots():
+    """Directories find_finetuned_checkpoint() searches, in order."""
+    return [
+        project_root / config.DEFAULT_CHECKPOINT_PATH,
+        project_root / 'results',
+        project_root / 'sam3_logs',
     ]
+
+
+def _checkpoint_cache_key(checkpoint_path, search_roots):
+    """
+    mtimes the cached result depends on: the checkpoint, its directory, the
+    search roots (a new experiment dir or top-level checkpoint changes one of
+    them) and every <root>/<experiment>/checkpoints/ directory searched (a new
+    checkpoint in an existing experiment dir changes that, and a checkpoints/
+    dir appearing turns its None into an mtime).
+    """
+    paths = [checkpoint_path, checkpoint_path.parent] + list(search_roots)
+    for root in search_roots:
+        try:
+            with os.scandir(root) as entries:
+                subdirs = sorted(entry.path for entry in entries if entry.is_dir())
+        except OSError:
+            continue
+        paths += [Path(subdir) / 'checkpoints' for subdir in subdirs]
+    key = []
+    for path in paths:
+        try:
+            key.append(path.stat().st_mtime_ns)
+        except OSError:
+            key.append(None)
+    return key
+
+
+def _load_cached_checkpoint(search_roots):
+    """Return the cached checkpoint if it and the search dirs are unchanged, else None."""
+    try:
+        entry = json.loads(CHECKPOINT_CACHE_PATH.read_bytes())[str(project_root)]
+        checkpoint_path = Path(entry['path'])
+        if entry['key'] == _checkpoint_cache_key(checkpoint_path, search_roots) and entry['key'][0] is not None:
+            return checkpoint_path
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def _save_cached_checkpoint(checkpoint_path, search_roots):
+    """Remember the search result; a read-only home just skips caching."""
+    try:
+        try:
+            cached = json.loads(CHECKPOINT_CACHE_PATH.read_bytes())
+            if not isinstance(cached, dict):
+                cached = {}
+        except (OSError, ValueError):
+            cached = {}
+        cached[str(project_root)] = {'path': str(checkpoint_path), 'key': _checkpoint_cache_key(checkpoint_path, search_roots)}
+        CHECKPOINT_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = CHECKPOINT_CACHE_PATH.with_name(CHECKPOINT_CACHE_PATH.name + '.tmp')
+        tmp_path.write_text(json.dumps(cached))
+        os.replace(tmp_path, CHECKPOINT_CACHE_PATH)
+    except OSError:
+        pass
+
+
+def find_finetuned_checkpoint(search_roots):
+    """
+    Find the fine-tuned checkpoint file under search_roots (see _checkpoint_search_roots()),
+    reusing the last result while nothing changed.
+    """
+    checkpoint_path = _load_cached_checkpoint(search_roots)
+    if checkpoint_path is None:
+        checkpoint_path = search_finetuned_checkpoint(search_roots)
+        if checkpoint_path is not None:
+            _save_cached_checkpoint(checkpoint_path, search_roots)
+    return checkpoint_path
+
+
+def _newest_checkpoint_file(directory):
+    """Return the most recently modified .pt file directly in directory, or None."""
+    newest = None
+    newest_mtime = None
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith('.pt') and entry.is_file():
+                mtime = entry.stat().st_mtime
+                if newest_mtime is None or mtime > newest_mtime:
+                    newest, newest_mtime = entry.path, mtime
+    return Path(newest) if newest is not None else None
+
+
+@functools.lru_cache(maxsize=None)
+def _dir_entries(directory):
+    """Names in directory (empty if missing), listed once; a name lookup replaces a stat per candidate."""
+    try:
+        return frozenset(os.listdir(directory))
+    except OSError:
+        return frozenset()
+
+
+def _search_checkpoint_dir(checkpoint_dir):
+    """Return the preferred best checkpoint directly in checkpoint_dir, else its newest .pt file, or None."""
+    entries = _dir_entries(str(checkpoint_dir))
+    if not entries:
+        return None
+    for name in CHECKPOINT_NAMES:
+        if name in entries:
+            return checkpoint_dir / name
+    return _newest_checkpoint_file(checkpoint_dir)
+
+
+def _scan_for_checkpoint(root):
+    """Return the preferred best checkpoint in a <root>/<experiment>/checkpoints/ directory, or None."""
+    try:
+        # DirEntry.is_dir() uses the directory listing's type; only symlinks are stat'ed
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+                # A missing checkpoints/ subdirectory just lists as empty
+                checkpoints_subdir = Path(entry.path) / 'checkpoints'
+                checkpoint_names = _dir_entries(str(checkpoints_subdir))
+                for name in CHECKPOINT_NAMES:
+                    if name in checkpoint_names:
+                        return checkpoints_subdir / name
+    except OSError:
+        pass
+    return None
+
+
+def search_finetuned_checkpoint(search_roots):
+    """Search the checkpoint, results and sam3_logs directories (search_roots) for the fine-tuned checkpoint file."""
+    checkpoint_dir = search_roots[0]
     
-    # Check for exact matches in default checkpoint dir
-    if checkpoint_dir.exists():
-        for name in possible_names:
-            candidate = checkpoint_dir / name
-            if candidate.exists():
+    # Check for exact matches in default checkpoint dir (then its newest .pt
+    # file), then for checkpoint files in subdirectories (experiment log
+    # dirs) of the default, results (where SAM3 might save checkpoints) and
+    # sam3_logs (SAM3 default experiment log dir) directories
+    searches = [functools.partial(_search_checkpoint_dir, checkpoint_dir)]
+    searches += [functools.partial(_scan_for_checkpoint, root) for root in search_roots]
+    
+    # The searches are independent and mostly wait on the filesystem, so they
+    # run concurrently; results are still taken in the order above
+    executor = ThreadPoolExecutor(max_workers=len(searches))
+    try:
+        futures = [executor.submit(search) for search in searches]
+        for future in futures:
+            candidate = future.result()
+            if candidate is not None:
                 return candidate
-        
-        # Fallback: Look for any .pt file in checkpoint directory
-        pt_files = list(checkpoint_dir.glob('*.pt'))
-        if pt_files:
-            # Return the most recently modified one
-            return max(pt_files, key=lambda p: p.stat().st_mtime)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    return None
+
+
+# (size, mtime_ns) of validation JSONs whose images all have queried_category
+VAL_JSON_CHECK_CACHE_PATH = Path.home() / ".cache" / "sam3" / "val_json_checked.json"
+
+
+def _val_json_stamp(val_json_path):
+    st = val_json_path.stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _val_json_checked(val_json_path):
+    """Whether val_json_path is unchanged since it was last found (or made) complete."""
+    try:
+        checked = json.loads(VAL_JSON_CHECK_CACHE_PATH.read_bytes())
+        return checked[str(val_json_path)] == _val_json_stamp(val_json_path)
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+
+
+def _mark_val_json_checked(val_json_path):
+    try:
+        try:
+            checked = json.loads(VAL_JSON_CHECK_CACHE_PATH.read_bytes())
+            if not isinstance(checked, dict):
+                checked = {}
+        except (OSError, ValueError):
+            checked = {}
+        checked[str(val_json_path)] = _val_json_stamp(val_json_path)
+        VAL_JSON_CHECK_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = VAL_JSON_CHECK_CACHE_PATH.with_name(VAL_JSON_CHECK_CACHE_PATH.name + '.tmp')
+        tmp_path.write_text(json.dumps(checked))
+        os.replace(tmp_path, VAL_JSON_CHECK_CACHE_PATH)
+    except OSError:
+        pass
+
+
+def _top_level_values(text, keys):
+    """
+    Walk the top-level object of the JSON text; return {key: (value, key_start, value_start, value_end)}
+    for the given keys. Other values are decoded one at a time and dropped, not kept as one tree.
+    """
+    decoder = json.JSONDecoder()
+    whitespace = json.decoder.WHITESPACE.match
+    found = {}
+    idx = whitespace(text, 0).end()
+    if text[idx:idx + 1] != '{':
+        raise ValueError("validation JSON is not an object")
+    idx = whitespace(text, idx + 1).end()
+    if text[idx:idx + 1] == '}':
+        return found
+    while True:
+        if text[idx:idx + 1] != '"':
+            raise ValueError(f"expected a key at offset {idx}")
+        key_start = idx
+        key, idx = json.decoder.scanstring(text, idx + 1)
+        idx = whitespace(text, idx).end()
+        if text[idx:idx + 1] != ':':
+            raise ValueError(f"expected ':' at offset {idx}")
+        value_start = whitespace(text, idx + 1).end()
+        value, idx = decoder.raw_decode(text, value_start)
+        if key in keys:
+            found[key] = (value, key_start, value_start, idx)
+        idx = whitespace(text, idx).end()
+        if text[idx:idx + 1] == '}':
+            return found
+        if text[idx:idx + 1] != ',':
+            raise ValueError(f"expected ',' or '}}' at offset {idx}")
+        idx = whitespace(text, idx + 1).end()
+
+
+def _write_text_atomic(path, parts):
+    """
+    Replace the file at path with the concatenated text parts (UTF-8).
+
+    The parts go to a sibling temp file that is fsynced and then renamed over
+    path, so a failed write never leaves a truncated validation JSON behind.
+    """
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = 0o644
+    tmp = tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', dir=path.parent,
+                                      prefix=path.name + '.', suffix='.tmp', delete=False)
+    try:
+        with tmp:
+            for part in parts:
+                tmp.write(part)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+            # NamedTemporaryFile creates the file 0600; keep the original mode
+            os.fchmod(tmp.fileno(), mode)
+        os.replace(tmp.name, path)
+    except BaseException:
+        os.unlink(tmp.name)
+        raise
+
+
+def ensure_queried_category(val_json_path):
+    """
+    Add queried_category (the chicken category id) to every image of the validation JSON that lacks it.
+
+    Only the images list is re-encoded and spliced back into the file text;
+    annotations and the rest of the file are written back as they were.
+
+    Returns (chicken_cat_id, number of images updated). A file that is
+    unchanged since it was last complete is not parsed again (returns (None, 0)).
+    """
+    if _val_json_checked(val_json_path):
+        return None, 0
     
-    # Check for checkpoint files in subdirectories (experiment log dirs)
-    if checkpoint_dir.exists():
-        for subdir in checkpoint_dir.iterdir():
-            if subdir.is_dir():
-                checkpoints_subdir = subdir / 'checkpoints'
-                if checkpoints_subdir.exists():
-                    for name in possible_names:
-                        candidate = checkpoints_subdir / name
-                        if candidate.exists():
-                            return candidate
+    text = val_json_path.read_text(encoding='utf-8')
+    values = _top_level_values(text, ('images', 'categories'))
     
-    # Also check results directories (where SAM3 might save checkpoints)
-    results_dir = project_root / 'results'
-    if results_dir.exists():
-        for subdir in results_dir.iterdir():
-            if subdir.is_dir():
-                checkpoints_subdir = subdir / 'checkpoints'
-                if checkpoints_subdir.exists():
-                    for name in possible_names:
-                        candidate = checkpoints_subdir / name
-                        if candidate.exists():
-                            return candidate
+    # Find chicken category ID
+    chicken_cat_id = 1  # default
+    categories = values['categories'][0] if 'categories' in values else []
+    if len(categories) > 0:
+        chicken_cat = next((c for c in categories if 'chicken' in c.get('name', '').lower()), categories[0])
+        chicken_cat_id = chicken_cat.get('id')
     
-    # Check sam3_logs directories (SAM3 default experiment log dir)
-    sam3_logs_dir = project_root / 'sam3_logs'
-    if sam3_logs_dir.exists():
-        for subdir in sam3_logs_dir.iterdir():
-            if subdir.is_dir():
-                checkpoints_subdir = subdir / 'checkpoints'
-                if checkpoints_subdir.exists():
-                    for name in possible_names:
-                        candidate = checkpoints_subdir / name
-                        if candidate.exists():
-                            return candidate
+    # Add queried_category to all images if missing
+    updated = 0
+    if 'images' in values:
+        images, key_start, value_start, value_end = values['images']
+        # One comprehension pass finds them (usually none on a re-run)
+        missing = [img for img in images if 'queried_category' not in img]
+        queried_category = str(chicken_cat_id)
+        for img in missing:
+            img['queried_category'] = queried_category
+        updated = len(missing)
     
-    return None
+    # Save if updated
+    if updated > 0:
+        if orjson is not None:
+            images_text = orjson.dumps(images, option=orjson.OPT_INDENT_2).decode('utf-8')
+        else:
+            images_text = json.dumps(images, indent=2)
+        # Indent continuation lines like the "images" key line (encoded JSON
+        # strings never contain a raw newline)
+        line_start = text.rfind('\n', 0, key_start) + 1
+        indent = text[line_start:key_start]
+        if indent and not indent.isspace():
+            indent = ''
+        images_text = images_text.replace('\n', '\n' + indent)
+        _write_text_atomic(val_json_path, (text[:value_start], images_text, text[value_end:]))
+    _mark_val_json_checked(val_json_path)
+    return chicken_cat_id, updated
+
+
+def run_logged(cmd, cwd, log_path, env):
+    """
+    Run cmd in cwd with environment env like subprocess.run(cmd, check=True), copying its output to log_path.
+
+    stdout and stderr of the child go through one pipe and are written both
+    to our stdout and to the log as raw chunks, so carriage-return progress bars
+    still show live. Raises CalledProcessError on a non-zero exit.
+    """
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    # A piped Python child would otherwise block-buffer its output
+    env = dict(env, PYTHONUNBUFFERED='1')
+    sys.stdout.flush()
+    out = sys.stdout.buffer
+    with open(log_path, 'ab') as log_file, \
+            subprocess.Popen(cmd, cwd=str(cwd), env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT) as proc:
+        for chunk in iter(lambda: proc.stdout.read1(65536), b''):
+            out.write(chunk)
+            out.flush()
+            log_file.write(chunk)
+        returncode = proc.wait()
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, cmd)
 
 
 def main():
@@ -120,24 +406,27 @@ def main():
     print()
     
     # Find fine-tuned checkpoint
-    checkpoint_path = find_finetuned_checkpoint()
+    # config values used below, looked up once
+    data_dir = project_root / config.DEFAULT_DATA_PATH
+    search_roots = _checkpoint_search_roots()
+    
+    checkpoint_path = find_finetuned_checkpoint(search_roots)
     
     if checkpoint_path is None:
         print(f"ERROR: No fine-tuned checkpoint found", file=sys.stderr)
         print(f"Searched in:", file=sys.stderr)
-        print(f"  - {project_root / config.DEFAULT_CHECKPOINT_PATH}", file=sys.stderr)
-        print(f"  - {project_root / 'results'}", file=sys.stderr)
-        print(f"  - {project_root / 'sam3_logs'}", file=sys.stderr)
+        for root in search_roots:
+            print(f"  - {root}", file=sys.stderr)
         print()
         print("Please ensure training has been completed and checkpoints are saved.", file=sys.stderr)
-        print("Expected checkpoint names: best.pt, checkpoint_best.pt, best_model.pt, model_best.pt", file=sys.stderr)
+        print(f"Expected checkpoint names: {', '.join(CHECKPOINT_NAMES)}", file=sys.stderr)
         return 1
     
     print(f"Found checkpoint: {checkpoint_path}")
     print()
     
     # Get validation JSON path
-    val_json_path = project_root / config.DEFAULT_DATA_PATH / "chicken_val.json"
+    val_json_path = data_dir / "chicken_val.json"
     
     if not check_file_exists(val_json_path, "Validation JSON"):
         print("Please run Phase 2 tasks first to generate chicken_val.json.", file=sys.stderr)
@@ -145,7 +434,7 @@ def main():
     
     # Check if evaluation config exists, otherwise use base_eval.yaml
     eval_config_path = project_root / "configs" / "eval_chicken.yaml"
-    if not eval_config_path.exists():
+    if eval_config_path.name not in _dir_entries(str(eval_config_path.parent)):
         # Use base_eval.yaml as template
         base_config_path = project_root / "configs" / "base_eval.yaml"
         if not check_file_exists(base_config_path, "Base evaluation config"):
@@ -165,28 +454,8 @@ def main():
     
     # Ensure queried_category field exists in JSON (required by SAM3)
     try:
-        import json
-        with open(val_json_path, 'r') as f:
-            data = json.load(f)
-        
-        # Find chicken category ID
-        chicken_cat_id = 1  # default
-        if 'categories' in data and len(data['categories']) > 0:
-            chicken_cat = next((c for c in data['categories'] if 'chicken' in c.get('name', '').lower()), data['categories'][0])
-            chicken_cat_id = chicken_cat.get('id')
-        
-        # Add queried_category to all images if missing
-        updated = 0
-        if 'images' in data:
-            for img in data['images']:
-                if 'queried_category' not in img:
-                    img['queried_category'] = str(chicken_cat_id)
-                    updated += 1
-        
-        # Save if updated
+        chicken_cat_id, updated = ensure_queried_category(val_json_path)
         if updated > 0:
-            with open(val_json_path, 'w') as f:
-                json.dump(data, f, indent=2)
             print(f"✓ Added queried_category={chicken_cat_id} to {updated} images in validation JSON")
             print()
     except Exception as e:
@@ -200,7 +469,6 @@ def main():
         return 1
     
     # Ensure config exists in sam3 configs directory with absolute paths
-    import shutil
     sam3_config_dir = sam3_dir / "sam3" / "train" / "configs"
     sam3_config_dir.mkdir(parents=True, exist_ok=True)
     config_name = "chicken_finetuned_eval.yaml"
@@ -213,38 +481,46 @@ def main():
             config_text = f.read()
         
         # Replace path values while preserving YAML structure
-        config_text = config_text.replace(
-            'checkpoint_path: checkpoints/sam3.pt',
-            f'checkpoint_path: {checkpoint_path}'
-        )
-        config_text = config_text.replace(
-            'experiment_log_dir: results/zero_shot_baseline',
-            f'experiment_log_dir: {project_root / "results" / "finetuned_evaluation"}'
-        )
-        config_text = config_text.replace(
-            'coco_gt: data/chicken_val.json',
-            f'coco_gt: {val_json_path}'
-        )
-        # Image path should be the data directory root since file_name in JSON is relative
-        config_text = config_text.replace(
-            'img_path: data',
-            f'img_path: {project_root / config.DEFAULT_DATA_PATH}'
-        )
-        config_text = config_text.replace(
-            'bpe_path: sam3/sam3/assets/bpe_simple_vocab_16e6.txt.gz',
-            f'bpe_path: {sam3_dir / "sam3" / "assets" / "bpe_simple_vocab_16e6.txt.gz"}'
-        )
-        
-        # Also update launcher.experiment_log_dir interpolation
-        config_text = config_text.replace(
-            'experiment_log_dir: ${paths.experiment_log_dir}',
-            f'experiment_log_dir: {project_root / "results" / "finetuned_evaluation"}'
+        finetuned_log_dir = project_root / "results" / "finetuned_evaluation"
+        substitutions = {
+            'checkpoint_path: checkpoints/sam3.pt': f'checkpoint_path: {checkpoint_path}',
+            'experiment_log_dir: results/zero_shot_baseline': f'experiment_log_dir: {finetuned_log_dir}',
+            'coco_gt: data/chicken_val.json': f'coco_gt: {val_json_path}',
+            # Image path should be the data directory root since file_name in JSON is relative
+            'img_path: data': f'img_path: {data_dir}',
+            'bpe_path: sam3/sam3/assets/bpe_simple_vocab_16e6.txt.gz':
+                f'bpe_path: {sam3_dir / "sam3" / "assets" / "bpe_simple_vocab_16e6.txt.gz"}',
+            # Also update launcher.experiment_log_dir interpolation
+            'experiment_log_dir: ${paths.experiment_log_dir}': f'experiment_log_dir: {finetuned_log_dir}',
+        }
+        # One pass over the text instead of one str.replace() scan per path.
+        # Each match must be a whole "key: value" at the start of a line (after
+        # indentation) followed by a comment or the line end, so commented-out
+        # lines and longer values (img_path: data/...) are left alone
+        pattern = re.compile(
+            r'^([ \t]*)(' + '|'.join(re.escape(key) for key in substitutions) + r')(?=[ \t]*(?:#|$))',
+            re.MULTILINE,
         )
+        config_text = pattern.sub(lambda match: match.group(1) + substitutions[match.group(2)], config_text)
         
-        # Write updated config to sam3 configs directory
-        with open(sam3_config_path, 'w') as f:
-            f.write(config_text)
-        print(f"✓ Updated config with absolute paths: {sam3_config_path}")
+        # Write updated config to sam3 configs directory, unless it is already
+        # identical (keeps its mtime for anything watching the file); a size
+        # mismatch settles it without reading the file
+        config_bytes = config_text.encode('utf-8')
+        try:
+            up_to_date = (sam3_config_path.stat().st_size == len(config_bytes)
+                          and sam3_config_path.read_bytes() == config_bytes)
+        except FileNotFoundError:
+            up_to_date = False
+        if up_to_date:
+            print(f"✓ Config with absolute paths is up to date: {sam3_config_path}")
+        else:
+            # Written next to the target and renamed over it, so a concurrent
+            # reader never sees a partial config
+            tmp_path = sam3_config_path.with_name(sam3_config_path.name + '.tmp')
+            tmp_path.write_bytes(config_bytes)
+            os.replace(tmp_path, sam3_config_path)
+            print(f"✓ Updated config with absolute paths: {sam3_config_path}")
         print()
     except Exception as e:
         print(f"ERROR: Could not update config with absolute paths: {e}", file=sys.stderr)
@@ -252,28 +528,35 @@ def main():
         traceback.print_exc()
         return 1
     
-    # Change to sam3 directory so Hydra can resolve configs
-    original_cwd = os.getcwd()
-    original_pythonpath = os.environ.get("PYTHONPATH", "")
-    os.chdir(sam3_dir)
+    # Environment of the evaluation, built once: our environment plus the
+    # variables below (this process's own environment is left as it is)
+    sam3_dir_str = os.fspath(sam3_dir)
+    eval_env = dict(os.environ)
     
     # Set PYTHONPATH to include sam3 directory for Hydra config resolution
-    os.environ["PYTHONPATH"] = f"{sam3_dir}:{original_pythonpath}" if original_pythonpath else str(sam3_dir)
+    pythonpath = eval_env.get("PYTHONPATH", "")
+    eval_env["PYTHONPATH"] = f"{sam3_dir_str}:{pythonpath}" if pythonpath else sam3_dir_str
     
     # Set environment variables for config path resolution
-    os.environ["PROJECT_ROOT"] = str(project_root)
-    os.environ["SAM3_ROOT"] = str(sam3_dir)
+    eval_env["PROJECT_ROOT"] = os.fspath(project_root)
+    eval_env["SAM3_ROOT"] = sam3_dir_str
     
     # Suppress pkg_resources deprecation warnings from SAM3
-    pythonwarnings = os.environ.get("PYTHONWARNINGS", "")
+    pythonwarnings = eval_env.get("PYTHONWARNINGS", "")
     if pythonwarnings:
-        os.environ["PYTHONWARNINGS"] = f"{pythonwarnings},ignore::UserWarning:sam3.model_builder"
+        eval_env["PYTHONWARNINGS"] = f"{pythonwarnings},ignore::UserWarning:sam3.model_builder"
     else:
-        os.environ["PYTHONWARNINGS"] = "ignore::UserWarning:sam3.model_builder"
+        eval_env["PYTHONWARNINGS"] = "ignore::UserWarning:sam3.model_builder"
     
     # Use relative path from sam3 directory
     config_arg = f"configs/{config_name}"
     
+    # Exec the evaluation in place of this process instead of waiting for it
+    exec_eval = os.getenv('SAM3_EXEC_EVAL', '').strip().lower() in ('1', 'true', 'yes', 'on')
+    
+    # The evaluation output is also appended to this log
+    eval_log_path = project_root / "results" / "finetuned_evaluation" / "eval.log"
+    
     # Build command (paths are already in the config file)
     cmd = [
         sys.executable,
@@ -288,11 +571,22 @@ def main():
     print(f"Validation JSON: {val_json_path}")
     print(f"Config: {sam3_config_path}")
     print(f"Command: {' '.join(cmd)}")
+    if not exec_eval:
+        print(f"Log: {eval_log_path}")
     print()
     
     try:
-        # Run the evaluation
-        result = subprocess.run(cmd, check=True, cwd=str(sam3_dir))
+        if exec_eval:
+            # The evaluation takes over this process, from the sam3 directory
+            # so Hydra can resolve configs; its exit code is the task's exit code
+            print("Replacing this process with the evaluation (SAM3_EXEC_EVAL)")
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.chdir(sam3_dir)
+            os.execvpe(cmd[0], cmd, eval_env)
+        
+        # Run the evaluation (from the sam3 directory so Hydra can resolve configs)
+        run_logged(cmd, sam3_dir, eval_log_path, eval_env)
         print()
         print("=" * 50)
         print("✓ Evaluation completed successfully")
@@ -306,13 +600,9 @@ def main():
     except KeyboardInterrupt:
         print("\nERROR: Evaluation interrupted by user", file=sys.stderr)
         return 1
-    finally:
-        # Restore original directory and PYTHONPATH
-        os.chdir(original_cwd)
-        if original_pythonpath:
-            os.environ["PYTHONPATH"] = original_pythonpath
-        elif "PYTHONPATH" in os.environ:
-            del os.environ["PYTHONPATH"]
+    except OSError as e:
+        print(f"ERROR: Could not start evaluation: {e}", file=sys.stderr)
+        return 1
 
 
 if __name__ == "__main__":
@@ -0,0 +1,87 @@
+"""
+Local metrics log written from inside the training process.
+
+Each logged step is one JSON line ({"step": ..., "loss_focal": ..., ...})
+appended to log_dir/metrics.jsonl.zst, next to the checkpoints. Monitoring
+tasks (4.2.1) read this file instead of round-tripping the WandB API, so they
+run in milliseconds and work offline.
+
+The file is zstd-compressed when the optional zstandard package is installed,
+and plain log_dir/metrics.jsonl otherwise. Every flush ends a zstd frame, and
+concatenated frames decode as one stream, so the file can be read while
+training keeps appending to it.
+
+Use it from the training loop:
+
+    from sam3_chicken_detection.metrics_log import MetricsLogWriter
+    with MetricsLogWriter(experiment_log_dir) as metrics_log:
+        ...
+        metrics_log.log(step, loss_focal=loss_focal)
+
+Nothing in this repository does so yet: training runs SAM3's own trainer
+(sam3/sam3/train/train.py, launched by task 4.1.1), which is not modified
+here, so the writer has to be added to that training loop. Until then task
+4.2.1 finds no metrics log and reads the focal loss from WandB.
+"""
+
+import json
+import math
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+METRICS_LOG_FILENAME = "metrics.jsonl.zst"
+PLAIN_METRICS_LOG_FILENAME = "metrics.jsonl"
+
+
+class MetricsLogWriter:
+    """Append-only JSON-lines metrics log; flushed (one zstd frame) every flush_every steps."""
+
+    def __init__(self, log_dir, flush_every=50):
+        log_dir = Path(log_dir)
+        log_dir.mkdir(parents=True, exist_ok=True)
+        self.flush_every = flush_every
+        self._pending = 0
+        if zstandard is not None:
+            self.path = log_dir / METRICS_LOG_FILENAME
+            self._file = open(self.path, 'ab')
+            self._stream = zstandard.ZstdCompressor().stream_writer(self._file, closefd=False)
+        else:
+            self.path = log_dir / PLAIN_METRICS_LOG_FILENAME
+            self._file = open(self.path, 'ab')
+            self._stream = self._file
+
+    def log(self, step, **metrics):
+        """Append the metrics of one step; NaN/inf values are written as null (strict JSON)."""
+        record = {'step': int(step)}
+        for key, value in metrics.items():
+            value = float(value)
+            record[key] = value if math.isfinite(value) else None
+        self._stream.write(json.dumps(record).encode('utf-8') + b'\n')
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Make everything logged so far readable by monitoring tasks."""
+        if not self._pending:
+            return
+        if zstandard is not None:
+            self._stream.flush(zstandard.FLUSH_FRAME)
+        self._file.flush()
+        self._pending = 0
+
+    def close(self):
+        self.flush()
+        if self._stream is not self._file:
+            self._stream.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
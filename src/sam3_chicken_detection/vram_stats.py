@@ -0,0 +1,54 @@
+"""
+VRAM statistics side-file written from inside the training process.
+
+Task 4.1.3 (batch size tuning) reads this file instead of querying the driver:
+PyTorch's caching allocator keeps freed blocks reserved, so nvidia-smi/NVML
+report more memory than training actually needs, while the allocator's own
+peak is exactly the number the batch size has to fit.
+
+Call it from the training loop, e.g. at the end of every epoch:
+
+    from sam3_chicken_detection.vram_stats import write_vram_stats
+    write_vram_stats(experiment_log_dir, batch_size)
+
+Nothing in this repository calls it: training runs SAM3's own trainer
+(sam3/sam3/train/train.py, launched by task 4.1.1), which is not modified
+here, so the call has to be added to that training loop. Until then task 4.1.3
+finds no vram_stats.json and falls back to NVML/nvidia-smi readings.
+"""
+
+import os
+import json
+import time
+from pathlib import Path
+
+VRAM_STATS_FILENAME = "vram_stats.json"
+
+
+def write_vram_stats(log_dir, batch_size, device=None):
+    """
+    Write the allocator's peak and the device's free/total memory to log_dir/vram_stats.json.
+
+    Returns the path written, or None when CUDA is not available.
+    """
+    import torch
+
+    if not torch.cuda.is_available():
+        return None
+
+    free_bytes, total_bytes = torch.cuda.mem_get_info(device)
+    stats = {
+        'time': time.time(),
+        'batch_size': batch_size,
+        'free_bytes': free_bytes,
+        'total_bytes': total_bytes,
+        'max_allocated_bytes': torch.cuda.max_memory_allocated(device),
+        'max_reserved_bytes': torch.cuda.max_memory_reserved(device),
+    }
+
+    path = Path(log_dir) / VRAM_STATS_FILENAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_text(json.dumps(stats))
+    os.replace(tmp_path, path)
+    return path